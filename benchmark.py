@@ -0,0 +1,293 @@
+import argparse
+import json
+import math
+import os
+import platform
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+
+from recorder_main import BGSI_Recorder
+from event_store import new_recording
+from input_backend import VirtualBackend
+from recording_format import save_binary
+
+# Benchmark suite for playback timing, throughput and the file/filter/capture
+# paths. Everything runs against a VirtualBackend, so no input is injected and
+# no privileges are needed. Results are written as JSON so runs from different
+# versions can be compared with --compare.
+
+DEFAULT_SIZES = [1_000, 10_000, 100_000]
+DEFAULT_SPEEDS = [1, 2, 5]
+# Moves per second of recording in the playback suite; the recording duration
+# grows with the size so 1M moves still means a realistic 1kHz mouse
+DEFAULT_RATE_HZ = 1000
+SCHEMA_VERSION = 1
+
+
+def synthetic_moves(count: int, rate_hz: float = DEFAULT_RATE_HZ, click_every: int = 500) -> dict:
+    # A circular mouse path sampled at rate_hz with a click every click_every moves
+    recorded = new_recording()
+    track = recorded['mouse']
+    interval = 1 / rate_hz
+    for i in range(count):
+        t = i * interval
+        angle = i / 200
+        track.append_move(int(960 + 400 * math.cos(angle)), int(540 + 300 * math.sin(angle)), t)
+        if click_every and i % click_every == click_every - 1:
+            track.append_click('left', True, t)
+            track.append_click('left', False, t)
+    return recorded
+
+
+def synthetic_chords(chords: int, keys_per_chord: int = 4, gap: float = 0.01, hold: float = 0.005) -> dict:
+    # Dense key chords: keys_per_chord keys pressed at the same instant, released hold later
+    recorded = new_recording()
+    track = recorded['keyboard']
+    keys = [chr(ord('a') + i % 26) for i in range(keys_per_chord)]
+    for chord in range(chords):
+        t = chord * gap
+        for key in keys:
+            track.append_key(True, key, t)
+        for key in keys:
+            track.append_key(False, key, t + hold)
+    return recorded
+
+
+def _timed_run(func):
+    wall_start = time.perf_counter()
+    cpu_start = time.process_time()
+    result = func()
+    wall = time.perf_counter() - wall_start
+    cpu = time.process_time() - cpu_start
+    return result, wall, cpu
+
+
+def run_playback(name: str, recorded: dict, speed: float) -> dict:
+    backend = VirtualBackend()
+    recorder = BGSI_Recorder(recorded=recorded, backend=backend)
+    _, wall, cpu = _timed_run(lambda: recorder.play(countdown=0.05, speed_factor=speed))
+    stats = recorder.playback_stats
+    summary = stats.summary()
+    last_lateness = stats.samples[-1] / 1e6 if len(stats) else 0.0
+    events = summary['count']
+    return {
+        'suite': 'playback',
+        'name': name,
+        'speed': speed,
+        'events': events,
+        'wall_s': wall,
+        'events_per_sec': events / wall if wall > 0 else 0.0,
+        'cpu_percent': 100 * cpu / wall if wall > 0 else 0.0,
+        'lateness_mean_ms': summary['mean_ms'],
+        'lateness_p50_ms': summary['p50_ms'],
+        'lateness_p95_ms': summary['p95_ms'],
+        'lateness_p99_ms': summary['p99_ms'],
+        'max_drift_ms': summary['max_ms'],
+        'final_drift_ms': last_lateness,
+        'dispatched': len(backend.actions),
+    }
+
+
+def bench_playback(sizes: list, speeds: list, max_duration: float) -> list:
+    results = []
+    for size in sizes:
+        recorded = synthetic_moves(size)
+        duration = size / DEFAULT_RATE_HZ
+        for speed in speeds:
+            if duration / speed > max_duration:
+                print(f"  skip moves_{size} x{speed}: {duration / speed:.0f}s exceeds --max-duration")
+                continue
+            print(f"  playback moves_{size} x{speed}")
+            results.append(run_playback(f'moves_{size}', recorded, speed))
+    recorded = synthetic_chords(200, keys_per_chord=6)
+    for speed in speeds:
+        print(f"  playback chords_200x6 x{speed}")
+        results.append(run_playback('chords_200x6', recorded, speed))
+    return results
+
+
+def bench_filter(sizes: list) -> list:
+    results = []
+    for size in sizes:
+        recorded = synthetic_moves(size)
+        recorder = BGSI_Recorder(recorded=recorded, backend=VirtualBackend())
+        events = len(recorded['mouse'])
+        _, wall, cpu = _timed_run(recorder.filter_moves)
+        results.append({'suite': 'filter', 'name': f'filter_moves_{size}', 'events': events, 'wall_s': wall,
+                        'events_per_sec': events / wall if wall > 0 else 0.0,
+                        'cpu_percent': 100 * cpu / wall if wall > 0 else 0.0})
+        for mode in ('rdp', 'decimate', 'velocity'):
+            result, wall, cpu = _timed_run(lambda: recorder.simplify_moves(mode, 2.0))
+            results.append({'suite': 'filter', 'name': f'simplify_{mode}_{size}', 'events': events, 'wall_s': wall,
+                            'events_per_sec': events / wall if wall > 0 else 0.0,
+                            'cpu_percent': 100 * cpu / wall if wall > 0 else 0.0,
+                            'kept': result.kept})
+    return results
+
+
+def bench_io(sizes: list) -> list:
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        for size in sizes:
+            recorded = synthetic_moves(size)
+            events = len(recorded['mouse'])
+            for label, filename, compress in (('json', 'r.json', False), ('rrec', 'r.rrec', False),
+                                              ('rrec_zlib', 'r.rrec', True)):
+                path = os.path.join(directory, filename)
+                recorder = BGSI_Recorder(recorded=recorded, backend=VirtualBackend())
+                _, save_wall, _ = _timed_run(lambda: recorder.save(path, compress=compress))
+                _, load_wall, _ = _timed_run(lambda: recorder.load(path))
+                results.append({'suite': 'io', 'name': f'{label}_{size}', 'events': events,
+                                'size_bytes': os.path.getsize(path),
+                                'save_s': save_wall, 'load_s': load_wall,
+                                'load_events_per_sec': events / load_wall if load_wall > 0 else 0.0})
+    return results
+
+
+def bench_capture(sizes: list) -> list:
+    # Hook-thread cost per event and end-to-end capture throughput: events are
+    # emitted as fast as possible through the virtual hooks while recording
+    results = []
+    for size in sizes:
+        backend = VirtualBackend()
+        recorder = BGSI_Recorder(backend=backend)
+        thread = threading.Thread(target=recorder.record, kwargs={'countdown': 0.0})
+        thread.start()
+        while not backend.hooked:
+            time.sleep(0.001)
+        emit_ns = backend.synthesize_moves(size, rate_hz=1_000_000, realtime=False)
+        time.sleep(0.05)
+        backend.emit_key('esc')
+        thread.join()
+        stats = recorder.get_capture_stats()
+        captured = len(recorder.recorded['mouse'])
+        results.append({'suite': 'capture', 'name': f'capture_{size}', 'events': size,
+                        'captured': captured,
+                        'hook_ns_per_event': emit_ns / size,
+                        'hook_events_per_sec': size / (emit_ns / 1e9) if emit_ns else 0.0,
+                        'peak_queue_depth': stats['peak_queue_depth']['mouse'],
+                        'overruns': stats['overruns']['mouse']})
+    return results
+
+
+class FirstEventBackend(VirtualBackend):
+    # Stops playback as soon as the first action is dispatched
+    def __init__(self):
+        super().__init__()
+        self.recorder = None
+
+    def _record(self, action: str, *args):
+        super()._record(action, *args)
+        if len(self.actions) == 1:
+            self.recorder.stop_playback()
+
+
+def first_event(path: str, stream: bool) -> dict:
+    # Time from the play request to the first dispatched action, and peak
+    # Python heap use on the way there
+    backend = FirstEventBackend()
+    recorder = BGSI_Recorder(backend=backend)
+    backend.recorder = recorder
+    tracemalloc.start()
+    start_ns = time.perf_counter_ns()
+    if stream:
+        recorder.play_stream(path, countdown=0)
+    else:
+        recorder.load(path)
+        recorder.play(countdown=0)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {'first_event_ms': (backend.actions[0][0] - start_ns) / 1e6 if backend.actions else None,
+            'peak_alloc_bytes': peak}
+
+
+def bench_stream(sizes: list) -> list:
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        for size in sizes:
+            path = os.path.join(directory, f'moves_{size}.rrec')
+            save_binary(synthetic_moves(size), path)
+            for label, stream in (('load', False), ('stream', True)):
+                print(f"  first event moves_{size} ({label})")
+                results.append({'suite': 'stream', 'name': f'{label}_{size}', 'events': size,
+                                **first_event(path, stream)})
+    return results
+
+
+SUITES = {
+    'playback': lambda args: bench_playback(args.sizes, args.speeds, args.max_duration),
+    'filter': lambda args: bench_filter(args.sizes),
+    'io': lambda args: bench_io(args.sizes),
+    'capture': lambda args: bench_capture(args.sizes),
+    'stream': lambda args: bench_stream(args.sizes),
+}
+
+# Metric used per suite when comparing runs, and whether higher is better
+COMPARE_METRICS = {
+    'playback': ('lateness_p99_ms', False),
+    'filter': ('wall_s', False),
+    'io': ('load_s', False),
+    'capture': ('hook_ns_per_event', False),
+    'stream': ('first_event_ms', False),
+}
+
+
+def compare(results: list, baseline_path: str):
+    with open(baseline_path, 'r') as f:
+        baseline = json.load(f)
+    previous = {(r['suite'], r['name'], r.get('speed')): r for r in baseline['results']}
+    print(f"\nComparison against {baseline_path} ({baseline.get('label') or 'unlabelled'}):")
+    for result in results:
+        old = previous.get((result['suite'], result['name'], result.get('speed')))
+        if old is None:
+            continue
+        metric, higher_is_better = COMPARE_METRICS[result['suite']]
+        before, after = old[metric], result[metric]
+        change = (after - before) / before * 100 if before else 0.0
+        worse = change < 0 if higher_is_better else change > 0
+        speed = f" x{result['speed']}" if 'speed' in result else ''
+        flag = '  <-- regression' if worse and abs(change) > 10 else ''
+        print(f"  {result['name']}{speed} {metric}: {before:.4g} -> {after:.4g} ({change:+.1f}%){flag}")
+
+
+def main(argv: list = None) -> int:
+    parser = argparse.ArgumentParser(description='RiftRecorder benchmark suite.')
+    parser.add_argument('--suite', choices=sorted(SUITES), action='append',
+                        help='Suite to run (repeatable, default: all).')
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES,
+                        help='Mouse move counts for the synthetic recordings, e.g. 1000 1000000.')
+    parser.add_argument('--speeds', type=float, nargs='+', default=DEFAULT_SPEEDS)
+    parser.add_argument('--max-duration', type=float, default=60.0,
+                        help='Skip playback runs that would take longer than this many seconds.')
+    parser.add_argument('--label', help='Version label stored in the report.')
+    parser.add_argument('--output', default='benchmark_results.json')
+    parser.add_argument('--compare', help='Previous report to compare against.')
+    args = parser.parse_args(argv)
+
+    results = []
+    for suite in args.suite or list(SUITES):
+        print(f"Running {suite} suite...")
+        results.extend(SUITES[suite](args))
+
+    report = {
+        'schema': SCHEMA_VERSION,
+        'label': args.label,
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': sys.version.split()[0],
+        'platform': platform.platform(),
+        'results': results,
+    }
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=4)
+    print(f"Wrote {len(results)} results to {args.output}")
+
+    if args.compare:
+        compare(results, args.compare)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
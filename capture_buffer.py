@@ -0,0 +1,87 @@
+DEFAULT_CAPACITY = 1 << 16
+
+
+class CaptureRing:
+    """
+    Preallocated single-producer / single-consumer ring buffer.
+
+    The input hook thread is the only writer of `_head` and the consumer thread
+    the only writer of `_tail`, so no lock is needed: under the GIL a slot is
+    always stored before the head index that publishes it. Use one ring per
+    hook thread. When the consumer falls a full ring behind, new items are
+    dropped and counted in `overruns` instead of blocking the hook.
+    """
+
+    def __init__(self, capacity: int = DEFAULT_CAPACITY):
+        if capacity <= 0 or capacity & (capacity - 1):
+            raise ValueError("Ring capacity must be a power of two")
+        self.capacity = capacity
+        self._mask = capacity - 1
+        self._slots = [None] * capacity
+        self._head = 0
+        self._tail = 0
+        self.overruns = 0
+        self.peak_depth = 0
+
+    def push(self, item) -> bool:
+        # Called from the hook thread, keep it minimal
+        head = self._head
+        depth = head - self._tail
+        if depth >= self.capacity:
+            self.overruns += 1
+            return False
+        self._slots[head & self._mask] = item
+        self._head = head + 1
+        if depth >= self.peak_depth:
+            self.peak_depth = depth + 1
+        return True
+
+    def drain(self, limit: int = None) -> list:
+        # Called from the consumer thread; returns items in push order
+        tail = self._tail
+        head = self._head
+        if limit is not None:
+            head = min(head, tail + limit)
+        slots = self._slots
+        mask = self._mask
+        batch = [slots[i & mask] for i in range(tail, head)]
+        self._tail = head
+        return batch
+
+    def __len__(self):
+        return self._head - self._tail
+
+    @property
+    def pushed(self) -> int:
+        return self._head
+
+
+class CaptureStats:
+    """Aggregated capture statistics across the rings of one recording session."""
+
+    def __init__(self):
+        self.events = 0
+        self.batches = 0
+        self.largest_batch = 0
+        self.started = None
+        self.finished = None
+
+    def add_batch(self, size: int):
+        if size:
+            self.events += size
+            self.batches += 1
+            if size > self.largest_batch:
+                self.largest_batch = size
+
+    def summary(self, rings: dict, now: float) -> dict:
+        end = self.finished if self.finished is not None else now
+        elapsed = max(0.0, end - self.started) if self.started is not None else 0.0
+        return {
+            'events': self.events,
+            'elapsed_s': elapsed,
+            'events_per_sec': self.events / elapsed if elapsed > 0 else 0.0,
+            'batches': self.batches,
+            'largest_batch': self.largest_batch,
+            'peak_queue_depth': {name: ring.peak_depth for name, ring in rings.items()},
+            'overruns': {name: ring.overruns for name, ring in rings.items()},
+        }
@@ -0,0 +1,579 @@
+import argparse
+import json
+import logging
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from recorder_main import BGSI_Recorder
+from recording_format import BINARY_EXTENSION, is_binary
+from event_store import MOVE, BUTTON_DOWN, BUTTON_UP, SCROLL, NO_NAME
+from path_simplify import MODES
+from coordinate_space import MODES as COORDINATE_MODES, ABSOLUTE
+from path_resample import INTERPOLATIONS, LINEAR
+from input_backend import VirtualBackend
+from recorder_log import setup_logging, default_trace_path, Trace
+from recording_stream import DEFAULT_READ_AHEAD
+from journal import JOURNAL_EXTENSION, default_journal_dir, is_journal, recover_session
+from recording_library import validate_recording, diff_recordings
+from instrumentation import Instrumentation, PROFILE_MODES
+from composition import Composition, is_composition
+
+# Headless entry point: only BGSI_Recorder and the format modules are imported,
+# never PyQt6, so this starts quickly and works without a display.
+
+RECORDING_EXTENSIONS = ('.json', BINARY_EXTENSION, JOURNAL_EXTENSION)
+
+
+def expand_paths(paths: list) -> list:
+    # Directories expand to the recordings directly inside them
+    expanded = []
+    for path in paths:
+        if os.path.isdir(path):
+            for name in sorted(os.listdir(path)):
+                if name.lower().endswith(RECORDING_EXTENSIONS):
+                    expanded.append(os.path.join(path, name))
+        else:
+            expanded.append(path)
+    return expanded
+
+
+def output_path(path: str, out: str, extension: str) -> str:
+    # `out` may be a directory (keep the file name) or an explicit file path
+    base = os.path.splitext(os.path.basename(path))[0] + extension
+    if out is None:
+        return os.path.join(os.path.dirname(path), base)
+    if os.path.isdir(out):
+        return os.path.join(out, base)
+    return out
+
+
+def positive_float(value: str) -> float:
+    number = float(value)
+    if not number > 0:
+        raise argparse.ArgumentTypeError(f"must be greater than 0, got {value}")
+    return number
+
+
+def file_recorder() -> BGSI_Recorder:
+    # File-only jobs never touch real input, so keep the hook libraries out of them
+    return BGSI_Recorder(backend=VirtualBackend())
+
+
+def load_file(path: str) -> BGSI_Recorder:
+    # File jobs work on every event, so a composition is expanded
+    recorder = file_recorder()
+    recorder.load(path)
+    recorder.expand_composition()
+    return recorder
+
+
+def apply_filters(recorder: BGSI_Recorder, options: dict):
+    recorder.apply_filter(options.get('essential', False), options.get('simplify'), options.get('tolerance', 2.0),
+                          options.get('min_interval', 0.0))
+
+
+# --- Per-file jobs. Top level functions so they can run in worker processes. ---
+
+def inspect_job(path: str, options: dict) -> dict:
+    recorder = load_file(path)
+    keyboard_track = recorder.recorded['keyboard']
+    mouse_track = recorder.recorded['mouse']
+    kinds = mouse_track.kind
+    end_times = [track.t[-1] for track in (keyboard_track, mouse_track) if track]
+    return {
+        'path': path,
+        'format': 'binary' if is_binary(path) else 'journal' if is_journal(path) else 'json',
+        'size_bytes': os.path.getsize(path),
+        'duration_s': max(end_times) if end_times else 0.0,
+        'geometry': list(mouse_track.geometry) if mouse_track.geometry else None,
+        'keyboard_events': len(keyboard_track),
+        # From the rows, not the name table: it may hold names no row uses
+        'keys': sorted({keyboard_track.names[code] for code in set(keyboard_track.code) if code != NO_NAME}),
+        'mouse_events': len(mouse_track),
+        'moves': kinds.count(MOVE),
+        'clicks': kinds.count(BUTTON_DOWN) + kinds.count(BUTTON_UP),
+        'scrolls': kinds.count(SCROLL),
+    }
+
+
+def analyze_job(path: str, options: dict) -> dict:
+    recorder = load_file(path)
+    summary = recorder.index.summary(options['bin'], options['min_gap'])
+    if not options.get('json'):
+        # Too long to read as text; --json keeps the per-bin counts
+        del summary['events_per_sec_histogram']
+    return {'path': path, **summary}
+
+
+def validate_job(path: str, options: dict) -> dict:
+    # Streams binary recordings and journals, see recording_library
+    return {'path': path, **validate_recording(path).summary()}
+
+
+def diff_job(path: str, options: dict) -> dict:
+    # Against the same file name when the other side is a directory
+    other = options['other']
+    if os.path.isdir(other):
+        other = os.path.join(other, os.path.basename(path))
+    if not os.path.exists(other):
+        raise FileNotFoundError(f"No counterpart {other}")
+    return {'path': path, 'other': other, **diff_recordings(path, other, options['time_tolerance'])}
+
+
+def convert_job(path: str, options: dict) -> dict:
+    target = options['to']
+    if target is None:
+        target = 'json' if is_binary(path) else 'rrec'
+    destination = output_path(path, options.get('out'), BINARY_EXTENSION if target == 'rrec' else '.json')
+    if os.path.abspath(destination) == os.path.abspath(path):
+        raise ValueError(f"Refusing to overwrite {path} with itself")
+    recorder = load_file(path)
+    recorder.save(destination, compress=options.get('compress', False))
+    return {'path': path, 'output': destination,
+            'size_before': os.path.getsize(path), 'size_after': os.path.getsize(destination)}
+
+
+def filter_job(path: str, options: dict) -> dict:
+    root, extension = os.path.splitext(path)
+    if options.get('out') is None:
+        destination = root + '.filtered' + extension
+    else:
+        destination = output_path(path, options['out'], extension)
+    recorder = load_file(path)
+    before = len(recorder.recorded['mouse'])
+    apply_filters(recorder, options)
+    recorder.save(destination, compress=options.get('compress', False))
+    result = {'path': path, 'output': destination, 'mouse_before': before,
+              'mouse_after': len(recorder.recorded['mouse'])}
+    if recorder.simplify_result is not None:
+        summary = recorder.simplify_result.summary()
+        for key in ('reduction_ratio', 'max_error_px', 'max_sync_error_px'):
+            result[key] = summary[key]
+    return result
+
+
+def normalize_job(path: str, options: dict) -> dict:
+    root, extension = os.path.splitext(path)
+    if options.get('out') is None:
+        destination = root + '.normalized' + extension
+    else:
+        destination = output_path(path, options['out'], extension)
+    recorder = load_file(path)
+    result = recorder.normalize_timing(options['max_idle'], options['merge_distance'],
+                                       options['merge_interval'], options['tick'])
+    recorder.save(destination, compress=options.get('compress', False))
+    return {'path': path, 'output': destination, **result.summary()}
+
+
+def bench_job(path: str, options: dict) -> dict:
+    timings = {}
+    recorder = file_recorder()
+
+    start = time.perf_counter()
+    recorder.load(path)
+    recorder.expand_composition()
+    timings['load_s'] = time.perf_counter() - start
+
+    # Filters leave the recording as it is; each one is timed on first use (uncached)
+    start = time.perf_counter()
+    recorder.filter_moves()
+    timings['filter_moves_s'] = time.perf_counter() - start
+
+    for mode in MODES:
+        start = time.perf_counter()
+        recorder.simplify_moves(mode, options['tolerance'])
+        timings[f'simplify_{mode}_s'] = time.perf_counter() - start
+
+    scratch = path + '.bench' + BINARY_EXTENSION
+    try:
+        start = time.perf_counter()
+        recorder.save(scratch)
+        timings['save_binary_s'] = time.perf_counter() - start
+    finally:
+        if os.path.exists(scratch):
+            os.remove(scratch)
+
+    events = len(recorder.recorded['keyboard']) + len(recorder.recorded['mouse'])
+    return {'path': path, 'events': events, **timings}
+
+
+JOBS = {
+    'inspect': inspect_job,
+    'analyze': analyze_job,
+    'validate': validate_job,
+    'diff': diff_job,
+    'convert': convert_job,
+    'filter': filter_job,
+    'normalize': normalize_job,
+    'bench': bench_job,
+}
+
+
+def run_batch(command: str, paths: list, options: dict, jobs: int) -> int:
+    job = JOBS[command]
+    failures = 0
+    results = []
+    started = time.time()
+    if jobs > 1 and len(paths) > 1:
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            futures = [(path, pool.submit(job, path, options)) for path in paths]
+            for path, future in futures:
+                try:
+                    results.append(future.result())
+                except Exception as e:
+                    failures += 1
+                    results.append({'path': path, 'error': str(e)})
+    else:
+        for path in paths:
+            try:
+                results.append(job(path, options))
+            except Exception as e:
+                failures += 1
+                results.append({'path': path, 'error': str(e)})
+
+    # Files that were read fine but failed validation count as failures too
+    failures += sum(1 for result in results if result.get('valid') is False)
+    if options.get('report'):
+        report = {
+            'command': command,
+            'started': time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(started)),
+            'elapsed_s': time.time() - started,
+            'files': len(paths),
+            'failures': failures,
+            'results': results,
+        }
+        with open(options['report'], 'w') as f:
+            json.dump(report, f, indent=4)
+
+    if options.get('json'):
+        print(json.dumps(results, indent=4))
+    else:
+        for result in results:
+            print(result['path'] + ':')
+            for key, value in result.items():
+                if key == 'path':
+                    continue
+                if isinstance(value, float):
+                    value = f"{value:.6g}"
+                if isinstance(value, list) and value and isinstance(value[0], str):
+                    print(f"  {key}:")
+                    for item in value:
+                        print(f"    {item}")
+                    continue
+                print(f"  {key}: {value}")
+        if len(results) > 1:
+            print(f"{len(results)} files, {failures} failed")
+    return 1 if failures else 0
+
+
+def instrumentation_for(args) -> Instrumentation:
+    return Instrumentation(per_event=args.per_event_timing, profile=args.profile)
+
+
+def report_instrumentation(args, recorder: BGSI_Recorder):
+    # Printed (and exported) only when one of the instrumentation options was given
+    if not (args.profile or args.per_event_timing or args.instrumentation):
+        return
+    print(recorder.instrumentation.format())
+    if args.instrumentation:
+        recorder.instrumentation.export(args.instrumentation)
+        print(f"Instrumentation written to {args.instrumentation}")
+
+
+def cmd_play(args) -> int:
+    # --dry-run plays into a VirtualBackend: full timing, no injected input
+    backend = VirtualBackend() if args.dry_run else None
+    recorder = BGSI_Recorder(stop_key=args.stop_key, backend=backend, instrumentation=instrumentation_for(args))
+    recorder.log_events = args.log_events
+    trace_path = None
+    if args.trace is not None:
+        trace_path = args.trace or default_trace_path(args.path)
+    plan_options = (args.essential or args.simplify or args.repeat != 1 or args.coords != ABSOLUTE
+                    or args.start is not None or args.end is not None or args.rate or args.skip_stale)
+    composition = None
+    if is_composition(args.path):
+        # Laid out up front, so missing segments and cycles fail before playback
+        try:
+            composition = Composition.load(args.path)
+            composition.layout()
+        except (ValueError, OSError) as e:
+            print(f"play: {e}")
+            return 2
+    if composition is not None and not plan_options:
+        # Played segment by segment; plan options need it expanded instead
+        recorder.play_composition(composition, countdown=args.countdown, speed_factor=args.speed,
+                                  trace_path=trace_path)
+    elif args.stream:
+        if plan_options:
+            print("play: --stream cannot be combined with --essential, --simplify, --repeat, --coords, "
+                  "--start, --end, --rate or --skip-stale")
+            return 2
+        recorder.play_stream(args.path, countdown=args.countdown, speed_factor=args.speed,
+                             trace_path=trace_path, read_ahead=args.read_ahead)
+    else:
+        if composition is not None:
+            recorder.recorded = composition.flatten()
+        else:
+            recorder.load(args.path)
+        recorder.play(countdown=args.countdown, speed_factor=args.speed,
+                      only_essential_moves=args.essential,
+                      simplify_mode=args.simplify, simplify_tolerance=args.tolerance,
+                      trace_path=trace_path, repeat=args.repeat, gap=args.gap,
+                      coordinate_mode=args.coords,
+                      playback_geometry=tuple(args.screen) if args.screen else None,
+                      start=args.start, end=args.end, dispatch_rate=args.rate,
+                      interpolation=args.interpolation, skip_stale_moves=args.skip_stale or None,
+                      simplify_min_interval=args.min_interval)
+        if recorder.simplify_result is not None:
+            print(f"Simplified {recorder.simplify_result.format()}")
+        if args.repeat != 1:
+            for stats in recorder.iteration_stats:
+                print(f"Run {stats['iteration']}: {stats['events']} events in {stats['actual_s']:.3f}s "
+                      f"(scheduled {stats['scheduled_s']:.3f}s), started {stats['start_lateness_ms']:.3f}ms late, "
+                      f"p99 {stats['lateness_p99_ms']:.3f}ms")
+    print(f"Playback: {recorder.playback_stats.format()}")
+    if args.dry_run:
+        print(f"Dry run: {len(backend.actions)} actions dispatched")
+    report_instrumentation(args, recorder)
+    return 0
+
+
+def cmd_record(args) -> int:
+    # Journaled while recording so a crash before the save can be recovered
+    journal_dir = None if args.no_journal else default_journal_dir()
+    recorder = BGSI_Recorder(stop_key=args.stop_key, journal_dir=journal_dir, instrumentation=instrumentation_for(args))
+    recorder.record(countdown=args.countdown)
+    recorder.save(args.path, compress=args.compress)
+    print(f"Recording saved to {args.path}")
+    report_instrumentation(args, recorder)
+    return 0
+
+
+def parse_segment(spec: str) -> dict:
+    # PATH[,offset=SECONDS][,speed=X][,repeat=N]
+    path, *options = spec.split(',')
+    segment = {'path': path}
+    for option in options:
+        key, _, value = option.partition('=')
+        if key == 'offset':
+            segment['offset'] = float(value)
+        elif key == 'speed':
+            segment['speed'] = float(value)
+        elif key == 'repeat':
+            segment['repeat'] = int(value)
+        else:
+            raise ValueError(f"unknown segment option {key!r} in {spec!r}")
+    return segment
+
+
+def cmd_compose(args) -> int:
+    try:
+        segments = [parse_segment(spec) for spec in args.segments]
+        composition = Composition()
+        for segment in segments:
+            composition.add(**segment)
+        layout = composition.layout()
+    except (ValueError, OSError) as e:
+        print(f"compose: {e}")
+        return 2
+    for segment, start, step in layout:
+        print(f"  {start:10.3f}s  {os.path.basename(segment.path)} x{segment.repeat} at {segment.speed:g}x "
+              f"({step * segment.repeat:.3f}s)")
+    composition.save(args.path)
+    print(f"Composition of {len(segments)} segments ({len(composition)} events, {composition.duration:.3f}s) "
+          f"saved to {args.path}")
+    if args.expand:
+        recorder = file_recorder()
+        recorder.recorded = composition.flatten()
+        recorder.save(args.expand, compress=args.compress)
+        print(f"Expanded recording saved to {args.expand}")
+    return 0
+
+
+def cmd_recover(args) -> int:
+    recovered = recover_session(args.journal_dir)
+    if recovered is None:
+        print(f"No unsaved recordings in {args.journal_dir}")
+        return 1
+    recorded, info = recovered
+    recorder = file_recorder()
+    recorder.recorded = recorded
+    recorder.attach_journal(info.path)
+    recorder.save(args.path, compress=args.compress)
+    started = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(info.start_time))
+    print(f"Recovered {info.rows} events recorded {started} to {args.path}")
+    return 0
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog='cli.py', description='Headless RiftRecorder tools.')
+    parser.add_argument('-v', '--verbose', action='count', default=0, help='More logging (-vv for debug).')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    def add_simplify_options(p):
+        p.add_argument('--essential', action='store_true', help='Only keep essential moves.')
+        p.add_argument('--simplify', choices=MODES, help='Path simplification mode.')
+        p.add_argument('--tolerance', type=float, default=2.0, help='Simplification tolerance in pixels.')
+        p.add_argument('--min-interval', type=float, default=0.0, metavar='SECONDS',
+                       help='With --simplify decimate, keep at most one move per this many seconds.')
+
+    def add_instrumentation_options(p):
+        p.add_argument('--profile', choices=PROFILE_MODES, help='Profile the session with cProfile or a stack sampler.')
+        p.add_argument('--per-event-timing', action='store_true',
+                       help='Time every dispatch/hook callback (adds overhead).')
+        p.add_argument('--instrumentation', metavar='PATH', help='Write phase timings and profiles as JSON.')
+
+    def add_batch_options(p):
+        p.add_argument('paths', nargs='+', help='Recording files or directories of recordings.')
+        p.add_argument('-j', '--jobs', type=int, default=1, help='Worker processes for batches.')
+        p.add_argument('--json', action='store_true', help='Print results as JSON.')
+        p.add_argument('--report', metavar='PATH', help='Also write the results to a JSON report file.')
+
+    p = sub.add_parser('play', help='Play a recording.')
+    p.add_argument('path')
+    p.add_argument('--speed', type=positive_float, default=1.0)
+    p.add_argument('--countdown', type=float, default=0.001)
+    p.add_argument('--stop-key', default='esc')
+    p.add_argument('--dry-run', action='store_true', help='Dispatch to a virtual device instead of real input.')
+    p.add_argument('--trace', nargs='?', const='', metavar='PATH',
+                   help='Write a binary dispatch trace (default: <recording>.rrt).')
+    p.add_argument('--log-events', action='store_true', help='Debug-log every dispatched event (adds jitter).')
+    p.add_argument('--stream', action='store_true',
+                   help='Stream .rrec/.rrj recordings from disk instead of loading them first.')
+    p.add_argument('--repeat', type=int, default=1, help='Number of runs, 0 to loop until stopped.')
+    p.add_argument('--gap', type=float, default=0.0, help='Seconds between runs.')
+    p.add_argument('--coords', choices=COORDINATE_MODES, default=ABSOLUTE,
+                   help='Map recorded mouse coordinates: verbatim, scaled to this screen or relative to the cursor.')
+    p.add_argument('--screen', type=int, nargs=4, metavar=('LEFT', 'TOP', 'WIDTH', 'HEIGHT'),
+                   help='Playback screen geometry for --coords scaled (default: detected).')
+    p.add_argument('--read-ahead', type=int, default=DEFAULT_READ_AHEAD, help='Decoded chunks buffered per track.')
+    p.add_argument('--start', type=float, help='Start this many seconds into the recording.')
+    p.add_argument('--end', type=float, help='Stop this many seconds into the recording.')
+    p.add_argument('--rate', type=positive_float, metavar='HZ', help='Resample mouse moves to this rate (e.g. 125, 250, 500).')
+    p.add_argument('--interpolation', choices=INTERPOLATIONS, default=LINEAR, help='How --rate interpolates the path.')
+    p.add_argument('--skip-stale', action='store_true',
+                   help='Drop overdue moves when playback falls behind (always on with --rate).')
+    add_instrumentation_options(p)
+    add_simplify_options(p)
+
+    p = sub.add_parser('record', help='Record until the stop key is pressed.')
+    p.add_argument('path', help='Output file (.json, .rrec or .rrj).')
+    p.add_argument('--countdown', type=float, default=0.001)
+    p.add_argument('--stop-key', default='esc')
+    p.add_argument('--compress', action='store_true')
+    p.add_argument('--no-journal', action='store_true', help='Do not journal the recording while it runs.')
+    add_instrumentation_options(p)
+
+    p = sub.add_parser('compose', help='Save a composition that plays other recordings as segments.')
+    p.add_argument('path', help='Output composition file (.rcomp).')
+    p.add_argument('segments', nargs='+', metavar='SEGMENT',
+                   help='PATH[,offset=SECONDS][,speed=X][,repeat=N]; without an offset a segment '
+                        'starts when the previous one ends.')
+    p.add_argument('--expand', metavar='PATH', help='Also write the composition as one expanded recording.')
+    p.add_argument('--compress', action='store_true')
+
+    p = sub.add_parser('recover', help='Save the newest unsaved recording from the session journals.')
+    p.add_argument('path', help='Output file (.json, .rrec or .rrj).')
+    p.add_argument('--journal-dir', default=default_journal_dir())
+    p.add_argument('--compress', action='store_true')
+
+    p = sub.add_parser('convert', help='Convert between JSON and binary recordings.')
+    add_batch_options(p)
+    p.add_argument('--to', choices=('json', 'rrec'), help='Target format (default: the other one).')
+    p.add_argument('--out', help='Output file or directory.')
+    p.add_argument('--compress', action='store_true')
+
+    p = sub.add_parser('inspect', help='Show recording statistics.')
+    add_batch_options(p)
+
+    p = sub.add_parser('validate', help='Check recordings for malformed or inconsistent events.')
+    add_batch_options(p)
+
+    p = sub.add_parser('diff', help='Compare recordings event by event and by mouse path.')
+    add_batch_options(p)
+    p.add_argument('other', help='Recording, or directory of recordings with the same names, to compare against.')
+    p.add_argument('--time-tolerance', type=float, default=0.001,
+                   help='Seconds matched events may move and still count as identical.')
+
+    p = sub.add_parser('analyze', help='Show event density, idle gaps and key hold times.')
+    add_batch_options(p)
+    p.add_argument('--bin', type=float, default=1.0, help='Histogram bin width in seconds.')
+    p.add_argument('--min-gap', type=float, default=1.0, help='Shortest pause counted as idle, in seconds.')
+
+    p = sub.add_parser('filter', help='Write a filtered/simplified copy of recordings.')
+    add_batch_options(p)
+    add_simplify_options(p)
+    p.add_argument('--out', help='Output file or directory (default: <name>.filtered.<ext>).')
+    p.add_argument('--compress', action='store_true')
+
+    p = sub.add_parser('normalize', help='Write copies with idle gaps capped, move bursts merged and times quantized.')
+    add_batch_options(p)
+    p.add_argument('--max-idle', type=positive_float, help='Shorten pauses longer than this many seconds to it.')
+    p.add_argument('--merge-distance', type=float, help='Merge consecutive moves within this many pixels.')
+    p.add_argument('--merge-interval', type=float, default=0.002, help='... and this many seconds.')
+    p.add_argument('--tick', type=float, help='Round timestamps to multiples of this many seconds.')
+    p.add_argument('--out', help='Output file or directory (default: <name>.normalized.<ext>).')
+    p.add_argument('--compress', action='store_true')
+
+    p = sub.add_parser('bench', help='Time load, filter, simplify and save.')
+    add_batch_options(p)
+    p.add_argument('--tolerance', type=float, default=2.0)
+
+    p = sub.add_parser('trace', help='Summarise playback trace files.')
+    p.add_argument('paths', nargs='+')
+    p.add_argument('--json', action='store_true', help='Print results as JSON.')
+
+    return parser
+
+
+def cmd_trace(args) -> int:
+    summaries = []
+    for path in args.paths:
+        summaries.append({'path': path, **Trace(path).summary()})
+    if args.json:
+        print(json.dumps(summaries, indent=4))
+    else:
+        for summary in summaries:
+            print(summary.pop('path') + ':')
+            for key, value in summary.items():
+                print(f"  {key}: {value:.6g}" if isinstance(value, float) else f"  {key}: {value}")
+    return 0
+
+
+def main(argv: list = None) -> int:
+    args = build_parser().parse_args(argv)
+    setup_logging((logging.WARNING, logging.INFO, logging.DEBUG)[min(args.verbose, 2)])
+    if args.command == 'trace':
+        return cmd_trace(args)
+    if args.command == 'play':
+        return cmd_play(args)
+    if args.command == 'record':
+        return cmd_record(args)
+    if args.command == 'recover':
+        return cmd_recover(args)
+    if args.command == 'compose':
+        return cmd_compose(args)
+
+    if args.command == 'filter' and not (args.essential or args.simplify):
+        print("filter: pass --essential or --simplify MODE")
+        return 2
+    if args.command == 'normalize' and args.max_idle is None and args.merge_distance is None and not args.tick:
+        print("normalize: pass --max-idle, --merge-distance or --tick")
+        return 2
+
+    options = {key: value for key, value in vars(args).items() if key not in ('command', 'paths', 'jobs')}
+    paths = expand_paths(args.paths)
+    if not paths:
+        print("No recordings found.")
+        return 1
+    out = options.get('out')
+    if out is not None and len(paths) > 1 and not os.path.isdir(out):
+        print(f"{args.command}: --out must be an existing directory when processing several recordings")
+        return 2
+    return run_batch(args.command, paths, options, args.jobs)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
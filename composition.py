@@ -0,0 +1,258 @@
+import heapq
+import json
+import os
+from itertools import chain
+from operator import itemgetter
+
+from event_store import new_recording
+from playback_scheduler import KEYBOARD, MOUSE
+from recording_format import load_recording
+from recorder_log import get_logger
+
+log = get_logger('composition')
+
+# A composition is a recording made of references to other recordings
+# (segments), each placed at a time offset, played at its own speed and
+# repeated. Nothing is copied: the segments' events are re-timed on the fly
+# and merged into one timeline of (t, source, row) items, with rows shaped
+# like recording_stream's (index, kind, name, x, y, delta, t), so
+# PlaybackScheduler.run and BGSI_Recorder.dispatch_row play it directly.
+# Segments may themselves be compositions.
+
+COMPOSITION_EXTENSION = '.rcomp'
+COMPOSITION_FORMAT = 'riftrecorder-composition'
+COMPOSITION_VERSION = 1
+
+# Keyboard sorts before mouse on equal times, as in merge_timeline; ties
+# between segments keep segment order (heapq.merge is stable)
+_ORDER = itemgetter(0, 1)
+
+
+def is_composition(path: str) -> bool:
+    return path.lower().endswith(COMPOSITION_EXTENSION)
+
+
+class RecordingCache:
+    """
+    Loaded recordings and compositions by file, shared by every segment that
+    references them. An entry is reloaded when its file's mtime or size
+    changes. Each top-level Composition owns one (nested compositions share
+    their parent's), so the loaded recordings are freed with it.
+    """
+
+    def __init__(self):
+        self.loads = 0
+        self._entries = {}
+
+    @staticmethod
+    def _key(path: str) -> str:
+        return os.path.normcase(os.path.realpath(path))
+
+    def get(self, path: str):
+        # EventTrack recording dict, or Composition for .rcomp files
+        key = self._key(path)
+        stat = os.stat(key)
+        version = (stat.st_mtime_ns, stat.st_size)
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] == version:
+            return entry[1]
+        if is_composition(path):
+            source = Composition.load(path, self)
+        else:
+            source = load_recording(path)
+        self.loads += 1
+        self._entries[key] = (version, source)
+        return source
+
+    def clear(self):
+        self._entries.clear()
+
+
+
+class Segment:
+    """
+    One recording in a composition.
+
+    `offset` is where it starts, in seconds from the start of the
+    composition, or None to start right after the previous segment ends.
+    `speed` scales its own timing (2 plays it twice as fast) and `repeat`
+    plays it that many times back to back.
+    """
+
+    def __init__(self, path: str, offset: float = None, speed: float = 1.0, repeat: int = 1):
+        if offset is not None and offset < 0:
+            raise ValueError(f"Segment offset must not be negative, got {offset}")
+        if speed <= 0:
+            raise ValueError(f"Segment speed must be positive, got {speed}")
+        if repeat < 1:
+            raise ValueError(f"Segment repeat must be at least 1, got {repeat}")
+        self.path = os.path.abspath(path)
+        self.offset = offset
+        self.speed = speed
+        self.repeat = repeat
+
+    def __repr__(self):
+        return f"<Segment {os.path.basename(self.path)} offset={self.offset} speed={self.speed} x{self.repeat}>"
+
+    def to_dict(self, base_dir: str) -> dict:
+        # Paths are stored relative to the composition file where possible
+        try:
+            path = os.path.relpath(self.path, base_dir)
+        except ValueError:
+            path = self.path  # Different drive on Windows
+        return {'path': path.replace(os.sep, '/'), 'offset': self.offset, 'speed': self.speed,
+                'repeat': self.repeat}
+
+    @classmethod
+    def from_dict(cls, data: dict, base_dir: str) -> 'Segment':
+        path = os.path.join(base_dir, data['path'].replace('/', os.sep))
+        return cls(path, data.get('offset'), data.get('speed', 1.0), data.get('repeat', 1))
+
+
+def recording_duration(recorded: dict) -> float:
+    return max((track.t[-1] for track in (recorded['keyboard'], recorded['mouse']) if track), default=0.0)
+
+
+def _track_items(track, source: int, base: float, factor: float):
+    # One pass over a track, re-timed to base + t * factor
+    kinds, xs, ys, deltas, times = track.kind, track.x, track.y, track.delta, track.t
+    name = track.name
+    for i in range(len(track)):
+        t = base + times[i] * factor
+        yield t, source, (i, kinds[i], name(i), xs[i], ys[i], deltas[i], t)
+
+
+def _passes(source, track_name: str, source_id: int, start: float, step: float, repeat: int, factor: float):
+    # Every pass of a segment over one of its tracks (or over a nested
+    # composition's timeline); passes do not overlap, so they are chained
+    for k in range(repeat):
+        base = start + k * step
+        if track_name is None:
+            yield source.timeline(base, factor)
+        else:
+            yield _track_items(source[track_name], source_id, base, factor)
+
+
+class Composition:
+    """Segments referencing recordings on disk, resolved through a RecordingCache."""
+
+    def __init__(self, segments: list = None, cache: RecordingCache = None):
+        self.segments = list(segments or ())
+        self.cache = RecordingCache() if cache is None else cache
+        self._resolving = False
+
+    def add(self, path: str, offset: float = None, speed: float = 1.0, repeat: int = 1) -> Segment:
+        segment = Segment(path, offset, speed, repeat)
+        self.segments.append(segment)
+        return segment
+
+    def source(self, segment: Segment):
+        return self.cache.get(segment.path)
+
+    def pass_duration(self, segment: Segment) -> float:
+        # Length of one pass of a segment, at its speed
+        source = self.source(segment)
+        if isinstance(source, Composition):
+            return source.duration / segment.speed
+        return recording_duration(source) / segment.speed
+
+    def layout(self) -> list:
+        # (segment, start, pass duration) for every segment, in seconds. Loads
+        # the segments, and fails on a composition that includes itself.
+        if self._resolving:
+            raise ValueError("Composition includes itself")
+        self._resolving = True
+        try:
+            placed = []
+            end = 0.0
+            for segment in self.segments:
+                start = end if segment.offset is None else segment.offset
+                step = self.pass_duration(segment)
+                placed.append((segment, start, step))
+                end = start + step * segment.repeat
+            return placed
+        finally:
+            self._resolving = False
+
+    @property
+    def duration(self) -> float:
+        return max((start + step * segment.repeat for segment, start, step in self.layout()), default=0.0)
+
+    def timeline(self, base: float = 0.0, factor: float = 1.0):
+        # Merged (t, source, row) items of every segment, produced lazily as
+        # they are consumed; `base` and `factor` re-time the whole composition
+        # when it is nested in another one
+        streams = []
+        for segment, start, step in self.layout():
+            source = self.source(segment)
+            scale = factor / segment.speed
+            first = base + start * factor
+            step *= factor
+            if isinstance(source, Composition):
+                streams.append(chain.from_iterable(
+                    _passes(source, None, None, first, step, segment.repeat, scale)))
+            else:
+                for source_id, track_name in ((KEYBOARD, 'keyboard'), (MOUSE, 'mouse')):
+                    streams.append(chain.from_iterable(
+                        _passes(source, track_name, source_id, first, step, segment.repeat, scale)))
+        return heapq.merge(*streams, key=_ORDER)
+
+    def __iter__(self):
+        return self.timeline()
+
+    def __len__(self):
+        # Events played, counting repeats
+        total = 0
+        for segment, _, _ in self.layout():
+            source = self.source(segment)
+            events = len(source) if isinstance(source, Composition) else len(source['keyboard']) + len(source['mouse'])
+            total += events * segment.repeat
+        return total
+
+    def flatten(self) -> dict:
+        # Expanded EventTrack recording, for the filters and file formats that
+        # need every event in memory. The mouse track keeps the capture
+        # geometry only when all segments share it.
+        recorded = new_recording()
+        tracks = (recorded['keyboard'], recorded['mouse'])
+        for t, source, (_, kind, name, x, y, delta, _) in self.timeline():
+            track = tracks[source]
+            track._append_row(kind, track.intern(name), x, y, delta, t)
+        geometries = set(self.geometries())
+        if len(geometries) == 1:
+            recorded['mouse'].geometry = geometries.pop()
+        elif len(geometries) > 1:
+            log.warning("Segments were captured on different screens; the flattened recording has no geometry")
+        return recorded
+
+    def geometries(self):
+        # Capture geometry of every referenced recording
+        for segment in self.segments:
+            source = self.source(segment)
+            if isinstance(source, Composition):
+                yield from source.geometries()
+            else:
+                yield source['mouse'].geometry
+
+    def save(self, path: str):
+        # References only: paths relative to the composition file, no events
+        base_dir = os.path.dirname(os.path.abspath(path))
+        data = {
+            'format': COMPOSITION_FORMAT,
+            'version': COMPOSITION_VERSION,
+            'segments': [segment.to_dict(base_dir) for segment in self.segments],
+        }
+        with open(path, 'w') as f:
+            json.dump(data, f, indent=4)
+
+    @classmethod
+    def load(cls, path: str, cache: RecordingCache = None) -> 'Composition':
+        # Segments are only loaded when the composition is laid out or played
+        with open(path, 'r') as f:
+            data = json.load(f)
+        if not isinstance(data, dict) or data.get('format') != COMPOSITION_FORMAT:
+            raise ValueError(f"{path} is not a RiftRecorder composition")
+        if data.get('version', 0) > COMPOSITION_VERSION:
+            raise ValueError(f"{path} was written by a newer version (composition format {data['version']})")
+        base_dir = os.path.dirname(os.path.abspath(path))
+        return cls([Segment.from_dict(segment, base_dir) for segment in data.get('segments', ())], cache)
@@ -0,0 +1,100 @@
+from collections import namedtuple
+from array import array
+
+import numpy as np
+
+from event_store import MOVE
+
+# How recorded mouse coordinates are mapped onto the screen at playback:
+#   absolute  replay the recorded pixels verbatim (the original behaviour)
+#   scaled    map the capture geometry onto the playback geometry, so a path
+#             recorded at 1920x1080 lands on the same relative spots at 2560x1440
+#   relative  keep the recorded pixel deltas but start from the current cursor
+ABSOLUTE = 'absolute'
+SCALED = 'scaled'
+RELATIVE = 'relative'
+MODES = (ABSOLUTE, SCALED, RELATIVE)
+
+# Screen area in pixels; left/top can be negative on multi-monitor desktops
+Geometry = namedtuple('Geometry', ['left', 'top', 'width', 'height'])
+
+# 2x3 affine (a, b, c, d, e, f): x' = a*x + b*y + c, y' = d*x + e*y + f
+IDENTITY = (1.0, 0.0, 0.0, 0.0, 1.0, 0.0)
+
+
+def scale_transform(source: Geometry, target: Geometry) -> tuple:
+    # Maps `source` onto `target`, each axis scaled independently
+    sx = target.width / source.width
+    sy = target.height / source.height
+    return (sx, 0.0, target.left - source.left * sx,
+            0.0, sy, target.top - source.top * sy)
+
+
+def translate_transform(dx: float, dy: float) -> tuple:
+    return (1.0, 0.0, float(dx), 0.0, 1.0, float(dy))
+
+
+def first_move(track):
+    kinds = track.kind
+    for i in range(len(kinds)):
+        if kinds[i] == MOVE:
+            return track.x[i], track.y[i]
+    return None
+
+
+def _has_area(geometry) -> bool:
+    return geometry is not None and geometry[2] > 0 and geometry[3] > 0
+
+
+def playback_transform(mode: str, track, playback_geometry: Geometry = None, cursor: tuple = None):
+    """
+    The affine to apply to a mouse track for `mode`, or None when the
+    coordinates should be used as recorded (absolute mode, or the information
+    the mode needs is missing). May be IDENTITY.
+    """
+    if mode == ABSOLUTE or mode is None:
+        return None
+    if mode == SCALED:
+        # A geometry without a positive size is as good as unknown, like the
+        # all-zero geometry of a journal recorded without one
+        if not _has_area(track.geometry) or not _has_area(playback_geometry):
+            return None
+        transform = scale_transform(Geometry(*track.geometry), Geometry(*playback_geometry))
+    elif mode == RELATIVE:
+        start = first_move(track)
+        if start is None or cursor is None:
+            return None
+        transform = translate_transform(cursor[0] - start[0], cursor[1] - start[1])
+    else:
+        raise ValueError(f"Unknown coordinate mode {mode!r}, expected one of {MODES}")
+    return transform
+
+
+def transform_track(track, transform: tuple):
+    """
+    New track with every move run through `transform` in one vectorized pass,
+    so playback dispatches ready-made pixels. Other rows are shared unchanged.
+    """
+    a, b, c, d, e, f = transform
+    columns = track.columns_numpy()
+    moves = columns['kind'] == MOVE
+    x = columns['x'].astype(np.float64)
+    y = columns['y'].astype(np.float64)
+    new_x = np.where(moves, np.rint(a * x + b * y + c), x).astype(np.int32)
+    new_y = np.where(moves, np.rint(d * x + e * y + f), y).astype(np.int32)
+    del columns
+
+    result = track.take(())
+    for column in ('kind', 'code', 'delta', 't'):
+        setattr(result, column, array(getattr(track, column).typecode, getattr(track, column)))
+    result.x = array('i', new_x.tobytes())
+    result.y = array('i', new_y.tobytes())
+    return result
+
+
+def transform_point(transform: tuple, x: int, y: int) -> tuple:
+    # A single point, for the few positions restored outside the vectorized pass
+    if transform is None:
+        return x, y
+    a, b, c, d, e, f = transform
+    return int(round(a * x + b * y + c)), int(round(d * x + e * y + f))
@@ -0,0 +1,193 @@
+from array import array
+
+# Event kind opcodes, shared by the in-memory store and the binary file format
+KEY_DOWN = 0
+KEY_UP = 1
+MOVE = 2
+BUTTON_DOWN = 3
+BUTTON_UP = 4
+SCROLL = 5
+
+# Name id used for events without a key/button name (e.g. keyboard events the
+# OS could not name)
+NO_NAME = 0xFFFF
+
+# Top level key of the capture geometry in the dict/JSON form, see EventTrack.geometry
+GEOMETRY_KEY = 'geometry'
+
+
+class EventTrack:
+    """
+    Columnar storage for one track ('keyboard' or 'mouse') of a recording.
+
+    Each event is a row across typed parallel arrays instead of a Python list,
+    roughly 27 bytes per event instead of 100+. Key and button names are
+    interned into `names` and referenced by id. The arrays grow geometrically,
+    so appends from the input hooks are amortized O(1).
+
+    Indexing and iteration still produce the legacy list form
+    (['move', x, y, t], ['click', button, pressed, t], ['scroll', delta, t]
+    and [pressed, name, t]) so existing code keeps working.
+    """
+
+    def __init__(self):
+        self.kind = array('B')
+        self.code = array('H')
+        self.x = array('i')
+        self.y = array('i')
+        self.delta = array('d')
+        self.t = array('d')
+        self.names = []
+        self._name_ids = {}
+        # (left, top, width, height) of the screen area the coordinates were
+        # captured in, or None if unknown; see coordinate_space
+        self.geometry = None
+
+    # --- Appending ---
+
+    def intern(self, name) -> int:
+        if name is None:
+            return NO_NAME
+        name_id = self._name_ids.get(name)
+        if name_id is None:
+            if len(self.names) >= NO_NAME:
+                raise ValueError("Too many distinct key/button names in one track")
+            name_id = len(self.names)
+            self.names.append(name)
+            self._name_ids[name] = name_id
+        return name_id
+
+    def _append_row(self, kind: int, code: int, x: int, y: int, delta: float, t: float):
+        self.kind.append(kind)
+        self.code.append(code)
+        self.x.append(x)
+        self.y.append(y)
+        self.delta.append(delta)
+        self.t.append(t)
+
+    def append_key(self, pressed: bool, name, t: float):
+        self._append_row(KEY_DOWN if pressed else KEY_UP, self.intern(name), 0, 0, 0.0, t)
+
+    def append_move(self, x: int, y: int, t: float):
+        self._append_row(MOVE, NO_NAME, int(x), int(y), 0.0, t)
+
+    def append_click(self, button, pressed: bool, t: float):
+        self._append_row(BUTTON_DOWN if pressed else BUTTON_UP, self.intern(button), 0, 0, 0.0, t)
+
+    def append_scroll(self, delta: float, t: float):
+        self._append_row(SCROLL, NO_NAME, 0, 0, float(delta), t)
+
+    def append(self, event: list):
+        # Accepts the legacy list form of either track
+        event_type = event[0]
+        if isinstance(event_type, bool):
+            self.append_key(event_type, event[1], event[2])
+        elif event_type == 'move':
+            self.append_move(event[1], event[2], event[3])
+        elif event_type == 'click':
+            self.append_click(event[1], event[2], event[3])
+        elif event_type == 'scroll':
+            self.append_scroll(event[1], event[2])
+        else:
+            raise ValueError(f"Unknown event type: {event_type!r}")
+
+    def extend(self, events):
+        for event in events:
+            self.append(event)
+
+    # --- Reading ---
+
+    def name(self, index: int):
+        code = self.code[index]
+        return None if code == NO_NAME else self.names[code]
+
+    def __len__(self):
+        return len(self.kind)
+
+    def __bool__(self):
+        return len(self.kind) > 0
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return self.take(range(*index.indices(len(self))))
+        kind = self.kind[index]
+        t = self.t[index]
+        if kind == MOVE:
+            return ['move', self.x[index], self.y[index], t]
+        if kind == BUTTON_DOWN or kind == BUTTON_UP:
+            return ['click', self.name(index), kind == BUTTON_DOWN, t]
+        if kind == SCROLL:
+            return ['scroll', self.delta[index], t]
+        return [kind == KEY_DOWN, self.name(index), t]
+
+    def __iter__(self):
+        for i in range(len(self.kind)):
+            yield self[i]
+
+    def __repr__(self):
+        return f"<EventTrack {len(self)} events>"
+
+    def to_list(self) -> list:
+        return list(self)
+
+    def take(self, indices) -> 'EventTrack':
+        # New track holding the rows at `indices` (any sequence or NumPy
+        # integer array), in that order
+        import numpy as np
+        indices = np.asarray(indices, dtype=np.intp)
+        track = EventTrack()
+        track.names = list(self.names)
+        track._name_ids = dict(self._name_ids)
+        track.geometry = self.geometry
+        for column, values in self.columns_numpy().items():
+            setattr(track, column, array(getattr(self, column).typecode, values[indices].tobytes()))
+        return track
+
+    def columns_numpy(self) -> dict:
+        # Zero-copy NumPy views over the columns. The track must not be
+        # appended to while the views are alive.
+        import numpy as np
+        return {
+            'kind': np.frombuffer(self.kind, dtype=np.uint8),
+            'code': np.frombuffer(self.code, dtype=np.uint16),
+            'x': np.frombuffer(self.x, dtype=np.int32),
+            'y': np.frombuffer(self.y, dtype=np.int32),
+            'delta': np.frombuffer(self.delta, dtype=np.float64),
+            't': np.frombuffer(self.t, dtype=np.float64),
+        }
+
+    @classmethod
+    def from_list(cls, events) -> 'EventTrack':
+        track = cls()
+        track.extend(events)
+        return track
+
+
+def new_recording() -> dict:
+    return {
+        'keyboard': EventTrack(),
+        'mouse': EventTrack(),
+    }
+
+
+def as_tracks(recorded: dict) -> dict:
+    # Converts a legacy {'keyboard': [...], 'mouse': [...]} dict; tracks pass through
+    tracks = {
+        track: events if isinstance(events, EventTrack) else EventTrack.from_list(events)
+        for track, events in recorded.items() if track != GEOMETRY_KEY
+    }
+    geometry = recorded.get(GEOMETRY_KEY)
+    if geometry is not None and 'mouse' in tracks and tracks['mouse'].geometry is None:
+        tracks['mouse'].geometry = tuple(geometry)
+    return tracks
+
+
+def to_lists(recorded: dict) -> dict:
+    lists = {
+        track: events.to_list() if isinstance(events, EventTrack) else events
+        for track, events in recorded.items()
+    }
+    geometry = getattr(recorded.get('mouse'), 'geometry', None)
+    if geometry is not None:
+        lists[GEOMETRY_KEY] = list(geometry)
+    return lists
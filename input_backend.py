@@ -0,0 +1,284 @@
+import sys
+import threading
+import time
+from collections import namedtuple
+
+from coordinate_space import Geometry
+
+
+class InputBackend:
+    """
+    Source of input hooks and sink for injected input used by BGSI_Recorder.
+
+    Hooked callbacks receive the backend's own event objects; the recorder
+    tells them apart with `type(event) is backend.MoveEvent` etc., so every
+    backend exposes its event classes and the KEY_DOWN marker as attributes.
+    Keyboard events have `event_type`, `name` and `time`, mouse events follow
+    the `mouse` library shapes. `time` is a time.time() stamp.
+    """
+
+    KEY_DOWN = 'down'
+    MoveEvent = None
+    ButtonEvent = None
+    WheelEvent = None
+
+    def hook_keyboard(self, callback):
+        raise NotImplementedError
+
+    def unhook_keyboard(self, callback):
+        raise NotImplementedError
+
+    def unhook_all_keyboard(self):
+        raise NotImplementedError
+
+    def hook_mouse(self, callback):
+        raise NotImplementedError
+
+    def unhook_mouse(self, callback):
+        raise NotImplementedError
+
+    def resolve_key(self, name):
+        # What press_key/release_key should be given for a recorded key name.
+        # Called once per distinct key when a playback plan is compiled.
+        return name
+
+    def press_key(self, name):
+        raise NotImplementedError
+
+    def release_key(self, name):
+        raise NotImplementedError
+
+    def move(self, x: int, y: int):
+        raise NotImplementedError
+
+    def press_button(self, button):
+        raise NotImplementedError
+
+    def release_button(self, button):
+        raise NotImplementedError
+
+    def wheel(self, delta: float):
+        raise NotImplementedError
+
+    def screen_geometry(self):
+        # Geometry of the (virtual) desktop mouse coordinates refer to, or None if unknown
+        return None
+
+    def position(self):
+        # Current cursor position, or None if unknown
+        return None
+
+
+class SystemBackend(InputBackend):
+    """Real input through the global `keyboard` and `mouse` modules."""
+
+    def __init__(self):
+        # Imported here so the virtual backend works without them installed
+        import keyboard
+        import mouse
+        self._keyboard = keyboard
+        self._mouse = mouse
+        self.KEY_DOWN = keyboard.KEY_DOWN
+        self.MoveEvent = mouse.MoveEvent
+        self.ButtonEvent = mouse.ButtonEvent
+        self.WheelEvent = mouse.WheelEvent
+
+    def hook_keyboard(self, callback):
+        self._keyboard.hook(callback)
+
+    def unhook_keyboard(self, callback):
+        self._keyboard.unhook(callback)
+
+    def unhook_all_keyboard(self):
+        self._keyboard.unhook_all()
+
+    def hook_mouse(self, callback):
+        self._mouse.hook(callback)
+
+    def unhook_mouse(self, callback):
+        self._mouse.unhook(callback)
+
+    def resolve_key(self, name):
+        # A scan code skips the name parsing and lookup `keyboard` otherwise
+        # repeats on every press and release
+        try:
+            return self._keyboard.key_to_scan_codes(name)[0]
+        except (ValueError, TypeError, IndexError):
+            return name
+
+    def press_key(self, name):
+        self._keyboard.press(name)
+
+    def release_key(self, name):
+        self._keyboard.release(name)
+
+    def move(self, x: int, y: int):
+        self._mouse.move(x, y)
+
+    def press_button(self, button):
+        self._mouse.press(button)
+
+    def release_button(self, button):
+        self._mouse.release(button)
+
+    def wheel(self, delta: float):
+        self._mouse.wheel(delta)
+
+    def screen_geometry(self):
+        if sys.platform != 'win32':
+            return None
+        import ctypes
+        metrics = ctypes.windll.user32.GetSystemMetrics
+        # SM_XVIRTUALSCREEN, SM_YVIRTUALSCREEN, SM_CXVIRTUALSCREEN, SM_CYVIRTUALSCREEN
+        return Geometry(metrics(76), metrics(77), metrics(78), metrics(79))
+
+    def position(self):
+        return self._mouse.get_position()
+
+
+_default_backend = None
+
+
+def default_backend() -> InputBackend:
+    # One shared SystemBackend, created on first use
+    global _default_backend
+    if _default_backend is None:
+        _default_backend = SystemBackend()
+    return _default_backend
+
+
+VirtualKeyEvent = namedtuple('VirtualKeyEvent', ['event_type', 'name', 'time'])
+VirtualMoveEvent = namedtuple('VirtualMoveEvent', ['x', 'y', 'time'])
+VirtualButtonEvent = namedtuple('VirtualButtonEvent', ['event_type', 'button', 'time'])
+VirtualWheelEvent = namedtuple('VirtualWheelEvent', ['delta', 'time'])
+
+
+class VirtualBackend(InputBackend):
+    """
+    In-memory input device for tests and benchmarks; needs no hooks or root.
+
+    Injected actions (press_key, move, ...) are appended to `actions` as
+    (perf_counter_ns, action, args) tuples instead of reaching the OS. The
+    emit_* methods feed synthetic events to the hooked callbacks on the
+    calling thread, and synthesize_moves/start_synthesis generate paced
+    input streams at a configurable rate.
+    """
+
+    KEY_DOWN = 'down'
+    KEY_UP = 'up'
+    MoveEvent = VirtualMoveEvent
+    ButtonEvent = VirtualButtonEvent
+    WheelEvent = VirtualWheelEvent
+
+    def __init__(self, geometry: Geometry = Geometry(0, 0, 1920, 1080)):
+        self.actions = []
+        self.geometry = geometry
+        self.cursor = (0, 0)
+        self._keyboard_hooks = []
+        self._mouse_hooks = []
+        self._lock = threading.Lock()
+
+    # --- Hooks ---
+
+    def hook_keyboard(self, callback):
+        with self._lock:
+            self._keyboard_hooks = self._keyboard_hooks + [callback]
+
+    def unhook_keyboard(self, callback):
+        with self._lock:
+            self._keyboard_hooks = [cb for cb in self._keyboard_hooks if cb != callback]
+
+    def unhook_all_keyboard(self):
+        with self._lock:
+            self._keyboard_hooks = []
+
+    def hook_mouse(self, callback):
+        with self._lock:
+            self._mouse_hooks = self._mouse_hooks + [callback]
+
+    def unhook_mouse(self, callback):
+        with self._lock:
+            self._mouse_hooks = [cb for cb in self._mouse_hooks if cb != callback]
+
+    @property
+    def hooked(self) -> bool:
+        return bool(self._keyboard_hooks and self._mouse_hooks)
+
+    # --- Synthetic input ---
+
+    def emit_key(self, name, down: bool = True, t: float = None):
+        event = VirtualKeyEvent(self.KEY_DOWN if down else self.KEY_UP, name, time.time() if t is None else t)
+        for callback in self._keyboard_hooks:
+            callback(event)
+
+    def emit_move(self, x: int, y: int, t: float = None):
+        event = VirtualMoveEvent(x, y, time.time() if t is None else t)
+        for callback in self._mouse_hooks:
+            callback(event)
+
+    def emit_button(self, button, down: bool = True, t: float = None):
+        event = VirtualButtonEvent('down' if down else 'up', button, time.time() if t is None else t)
+        for callback in self._mouse_hooks:
+            callback(event)
+
+    def emit_wheel(self, delta: float, t: float = None):
+        event = VirtualWheelEvent(delta, time.time() if t is None else t)
+        for callback in self._mouse_hooks:
+            callback(event)
+
+    def synthesize_moves(self, count: int, rate_hz: float = 1000.0, realtime: bool = True,
+                         origin: tuple = (0, 0), step: tuple = (1, 0)) -> int:
+        # Emits `count` moves along a straight line. With realtime=True they
+        # are paced at rate_hz on the monotonic clock, otherwise emitted as
+        # fast as possible with timestamps spaced 1/rate_hz apart.
+        # Returns the elapsed wall time in nanoseconds.
+        interval_ns = int(1e9 / rate_hz)
+        start_ns = time.perf_counter_ns()
+        start_t = time.time()
+        x, y = origin
+        dx, dy = step
+        for i in range(count):
+            if realtime:
+                deadline = start_ns + i * interval_ns
+                while time.perf_counter_ns() < deadline:
+                    pass
+                self.emit_move(x + i * dx, y + i * dy)
+            else:
+                self.emit_move(x + i * dx, y + i * dy, start_t + i * interval_ns / 1e9)
+        return time.perf_counter_ns() - start_ns
+
+    def start_synthesis(self, count: int, rate_hz: float = 1000.0, **kwargs) -> threading.Thread:
+        # Same as synthesize_moves on a background thread, like a real hook thread
+        thread = threading.Thread(target=self.synthesize_moves, args=(count, rate_hz), kwargs=kwargs, daemon=True)
+        thread.start()
+        return thread
+
+    # --- Injected output ---
+
+    def _record(self, action: str, *args):
+        self.actions.append((time.perf_counter_ns(), action, args))
+
+    def press_key(self, name):
+        self._record('press_key', name)
+
+    def release_key(self, name):
+        self._record('release_key', name)
+
+    def move(self, x: int, y: int):
+        self.cursor = (x, y)
+        self._record('move', x, y)
+
+    def press_button(self, button):
+        self._record('press_button', button)
+
+    def release_button(self, button):
+        self._record('release_button', button)
+
+    def wheel(self, delta: float):
+        self._record('wheel', delta)
+
+    def screen_geometry(self):
+        return self.geometry
+
+    def position(self):
+        return self.cursor
@@ -0,0 +1,255 @@
+import cProfile
+import io
+import json
+import pstats
+import sys
+import threading
+import time
+from array import array
+from collections import Counter
+from contextlib import contextmanager
+
+# Where time goes in a record/play session. Phases (thread startup, load,
+# filter, compile, dispatch, ...) are timed into fixed-size histograms, so
+# instrumenting a long session costs no more memory than a short one.
+# Per-event timing (each backend dispatch, each hook callback) adds work to
+# the hot paths and is only done when Instrumentation.per_event is set.
+
+# Histogram buckets are powers of two of nanoseconds: bucket b holds
+# durations in [2**(b-1), 2**b), which covers 1ns to ~4.5 minutes
+HISTOGRAM_BUCKETS = 48
+
+# Profiler modes for Instrumentation(profile=...)
+CPROFILE = 'cprofile'
+SAMPLE = 'sample'
+PROFILE_MODES = (CPROFILE, SAMPLE)
+
+# Stack sampling interval, and how many functions a summary lists
+SAMPLE_INTERVAL = 0.001
+PROFILE_TOP = 25
+
+
+class Histogram:
+    """Count, total, min, max and log2-bucketed distribution of durations (ns)."""
+
+    def __init__(self):
+        self.buckets = array('Q', bytes(8 * HISTOGRAM_BUCKETS))
+        self.count = 0
+        self.total_ns = 0
+        self.min_ns = None
+        self.max_ns = 0
+
+    def add(self, duration_ns: int):
+        if duration_ns < 0:
+            duration_ns = 0
+        self.buckets[min(duration_ns.bit_length(), HISTOGRAM_BUCKETS - 1)] += 1
+        self.count += 1
+        self.total_ns += duration_ns
+        if self.min_ns is None or duration_ns < self.min_ns:
+            self.min_ns = duration_ns
+        if duration_ns > self.max_ns:
+            self.max_ns = duration_ns
+
+    def percentile(self, p: float) -> int:
+        # Upper bound of the bucket holding the p-th percentile, so within 2x
+        if not self.count:
+            return 0
+        wanted = p / 100 * self.count
+        seen = 0
+        for bucket, count in enumerate(self.buckets):
+            seen += count
+            if count and seen >= wanted:
+                return min(self.max_ns, (1 << bucket) - 1)
+        return self.max_ns
+
+    def summary(self) -> dict:
+        return {
+            'count': self.count,
+            'total_ms': self.total_ns / 1e6,
+            'mean_us': self.total_ns / self.count / 1e3 if self.count else 0.0,
+            'min_us': (self.min_ns or 0) / 1e3,
+            'p50_us': self.percentile(50) / 1e3,
+            'p99_us': self.percentile(99) / 1e3,
+            'max_us': self.max_ns / 1e3,
+        }
+
+
+class _SamplingProfiler:
+    # Samples the innermost frame of every thread each SAMPLE_INTERVAL; the
+    # counts are keyed by function, so memory is bounded by the code, not time
+    def __init__(self):
+        self.samples = Counter()
+        self.total = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='SamplingProfiler', daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def _run(self):
+        own = threading.get_ident()
+        while not self._stop.wait(SAMPLE_INTERVAL):
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                code = frame.f_code
+                self.samples[f"{code.co_filename}:{code.co_firstlineno}({code.co_name})"] += 1
+                self.total += 1
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def summary(self) -> dict:
+        return {
+            'mode': SAMPLE,
+            'samples': self.total,
+            'top': [{'function': name, 'samples': count, 'share': count / self.total}
+                    for name, count in self.samples.most_common(PROFILE_TOP)],
+        }
+
+
+class _CProfiler:
+    # Deterministic profile of the thread running the session
+    def __init__(self):
+        self.profile = cProfile.Profile()
+
+    def start(self):
+        self.profile.enable()
+
+    def stop(self):
+        self.profile.disable()
+
+    def summary(self) -> dict:
+        stats = pstats.Stats(self.profile, stream=io.StringIO())
+        rows = sorted(stats.stats.items(), key=lambda item: item[1][3], reverse=True)[:PROFILE_TOP]
+        return {
+            'mode': CPROFILE,
+            'top': [{'function': f"{filename}:{line}({name})", 'calls': calls,
+                     'own_ms': own * 1e3, 'cumulative_ms': cumulative * 1e3}
+                    for (filename, line, name), (_, calls, own, cumulative, _) in rows],
+        }
+
+    def dump(self, path: str):
+        self.profile.dump_stats(path)
+
+
+class Instrumentation:
+    """
+    Phase timings, counters and an optional profiler for BGSI_Recorder.
+
+    Hooks added with add_hook(callback) are called as callback(phase,
+    duration_ns) after every timed phase, on whichever thread ran it.
+    `profile` (CPROFILE or SAMPLE) wraps each session() in a profiler:
+    cProfile sees only the thread that runs the session, the sampler sees
+    every thread (listeners and consumer included) at SAMPLE_INTERVAL.
+    """
+
+    def __init__(self, per_event: bool = False, profile: str = None):
+        if profile is not None and profile not in PROFILE_MODES:
+            raise ValueError(f"Unknown profile mode {profile!r}, expected one of {PROFILE_MODES}")
+        self.per_event = per_event
+        self.profile = profile
+        self.histograms = {}
+        self.counters = Counter()
+        self.hooks = []
+        self.profiles = {}
+        self._lock = threading.Lock()
+
+    def add_hook(self, callback):
+        self.hooks.append(callback)
+
+    def remove_hook(self, callback):
+        self.hooks.remove(callback)
+
+    def histogram(self, name: str) -> Histogram:
+        histogram = self.histograms.get(name)
+        if histogram is None:
+            with self._lock:
+                histogram = self.histograms.setdefault(name, Histogram())
+        return histogram
+
+    def record(self, name: str, duration_ns: int):
+        self.histogram(name).add(duration_ns)
+        for hook in self.hooks:
+            hook(name, duration_ns)
+
+    def count(self, name: str, n: int = 1):
+        self.counters[name] += n
+
+    @contextmanager
+    def phase(self, name: str):
+        start = time.perf_counter_ns()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter_ns() - start)
+
+    def timed(self, name: str, function):
+        # `function` wrapped to record every call under `name`
+        histogram = self.histogram(name)
+        clock = time.perf_counter_ns
+
+        def call(*args):
+            start = clock()
+            try:
+                return function(*args)
+            finally:
+                histogram.add(clock() - start)
+        return call
+
+    @contextmanager
+    def session(self, name: str):
+        # Times the whole session and runs the profiler around it if enabled
+        profiler = None
+        if self.profile == CPROFILE:
+            profiler = _CProfiler()
+        elif self.profile == SAMPLE:
+            profiler = _SamplingProfiler()
+        if profiler is not None:
+            profiler.start()
+        try:
+            with self.phase(name):
+                yield
+        finally:
+            if profiler is not None:
+                profiler.stop()
+                self.profiles[name] = profiler
+
+    def reset(self):
+        with self._lock:
+            self.histograms = {}
+            self.counters = Counter()
+            self.profiles = {}
+
+    def summary(self) -> dict:
+        return {
+            'phases': {name: histogram.summary() for name, histogram in sorted(self.histograms.items())},
+            'counters': dict(sorted(self.counters.items())),
+            'profiles': {name: profiler.summary() for name, profiler in self.profiles.items()},
+        }
+
+    def export(self, path: str):
+        # JSON summary; with cProfile, the raw stats also go to <path>.<session>.prof
+        with open(path, 'w') as f:
+            json.dump(self.summary(), f, indent=4)
+        for name, profiler in self.profiles.items():
+            if isinstance(profiler, _CProfiler):
+                profiler.dump(f"{path}.{name}.prof")
+
+    def format(self) -> str:
+        lines = []
+        for name, histogram in sorted(self.histograms.items()):
+            s = histogram.summary()
+            if s['count'] == 1:
+                lines.append(f"{name}: {s['total_ms']:.2f}ms")
+            else:
+                lines.append(f"{name}: {s['count']} x mean {s['mean_us']:.1f}us p99 {s['p99_us']:.1f}us "
+                             f"max {s['max_us']:.1f}us (total {s['total_ms']:.2f}ms)")
+        for name, value in sorted(self.counters.items()):
+            lines.append(f"{name}: {value}")
+        for name, profiler in self.profiles.items():
+            top = profiler.summary()['top'][:5]
+            if top:
+                lines.append(f"{name} profile: " + ", ".join(entry['function'].rsplit('/', 1)[-1] for entry in top))
+        return "\n".join(lines)
@@ -0,0 +1,383 @@
+import glob
+import os
+import re
+import struct
+import sys
+import threading
+import time
+import zlib
+
+from event_store import EventTrack, new_recording, NO_NAME
+
+# Append-only recording journal (.rrj).
+#
+#   header  magic, version, recording start time (time.time()), capture
+#           geometry (version 2; all zero when unknown)
+#   batch*  u32 payload length, u32 crc32 of the payload, u8 flags, payload
+#
+# A payload holds the key/button names interned since the previous batch
+# followed by the new event rows. Every batch is self-checking, so after a
+# crash the journal is read up to the last intact batch. A batch flagged END
+# marks a recording that finished normally.
+JOURNAL_MAGIC = b'RRJ\x00'
+JOURNAL_VERSION = 2
+JOURNAL_EXTENSION = '.rrj'
+
+HEADER = struct.Struct('<4sHxxd')
+GEOMETRY = struct.Struct('<iiii')
+BATCH = struct.Struct('<IIB')
+NAME_COUNT = struct.Struct('<H')
+NAME = struct.Struct('<BHH')
+ROW_COUNT = struct.Struct('<I')
+ROW = struct.Struct('<BBHiidd')
+
+FLAG_END = 1
+TRACKS = ('keyboard', 'mouse')
+
+FLUSH_INTERVAL = 0.25
+FSYNC_INTERVAL = 1.0
+# Rows per batch, which bounds the writer's buffer regardless of backlog
+MAX_BATCH_ROWS = 16384
+
+
+def default_journal_dir() -> str:
+    return os.path.join(os.path.expanduser('~'), '.riftrecorder', 'sessions')
+
+
+def is_journal(path: str) -> bool:
+    with open(path, 'rb') as f:
+        return f.read(len(JOURNAL_MAGIC)) == JOURNAL_MAGIC
+
+
+def _encode_batch(names: list, rows: bytes, row_count: int, flags: int = 0) -> bytes:
+    parts = [NAME_COUNT.pack(len(names))]
+    for track_id, name_id, name in names:
+        encoded = str(name).encode('utf-8')
+        parts.append(NAME.pack(track_id, name_id, len(encoded)))
+        parts.append(encoded)
+    parts.append(ROW_COUNT.pack(row_count))
+    parts.append(rows)
+    payload = b''.join(parts)
+    return BATCH.pack(len(payload), zlib.crc32(payload), flags) + payload
+
+
+def _pack_rows(track_id: int, track: EventTrack, start: int, end: int) -> bytes:
+    pack = ROW.pack
+    kind, code, x, y, delta, t = track.kind, track.code, track.x, track.y, track.delta, track.t
+    return b''.join(pack(track_id, kind[i], code[i], x[i], y[i], delta[i], t[i]) for i in range(start, end))
+
+
+class JournalWriter:
+    """
+    Streams the rows appended to a recording's tracks into a journal file.
+
+    A background thread wakes every FLUSH_INTERVAL, appends any new rows as
+    batches of at most MAX_BATCH_ROWS and fsyncs at least every
+    FSYNC_INTERVAL. Rows count as committed once their `t` column entry
+    exists, which EventTrack appends last.
+    """
+
+    def __init__(self, path: str, recorded: dict, start_time: float,
+                 flush_interval: float = FLUSH_INTERVAL, fsync_interval: float = FSYNC_INTERVAL):
+        self.path = path
+        self.recorded = recorded
+        self.flush_interval = flush_interval
+        self.fsync_interval = fsync_interval
+        self.rows_written = 0
+        self.batches_written = 0
+        self._rows_done = {track: 0 for track in TRACKS}
+        self._names_done = {track: 0 for track in TRACKS}
+        self._stop = threading.Event()
+        self._thread = None
+        self._last_sync = time.monotonic()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._file = open(path, 'wb')
+        self._file.write(HEADER.pack(JOURNAL_MAGIC, JOURNAL_VERSION, start_time))
+        self._file.write(GEOMETRY.pack(*(recorded['mouse'].geometry or (0, 0, 0, 0))))
+        self._sync()
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='JournalWriter', daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while not self._stop.wait(self.flush_interval):
+            self.flush()
+            if time.monotonic() - self._last_sync >= self.fsync_interval:
+                self._sync()
+
+    def _sync(self):
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._last_sync = time.monotonic()
+
+    def flush(self):
+        # Only called from the writer thread, or after it has stopped
+        for track_id, track_name in enumerate(TRACKS):
+            track = self.recorded[track_name]
+            end = len(track.t)
+            start = self._rows_done[track_name]
+            while start < end:
+                stop = min(end, start + MAX_BATCH_ROWS)
+                # Names referenced by these rows were interned before the rows were appended
+                known = len(track.names)
+                names = [(track_id, i, track.names[i]) for i in range(self._names_done[track_name], known)]
+                self._names_done[track_name] = known
+                self._file.write(_encode_batch(names, _pack_rows(track_id, track, start, stop), stop - start))
+                self.rows_written += stop - start
+                self.batches_written += 1
+                start = stop
+            self._rows_done[track_name] = end
+        self._file.flush()
+
+    def close(self, complete: bool = True):
+        # Stops the writer, writes everything left and, if complete, the END marker
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.flush()
+        if complete:
+            self._file.write(_encode_batch([], b'', 0, FLAG_END))
+        self._sync()
+        self._file.close()
+
+
+class JournalInfo:
+    def __init__(self, path: str, start_time: float, complete: bool, batches: int, rows: int, truncated_bytes: int):
+        self.path = path
+        self.start_time = start_time
+        # False for a journal whose recording never finished (crash or kill)
+        self.complete = complete
+        self.batches = batches
+        self.rows = rows
+        # Bytes of a torn final batch that were ignored
+        self.truncated_bytes = truncated_bytes
+
+
+def _read_header(f, path: str):
+    # Returns (start time, geometry or None)
+    magic, version, start_time = HEADER.unpack(f.read(HEADER.size))
+    if magic != JOURNAL_MAGIC:
+        raise ValueError(f"{path} is not a recording journal")
+    if version > JOURNAL_VERSION:
+        raise ValueError(f"Unsupported journal version {version} (max {JOURNAL_VERSION})")
+    geometry = None
+    if version >= 2:
+        geometry = GEOMETRY.unpack(f.read(GEOMETRY.size))
+        if not any(geometry):
+            geometry = None
+    return start_time, geometry
+
+
+def _iter_batches(f):
+    # Yields (flags, payload, end offset) for each intact batch, reading one
+    # batch at a time and stopping at the first torn or corrupt one
+    offset = f.tell()
+    while True:
+        head = f.read(BATCH.size)
+        if len(head) < BATCH.size:
+            return
+        length, crc, flags = BATCH.unpack(head)
+        payload = f.read(length)
+        if len(payload) < length or zlib.crc32(payload) != crc:
+            return
+        offset += BATCH.size + length
+        yield flags, payload, offset
+
+
+def _decode_payload(payload: bytes):
+    # Returns ([(track id, name id, name)], row bytes)
+    position = 0
+    (name_count,) = NAME_COUNT.unpack_from(payload, position)
+    position += NAME_COUNT.size
+    names = []
+    for _ in range(name_count):
+        track_id, name_id, name_length = NAME.unpack_from(payload, position)
+        position += NAME.size
+        names.append((track_id, name_id, payload[position:position + name_length].decode('utf-8')))
+        position += name_length
+    (row_count,) = ROW_COUNT.unpack_from(payload, position)
+    position += ROW_COUNT.size
+    return names, payload[position:position + row_count * ROW.size]
+
+
+def read_journal(path: str, progress=None):
+    """
+    Returns (recorded tracks, JournalInfo), reading up to the last intact batch.
+
+    `progress`, if given, is called with the percentage of the file read
+    after each batch.
+    """
+    recorded = new_recording()
+    tracks = [recorded[name] for name in TRACKS]
+    batches = rows = 0
+    complete = False
+    with open(path, 'rb') as f:
+        start_time, recorded['mouse'].geometry = _read_header(f, path)
+        offset = f.tell()
+        size = os.fstat(f.fileno()).st_size
+        for flags, payload, offset in _iter_batches(f):
+            batches += 1
+            names, body = _decode_payload(payload)
+            for track_id, name_id, name in names:
+                if tracks[track_id].intern(name) != name_id:
+                    raise ValueError(f"Corrupt name table in {path}")
+            for track_id, kind, code, x, y, delta, t in ROW.iter_unpack(body):
+                tracks[track_id]._append_row(kind, code, x, y, delta, t)
+                rows += 1
+            if progress is not None:
+                progress(100 * offset // size)
+            if flags & FLAG_END:
+                complete = True
+                break
+
+    info = JournalInfo(path, start_time, complete, batches, rows, 0 if complete else size - offset)
+    return recorded, info
+
+
+def scan_journal(path: str) -> JournalInfo:
+    """JournalInfo without decoding any events, for checks over many files."""
+    batches = rows = 0
+    complete = False
+    with open(path, 'rb') as f:
+        start_time, _ = _read_header(f, path)
+        offset = f.tell()
+        for flags, payload, offset in _iter_batches(f):
+            batches += 1
+            rows += len(_decode_payload(payload)[1]) // ROW.size
+            if flags & FLAG_END:
+                complete = True
+                break
+        size = os.fstat(f.fileno()).st_size
+    return JournalInfo(path, start_time, complete, batches, rows, 0 if complete else size - offset)
+
+
+def iter_journal_chunks(path: str, track_name: str):
+    """
+    Streams one track of a journal, a batch at a time, as lists of decoded
+    rows (index, kind, name, x, y, delta, t), for recording_stream.
+    """
+    wanted = TRACKS.index(track_name)
+    names = []
+    index = 0
+    with open(path, 'rb') as f:
+        _read_header(f, path)
+        for flags, payload, _ in _iter_batches(f):
+            batch_names, body = _decode_payload(payload)
+            names.extend(name for track_id, _, name in batch_names if track_id == wanted)
+            rows = []
+            for track_id, kind, code, x, y, delta, t in ROW.iter_unpack(body):
+                if track_id == wanted:
+                    rows.append((index, kind, None if code == NO_NAME else names[code], x, y, delta, t))
+                    index += 1
+            if rows:
+                yield rows
+            if flags & FLAG_END:
+                return
+
+
+def write_journal(recorded: dict, path: str, start_time: float = 0.0):
+    # Writes an in-memory recording as a complete journal in one go
+    writer = JournalWriter(path, recorded, start_time)
+    writer.close(complete=True)
+
+
+def mark_complete(path: str):
+    # Drops a torn tail and appends the END marker to an interrupted journal
+    _, info = read_journal(path)
+    if info.complete:
+        return
+    with open(path, 'r+b') as f:
+        f.truncate(os.path.getsize(path) - info.truncated_bytes)
+        f.seek(0, os.SEEK_END)
+        f.write(_encode_batch([], b'', 0, FLAG_END))
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def session_journal_path(directory: str, start_time: float) -> str:
+    stamp = time.strftime('%Y%m%d-%H%M%S', time.localtime(start_time))
+    return os.path.join(directory, f'session-{stamp}-{os.getpid()}{JOURNAL_EXTENSION}')
+
+
+_SESSION_PID = re.compile(r'-(\d+)' + re.escape(JOURNAL_EXTENSION) + '$')
+
+
+def journal_owner(path: str):
+    # Pid of the process that wrote a session journal, from its file name
+    match = _SESSION_PID.search(os.path.basename(path))
+    return int(match.group(1)) if match else None
+
+
+def _pid_alive(pid: int) -> bool:
+    if pid == os.getpid():
+        return True
+    if sys.platform == 'win32':
+        # os.kill would terminate the process on Windows, so ask for its exit code
+        import ctypes
+        kernel32 = ctypes.windll.kernel32
+        # PROCESS_QUERY_LIMITED_INFORMATION
+        handle = kernel32.OpenProcess(0x1000, False, pid)
+        if not handle:
+            # ERROR_ACCESS_DENIED: the process exists but belongs to someone else
+            return kernel32.GetLastError() == 5
+        try:
+            code = ctypes.c_ulong()
+            # STILL_ACTIVE
+            return not kernel32.GetExitCodeProcess(handle, ctypes.byref(code)) or code.value == 259
+        finally:
+            kernel32.CloseHandle(handle)
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    except OSError:
+        return False
+    return True
+
+
+def recover_session(directory: str):
+    """
+    Looks for an unsaved recording in a session journal directory.
+
+    Journals are only removed once their recording is saved or discarded, so
+    any journal left here by a process that is gone holds a recording that
+    was never saved: either interrupted mid-recording (crash or kill), or
+    finished but lost before Save. The newest one is read, marked complete if
+    needed and returned as (recorded tracks, JournalInfo); None if there is
+    nothing to recover. Older ones are left for a later run.
+
+    Journals whose owning process is still running belong to a live session
+    (still recording, or finished but not saved yet) and are left alone.
+    """
+    unsaved = []
+    for path in glob.glob(os.path.join(directory, '*' + JOURNAL_EXTENSION)):
+        pid = journal_owner(path)
+        if pid is not None and _pid_alive(pid):
+            continue
+        try:
+            _, info = read_journal(path)
+        except (OSError, ValueError, struct.error):
+            continue
+        unsaved.append((info.start_time, path))
+    if not unsaved:
+        return None
+    _, path = max(unsaved)
+    mark_complete(path)
+    return read_journal(path)
+
+
+def discard_session_journals(directory: str):
+    # Removes the journals this process wrote, for a clean shutdown that
+    # leaves their recordings unsaved on purpose
+    for path in glob.glob(os.path.join(directory, '*' + JOURNAL_EXTENSION)):
+        if journal_owner(path) == os.getpid():
+            try:
+                os.remove(path)
+            except OSError:
+                pass
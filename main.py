@@ -1,377 +1,228 @@
+import logging
+import os
 import sys
-import time
 from PyQt6.QtWidgets import (QApplication, QWidget, QVBoxLayout, QHBoxLayout,
-                             QPushButton, QLabel, QLineEdit, QFileDialog, QCheckBox, QSpinBox, QDoubleSpinBox)
-from PyQt6.QtCore import QThread, pyqtSignal, QObject
-from threading import Thread
-import json
-import keyboard
-import mouse
+                             QPushButton, QLabel, QLineEdit, QFileDialog, QCheckBox, QSpinBox, QDoubleSpinBox,
+                             QComboBox, QInputDialog, QProgressBar)
+from PyQt6.QtCore import QThread, QThreadPool, QRunnable, QTimer, pyqtSignal, QObject
 from recorder_thread import thread
+from recorder_main import BGSI_Recorder
+from coordinate_space import ABSOLUTE
+from recorder_log import get_logger, setup_logging
+from recording_format import BINARY_EXTENSION, load_recording, save_recording
+from instrumentation import Instrumentation, PROFILE_MODES
+from journal import default_journal_dir, discard_session_journals, recover_session
+
+log = get_logger('ui')
+
+SIMPLIFY_OPTIONS = [
+    ('Full Path', None),
+    ('Simplify: RDP', 'rdp'),
+    ('Simplify: Decimate', 'decimate'),
+    ('Simplify: Velocity-aware', 'velocity'),
+]
+
+COORDINATE_OPTIONS = [
+    ('Absolute Coordinates', 'absolute'),
+    ('Scale to Screen', 'scaled'),
+    ('Relative to Cursor', 'relative'),
+]
+
+RECORDING_FILE_FILTER = ('Recordings (*.json *.rrec *.rrj);;JSON Files (*.json);;Binary Recordings (*.rrec);;'
+                         'Journals (*.rrj)')
+# Load also takes compositions, which are kept as segments and played lazily
+LOAD_FILE_FILTER = ('Recordings (*.json *.rrec *.rrj *.rcomp);;JSON Files (*.json);;Binary Recordings (*.rrec);;'
+                    'Journals (*.rrj);;Compositions (*.rcomp)')
+
+# Mouse move dispatch rate, see path_resample
+DISPATCH_RATE_OPTIONS = [
+    ('Recorded Move Rate', None, 'linear'),
+    ('125 Hz', 125, 'linear'),
+    ('250 Hz', 250, 'linear'),
+    ('500 Hz', 500, 'linear'),
+    ('125 Hz, Smooth', 125, 'spline'),
+    ('250 Hz, Smooth', 250, 'spline'),
+]
+
+CONVERT_OPTIONS = [
+    ('Binary (.rrec)', BINARY_EXTENSION, False),
+    ('Compressed binary (.rrec)', BINARY_EXTENSION, True),
+    ('JSON (.json)', '.json', False),
+]
+
+# The telemetry panel polls the recorder this often while recording or
+# playing, instead of the recorder signalling per event
+TELEMETRY_INTERVAL_MS = 100
+
+# File operations run here, off the GUI thread
+FILE_POOL_THREADS = 2
 
-# Copied from recorder_main.py
-class BGSI_Recorder:
-    def __init__(self, recorded: dict = None, stop_key: str = 'esc'):
-        self.start_time = None
-        self.stop_recording_flag = False
-        self.play_start_time = None
-        self.is_playing = False
-        self.speed_factor = 1
-        self.stop_key = stop_key
-
-        self.recorded = recorded if recorded else {
-            'keyboard': [],
-            'mouse': []
-        }
-
-    def record(self, countdown: float = 0.001):
-        self.start_time = time.time() + countdown
-        # Start listeners in separate threads to avoid blocking
-        mouse_listener_thread = Thread(target=self.mouse_listener)
-        keyboard_listener_thread = Thread(target=self.keyboard_listener)
-
-        mouse_listener_thread.start()
-        keyboard_listener_thread.start()
-
-        # Wait for threads to potentially finish (e.g., if stop is called quickly)
-        # This might need adjustment depending on desired behavior on stop
-        keyboard_listener_thread.join() # keyboard_listener blocks until stop_key or flag
-        # mouse listener runs until unhooked by stop_recording
-        mouse_listener_thread.join() # Wait for mouse listener to finish after unhook
-
-
-    def play(self, countdown: float = 0.001, speed_factor: float = 1, only_essential_moves: bool = False):
-        self.is_playing = True
-
-        if speed_factor > 5:
-            speed_factor = 5
-
-        if only_essential_moves:
-            self.filter_moves()
-
-        self.speed_factor = speed_factor
-        self.play_start_time = time.time() + countdown
-
-        mouse_ = Thread(target=self.play_mouse, args=(self.recorded['mouse'],))
-        keyboard_ = Thread(target=self.play_keyboard, args=(self.recorded['keyboard'],))
-        # Stop listener needs to run in the background
-        stop_thread = Thread(target=self.stop_player_listener)
-        stop_thread.daemon = True # Allow program to exit even if this thread is running
-        stop_thread.start()
-
-
-        mouse_.start()
-        keyboard_.start()
-        mouse_.join()
-        keyboard_.join()
-
-        self.is_playing = False # Ensure flag is reset after playback finishes naturally
-
-    def save(self, path: str):
-        with open(path, 'w') as f:
-            json.dump(self.recorded, f, indent=4)
-
-    def load(self, path: str):
-        with open(path, 'r') as f:
-            self.recorded = json.load(f)
-
-    def keyboard_listener(self):
-        self.wait_to_start(self.start_time)
-        print(f"Keyboard listener started. Press '{self.stop_key}' to stop recording.")
-
-        # Define the hook callback function
-        def on_key_event(event: keyboard.KeyboardEvent):
-            # Prevent processing if recording stopped between event and callback
-            if self.stop_recording_flag:
-                return
-            
-            # Check for stop key
-            if event.name == self.stop_key and event.event_type == keyboard.KEY_DOWN:
-                print(f"'{self.stop_key}' pressed. Stopping recording.")
-                self.stop_recording() # This will set flag and unhook
-                return # Don't record the stop key itself
-
-            # Record event relative to start time
-            # Ensure recording has actually started
-            if self.start_time is not None and event.time >= self.start_time:
-                 timestamp = event.time - self.start_time
-                 print(f"  Recording KB Event: ['{event.event_type == keyboard.KEY_DOWN}', '{event.name}', {timestamp:.4f}]")
-                 self.recorded['keyboard'].append([
-                      event.event_type == keyboard.KEY_DOWN,
-                      event.name,
-                      timestamp
-                 ])
-
-        try:
-            # Hook the callback
-            keyboard.hook(on_key_event)
-            # Keep the listener thread alive until stop_recording is called
-            while not self.stop_recording_flag:
-                time.sleep(0.1) # Prevent busy-waiting
-        except Exception as e:
-            print(f"Error in keyboard listener: {e}")
-        finally:
-            # Ensure the hook is removed if the thread exits unexpectedly,
-            # though stop_recording should normally handle it.
+# Worker signal class
+class WorkerSignals(QObject):
+    finished = pyqtSignal()
+    status_update = pyqtSignal(str)
+    # File tasks: percent done, return value, error message
+    progress = pyqtSignal(int)
+    result = pyqtSignal(object)
+    error = pyqtSignal(str)
+    # One-line instrumentation summary at the end of a record/play
+    summary = pyqtSignal(str)
+
+
+# --- File operations for FileTask; `progress` takes a percentage ---
+# Binary recordings and journals report as they are read or written; JSON
+# is parsed and written in one go, so it keeps the busy indicator.
+
+def load_file(path: str, progress) -> BGSI_Recorder:
+    recorder = BGSI_Recorder()
+    recorder.load(path, progress)
+    log.info("Loaded %s: %s", path, recorder.instrumentation.format().replace("\n", "; "))
+    return recorder
+
+
+def save_file(recorder: BGSI_Recorder, path: str, progress) -> str:
+    recorder.save(path, progress=progress)
+    return path
+
+
+def convert_files(paths: list, extension: str, compress: bool, progress) -> tuple:
+    # Writes each recording next to its source in the target format; a file
+    # that fails is logged and skipped. Returns (written, failed) paths.
+    written = []
+    failed = []
+    for i, path in enumerate(paths):
+        destination = os.path.splitext(path)[0] + extension
+        if os.path.abspath(destination) != os.path.abspath(path):
             try:
-                 keyboard.unhook(on_key_event)
+                save_recording(load_recording(path), destination, compress=compress)
+                written.append(destination)
             except Exception as e:
-                 pass
-            print("Keyboard listener finished.")
+                log.error("Could not convert %s: %s", path, e)
+                failed.append(path)
+        progress(int(100 * (i + 1) / len(paths)))
+    return written, failed
+
 
+class FileTask(QRunnable):
+    # Runs fn(*args, progress) on a QThreadPool, reporting through WorkerSignals
+    def __init__(self, fn, *args):
+        super().__init__()
+        self.fn = fn
+        self.args = args
+        self.signals = WorkerSignals()
 
-    # Mouse listener needs to run until unhooked
-    def mouse_listener(self):
-        self.wait_to_start(self.start_time)
-        print("Mouse listener started.")
+    def run(self):
         try:
-            mouse.hook(self.on_callback)
-            # Keep the listener thread alive until unhooked.
-            # A simple way is to wait for the stop flag.
-            while not self.stop_recording_flag:
-                time.sleep(0.1) # Prevent busy-waiting
+            self.signals.result.emit(self.fn(*self.args, self.signals.progress.emit))
         except Exception as e:
-             print(f"Error setting up mouse hook: {e}") # May need admin rights
+            log.error("File task %s failed: %s", self.fn.__name__, e)
+            self.signals.error.emit(str(e))
         finally:
-             print("Mouse listener finished.")
-
-
-    def on_callback(self, event):
-        # Should check if recording has actually started
-        if self.start_time is None or time.time() < self.start_time:
-             return
-        # Also check stop flag in case events arrive after stop_recording is called
-        if self.stop_recording_flag:
-             return
-
-        timestamp = time.time() - self.start_time
-
-        if isinstance(event, mouse.MoveEvent):
-            self.recorded['mouse'].append(['move', event.x, event.y, timestamp])
-
-        elif isinstance(event, mouse.ButtonEvent):
-            self.recorded['mouse'].append(['click', event.button, event.event_type == 'down', timestamp])
-
-        elif isinstance(event, mouse.WheelEvent):
-            self.recorded['mouse'].append(['scroll', event.delta, timestamp])
-
-        # Removed 'else: print unknown' as it's not needed
-
-    def stop_recording(self):
-        # This function might be called from the keyboard hook or the UI thread
-        if not self.stop_recording_flag: # Prevent multiple calls
-            print("Executing stop_recording...")
-            self.stop_recording_flag = True # Set flag first
-            
-            # Unhook mouse and keyboard listeners
-            try:
-                mouse.unhook(self.on_callback)
-                print("Mouse unhooked.")
-            except Exception as e:
-                print(f"Warning: Error unhooking mouse: {e}")
-            try:
-                # Unhook all keyboard hooks - includes the one set by keyboard_listener
-                # and potentially the one by stop_player_listener if somehow active.
-                keyboard.unhook_all()
-                print("All keyboard hooks removed.")
-            except Exception as e:
-                 print(f"Warning: Error unhooking keyboard: {e}")
-
-            # Short delay might not be necessary anymore, but can leave it
-            time.sleep(0.1)
-            print("stop_recording finished.")
-            return self.recorded
-
-
-    def play_keyboard(self, key_events: list):
-        print("play_keyboard started.")
-        self.wait_to_start(self.play_start_time)
-        print("play_keyboard wait finished.")
-
-        for i, key in enumerate(key_events):
-            if not self.is_playing: # Check before processing event
-                print(f"play_keyboard: Stopping playback early (event {i}).")
-                break
-                
-            pressed, scan_code, t = key
-            
-            # Calculate adjusted time based on speed factor
-            adjusted_time = t / self.speed_factor
-            current_playback_time = time.time() - self.play_start_time
-            time_to_wait = adjusted_time - current_playback_time
-
-            print(f"  KB Play Event {i}: Data={key}, Orig_t={t:.4f}, Adj_t={adjusted_time:.4f}, Wait={time_to_wait:.4f}")
-
-            if time_to_wait > 0:
-                time.sleep(time_to_wait)
-
-            if not self.is_playing: # Check flag again after sleep
-                print(f"play_keyboard: Stopping playback early after sleep (event {i}).")
-                break
-
-            try:
-                action_str = "Press" if pressed else "Release"
-                print(f"    -> {action_str} '{scan_code}'")
-                if pressed:
-                    keyboard.press(scan_code)
-                else:
-                    keyboard.release(scan_code)
-            except Exception as e:
-                print(f"Error playing keyboard event ({action_str} {scan_code}): {e}")
-        
-        print("play_keyboard finished.")
-
-
-    def play_mouse(self, mouse_events: list):
-        self.wait_to_start(self.play_start_time)
-
-        for mouse_event in mouse_events:
-            event_type, *args, t = mouse_event
-
-            # Calculate adjusted time based on speed factor
-            adjusted_time = t / self.speed_factor
-            current_playback_time = time.time() - self.play_start_time
-            time_to_wait = adjusted_time - current_playback_time
-
-            if time_to_wait > 0:
-                time.sleep(time_to_wait)
-
-            if not self.is_playing: # Check flag before action and after sleep
-                break
-
-            try:
-                if event_type == 'move':
-                    mouse.move(*args)
-                elif event_type == 'click':
-                    button, is_press = args
-                    if is_press:
-                        mouse.press(button)
-                    else:
-                        mouse.release(button)
-                elif event_type == 'scroll':
-                    delta = args[0]
-                    mouse.wheel(delta)
-            except Exception as e:
-                 print(f"Error playing mouse event ({event_type} {args}): {e}")
-
-
-    @staticmethod
-    def wait_to_start(t: float):
-        time_to_sleep = t - time.time()
-        if time_to_sleep > 0:
-            time.sleep(time_to_sleep)
-
-    # Sleep method used during playback - adjust timing precisely
-    # This is replaced by direct calculation in play methods now.
-    # def sleep(self, t: float):
-    #    time_to_sleep = t - (time.time() - self.play_start_time)
-    #    if time_to_sleep > 0:
-    #        time.sleep(time_to_sleep)
-
-
-    # Renamed from stop_player to avoid conflict/confusion
-    # This method listens for the stop key during playback
-    def stop_player_listener(self):
-        print(f"Playback stop listener started. Press '{self.stop_key}' to stop.")
-        keyboard.wait(self.stop_key)
-        if self.is_playing:
-             print(f"'{self.stop_key}' pressed during playback. Stopping player...")
-             self.is_playing = False # Set flag to stop playback loops
-
-    def filter_moves(self):
-        if not self.recorded['mouse']:
-            return
-
-        filtered_moves = []
-        last_event = None
-
-        # Always keep the first event if it's a move
-        if self.recorded['mouse'][0][0] == 'move':
-             filtered_moves.append(self.recorded['mouse'][0])
-             last_event = self.recorded['mouse'][0]
-             start_index = 1
-        else:
-             start_index = 0
-
-
-        for i in range(start_index, len(self.recorded['mouse'])):
-            current_event = self.recorded['mouse'][i]
-
-            # If current is not a move, keep it
-            if current_event[0] != 'move':
-                # If the *previous* event was a move, keep that *last* move event
-                if last_event and last_event[0] == 'move':
-                    # Avoid adding duplicate non-move events if last_event was also non-move
-                    if not filtered_moves or filtered_moves[-1] != last_event:
-                         filtered_moves.append(last_event)
-
-                # Keep the current non-move event
-                filtered_moves.append(current_event)
-
-            # Update last_event regardless of type
-            last_event = current_event
-
-        # Ensure the very last event is added if it was a move and loop finished
-        if last_event and last_event[0] == 'move':
-             if not filtered_moves or filtered_moves[-1] != last_event:
-                  filtered_moves.append(last_event)
-
-
-        print(f"Filtered mouse events from {len(self.recorded['mouse'])} to {len(filtered_moves)}")
-        self.recorded['mouse'] = filtered_moves
-# End of copied code
-
-# Worker signal class
-class WorkerSignals(QObject):
-    finished = pyqtSignal()
-    status_update = pyqtSignal(str)
+            self.signals.finished.emit()
 
 # Worker class to run recorder/player in a separate thread
 class RecorderWorker(QObject):
-    def __init__(self, recorder: BGSI_Recorder, action: str, **kwargs):
+    def __init__(self, recorder: BGSI_Recorder, action: str, export_path: str = None, **kwargs):
         super().__init__()
         self.recorder = recorder
         self.action = action
+        # Where report_instrumentation writes the JSON export, if anywhere
+        self.export_path = export_path
         self.kwargs = kwargs
         self.signals = WorkerSignals()
 
+    def log_summary(self, title: str):
+        recorded = self.recorder.recorded
+        log.info("%s: %d keyboard events, %d mouse events", title, len(recorded['keyboard']), len(recorded['mouse']))
+        # Full keyboard dump only when debug logging is on
+        if log.isEnabledFor(logging.DEBUG):
+            for event in recorded['keyboard']:
+                log.debug("  %s", event)
+
+    def on_iteration(self, stats: dict):
+        # Called on the worker thread after each run of a looped playback
+        repeat = self.kwargs.get('repeat', 1)
+        if repeat != 1:
+            total = repeat if repeat else '\u221e'
+            self.signals.status_update.emit(f"Run {stats['iteration']}/{total} done (p99 {stats['lateness_p99_ms']:.2f}ms).")
+
+    def report_instrumentation(self):
+        # Full timings to the log (and a JSON file if asked for), a short line to the UI
+        instrumentation = self.recorder.instrumentation
+        log.info("Instrumentation:\n%s", instrumentation.format())
+        if self.export_path:
+            try:
+                instrumentation.export(self.export_path)
+            except OSError as e:
+                log.error("Could not write instrumentation to %s: %s", self.export_path, e)
+        summary = instrumentation.summary()
+        parts = []
+        simplified = self.recorder.simplify_result
+        if self.action == 'play' and self.kwargs.get('simplify_mode') and simplified is not None:
+            # The simplification that was played: reduction ratio and path error
+            parts.append(f"simplified {simplified.original} -> {simplified.kept} mouse events "
+                         f"({simplified.reduction_ratio:.1%} removed, max error {simplified.max_error:.2f}px)")
+        for name in (self.action, 'play.compile', 'record.drain', 'dispatch.move'):
+            phase = summary['phases'].get(name)
+            if phase is None:
+                continue
+            if phase['count'] == 1:
+                parts.append(f"{name} {phase['total_ms']:.1f}ms")
+            else:
+                parts.append(f"{name} p99 {phase['p99_us']:.0f}us")
+        parts.extend(f"{name} {value}" for name, value in summary['counters'].items())
+        self.signals.summary.emit(", ".join(parts))
+
     def run(self):
         try:
             if self.action == 'record':
                 self.signals.status_update.emit(f"Recording starts in {self.kwargs.get('countdown', 0)}s...")
                 self.recorder.record(**self.kwargs)
-                print("--- Recording Finished ---")
-                print("Recorded Keyboard Events:")
-                for event in self.recorder.recorded['keyboard']:
-                    print(f"  {event}")
-                print("Recorded Mouse Events:")
-                print(f"  ({len(self.recorder.recorded['mouse'])} mouse events)") 
-                print("-------------------------")
-                self.signals.status_update.emit("Recording finished.")
-            elif self.action == 'play':
+                self.log_summary("Recording finished")
+                stats = self.recorder.get_capture_stats()
+                overruns = sum(stats['overruns'].values())
+                self.signals.status_update.emit(f"Recording finished ({stats['events_per_sec']:.0f} events/s, {overruns} dropped).")
+            elif self.action in ('play', 'play_composition'):
                 self.signals.status_update.emit(f"Playback starts in {self.kwargs.get('countdown', 0)}s...")
-                print("--- Starting Playback ---")
-                print("Playing Keyboard Events:")
-                for event in self.recorder.recorded['keyboard']:
-                    print(f"  {event}")
-                print("Playing Mouse Events:")
-                print(f"  ({len(self.recorder.recorded['mouse'])} mouse events)") 
-                print("-------------------------")
-                self.recorder.play(**self.kwargs)
-                self.signals.status_update.emit("Playback finished.")
+                if self.action == 'play':
+                    self.recorder.expand_composition()
+                    self.log_summary("Starting playback")
+                    self.recorder.play(on_iteration=self.on_iteration, **self.kwargs)
+                else:
+                    log.info("Starting playback: composition of %d segments", len(self.kwargs['composition'].segments))
+                    self.recorder.play_composition(**self.kwargs)
+                stats = self.recorder.playback_stats
+                if stats is not None and len(stats):
+                    summary = stats.summary()
+                    self.signals.status_update.emit(f"Playback finished (lateness p99 {summary['p99_ms']:.2f}ms, max {summary['max_ms']:.2f}ms).")
+                else:
+                    self.signals.status_update.emit("Playback finished.")
         except Exception as e:
             self.signals.status_update.emit(f"Error: {e}")
         finally:
+            self.report_instrumentation()
             self.signals.finished.emit()
 
 
 class RecorderUI(QWidget):
-    def __init__(self):
+    def __init__(self, profile: str = None, per_event_timing: bool = False, instrumentation_path: str = None):
         super().__init__()
+        # Instrumentation options for record/play sessions, from the command line
+        self.profile = profile
+        self.per_event_timing = per_event_timing
+        self.instrumentation_path = instrumentation_path
         self.recorder = BGSI_Recorder()
         self.worker_thread = None
         self.worker = None
+        self.file_pool = QThreadPool()
+        self.file_pool.setMaxThreadCount(FILE_POOL_THREADS)
+        # Running FileTasks, kept referenced until their finished signal
+        self.file_tasks = set()
+        self.telemetry_timer = QTimer(self)
+        self.telemetry_timer.setInterval(TELEMETRY_INTERVAL_MS)
+        self.telemetry_timer.timeout.connect(self.update_telemetry)
         self.initUI()
+        self.recover_session()
 
     def initUI(self):
         self.setWindowTitle('RiftRecorder')
@@ -385,12 +236,14 @@ class RecorderUI(QWidget):
         self.stop_btn = QPushButton('Stop')
         self.save_btn = QPushButton('Save')
         self.load_btn = QPushButton('Load')
+        self.convert_btn = QPushButton('Convert...')
 
         self.record_btn.clicked.connect(self.start_recording)
         self.play_btn.clicked.connect(self.start_playback)
         self.stop_btn.clicked.connect(self.stop_action)
         self.save_btn.clicked.connect(self.save_recording)
         self.load_btn.clicked.connect(self.load_recording)
+        self.convert_btn.clicked.connect(self.convert_recordings)
 
         self.stop_btn.setEnabled(False) # Initially disabled
 
@@ -399,6 +252,7 @@ class RecorderUI(QWidget):
         controls_layout.addWidget(self.stop_btn)
         controls_layout.addWidget(self.save_btn)
         controls_layout.addWidget(self.load_btn)
+        controls_layout.addWidget(self.convert_btn)
         layout.addLayout(controls_layout)
 
         # --- Options ---
@@ -417,46 +271,190 @@ class RecorderUI(QWidget):
 
         self.essential_moves_checkbox = QCheckBox('Only Essential Moves')
 
+        # How recorded mouse positions map onto this screen, see coordinate_space
+        self.coordinate_combo = QComboBox()
+        for label, mode in COORDINATE_OPTIONS:
+            self.coordinate_combo.addItem(label, mode)
+
+        # Resampling also skips stale moves when playback falls behind
+        self.rate_combo = QComboBox()
+        for label, rate, interpolation in DISPATCH_RATE_OPTIONS:
+            self.rate_combo.addItem(label, (rate, interpolation))
+
+        # Looped playback: 0 repeats until stopped
+        self.repeat_label = QLabel('Repeat:')
+        self.repeat_spinbox = QSpinBox()
+        self.repeat_spinbox.setRange(0, 100000)
+        self.repeat_spinbox.setValue(1)
+        self.repeat_spinbox.setSpecialValueText('Until stopped')
+        self.gap_label = QLabel('Gap (s):')
+        self.gap_spinbox = QDoubleSpinBox()
+        self.gap_spinbox.setRange(0, 3600)
+        self.gap_spinbox.setValue(0)
+        self.gap_spinbox.setSingleStep(0.5)
+
+        # Path simplification, ignored when Only Essential Moves is checked
+        self.simplify_combo = QComboBox()
+        for label, mode in SIMPLIFY_OPTIONS:
+            self.simplify_combo.addItem(label, mode)
+        self.simplify_tolerance_label = QLabel('Tolerance (px):')
+        self.simplify_tolerance_spinbox = QDoubleSpinBox()
+        self.simplify_tolerance_spinbox.setRange(0.1, 100)
+        self.simplify_tolerance_spinbox.setValue(2)
+        self.simplify_tolerance_spinbox.setSingleStep(0.5)
+        # Decimate only: at most one move per interval, 0 for no limit
+        self.simplify_interval_label = QLabel('Min interval (ms):')
+        self.simplify_interval_spinbox = QDoubleSpinBox()
+        self.simplify_interval_spinbox.setRange(0, 1000)
+        self.simplify_interval_spinbox.setValue(0)
+        self.simplify_interval_spinbox.setSingleStep(1)
+
         options_layout.addWidget(self.countdown_label)
         options_layout.addWidget(self.countdown_spinbox)
         options_layout.addWidget(self.speed_label)
         options_layout.addWidget(self.speed_spinbox)
         options_layout.addWidget(self.essential_moves_checkbox)
+        options_layout.addWidget(self.coordinate_combo)
+        options_layout.addWidget(self.rate_combo)
+        options_layout.addWidget(self.repeat_label)
+        options_layout.addWidget(self.repeat_spinbox)
+        options_layout.addWidget(self.gap_label)
+        options_layout.addWidget(self.gap_spinbox)
+        options_layout.addWidget(self.simplify_combo)
+        options_layout.addWidget(self.simplify_tolerance_label)
+        options_layout.addWidget(self.simplify_tolerance_spinbox)
+        options_layout.addWidget(self.simplify_interval_label)
+        options_layout.addWidget(self.simplify_interval_spinbox)
         layout.addLayout(options_layout)
 
         # --- Status ---
         self.status_label = QLabel('Status: Idle')
         layout.addWidget(self.status_label)
 
+        # --- Telemetry: live counters while recording/playing, file task progress ---
+        telemetry_layout = QHBoxLayout()
+        self.telemetry_label = QLabel('')
+        self.progress_bar = QProgressBar()
+        self.progress_bar.setRange(0, 100)
+        self.progress_bar.setValue(0)
+        self.progress_bar.setVisible(False)
+        telemetry_layout.addWidget(self.telemetry_label)
+        telemetry_layout.addWidget(self.progress_bar)
+        layout.addLayout(telemetry_layout)
+
         self.setLayout(layout)
 
     def update_status(self, message):
         self.status_label.setText(f"Status: {message}")
 
+    def update_telemetry(self):
+        # Runs on the GUI thread from telemetry_timer; the recorder only keeps counters
+        if not self.worker:
+            return
+        telemetry = self.worker.recorder.telemetry()
+        state = telemetry['state']
+        if state == 'recording':
+            self.telemetry_label.setText(f"Captured {telemetry['events']} events in {telemetry['elapsed_s']:.1f}s "
+                                         f"({telemetry['events_per_sec']:.0f}/s)")
+        elif state == 'playing':
+            total = telemetry['total_s']
+            length = f"{total:.1f}s" if total is not None else '\u221e'
+            self.telemetry_label.setText(
+                f"Run {telemetry['run']}: dispatched {telemetry['events']} events, "
+                f"lateness {telemetry['lateness_ms']:.2f}ms, {telemetry['elapsed_s']:.1f}s / {length}")
+            if total:
+                self.progress_bar.setVisible(True)
+                self.progress_bar.setValue(min(100, int(100 * telemetry['elapsed_s'] / total)))
+
+    def new_instrumentation(self) -> Instrumentation:
+        # A fresh set of timings per session, so each summary covers just that run
+        return Instrumentation(per_event=self.per_event_timing, profile=self.profile)
+
+    def show_summary(self, summary: str):
+        self.telemetry_label.setText(summary)
+
+    def start_telemetry(self):
+        self.telemetry_label.setText('')
+        self.progress_bar.setRange(0, 100)
+        self.progress_bar.setValue(0)
+        self.telemetry_timer.start()
+
+    def stop_telemetry(self):
+        # One last refresh so the panel shows the final counts
+        self.update_telemetry()
+        self.telemetry_timer.stop()
+        self.progress_bar.setVisible(False)
+
+    def run_file_task(self, fn, *args, on_result=None, error_message="Error"):
+        # Runs fn on the file pool with the controls disabled until it finishes
+        task = FileTask(fn, *args)
+        self.file_tasks.add(task)
+        task.signals.progress.connect(self.on_file_progress)
+        task.signals.error.connect(lambda message: self.update_status(f"{error_message}: {message}"))
+        if on_result is not None:
+            task.signals.result.connect(on_result)
+        task.signals.finished.connect(lambda: self.on_file_task_finished(task))
+        self.set_controls_enabled(False)
+        # Busy indicator until the task reports a percentage
+        self.progress_bar.setRange(0, 0)
+        self.progress_bar.setVisible(True)
+        self.file_pool.start(task)
+
+    def on_file_progress(self, percent: int):
+        self.progress_bar.setRange(0, 100)
+        self.progress_bar.setValue(percent)
+
+    def on_file_task_finished(self, task):
+        self.file_tasks.discard(task)
+        if not self.file_tasks:
+            self.progress_bar.setVisible(False)
+            self.set_controls_enabled(True)
+
+    def recover_session(self):
+        # Picks up a recording whose session was killed before it was saved
+        try:
+            recovered = recover_session(default_journal_dir())
+        except Exception as e:
+            log.warning("Session recovery failed: %s", e)
+            return
+        if recovered is None:
+            return
+        recorded, info = recovered
+        self.recorder = BGSI_Recorder(recorded=recorded, stop_key='esc')
+        self.recorder.attach_journal(info.path)
+        log.info("Recovered %d events from %s", info.rows, info.path)
+        self.update_status(f"Recovered unsaved recording ({info.rows} events). Save it to keep it.")
+
     def start_recording(self):
         if self.worker_thread and self.worker_thread.isRunning():
             self.update_status("Action already in progress.")
             return
 
         countdown = self.countdown_spinbox.value()
-        self.recorder = BGSI_Recorder(stop_key='esc') # Reset recorder instance
+        # Reset recorder instance; the recording is journaled as it is captured
+        self.recorder = BGSI_Recorder(stop_key='esc', journal_dir=default_journal_dir(),
+                                      instrumentation=self.new_instrumentation())
 
-        self.worker = RecorderWorker(self.recorder, 'record', countdown=countdown)
+        self.worker = RecorderWorker(self.recorder, 'record', export_path=self.instrumentation_path,
+                                     countdown=countdown)
         self.worker_thread = QThread()
         self.worker.moveToThread(self.worker_thread)
 
         self.worker.signals.status_update.connect(self.update_status)
+        self.worker.signals.summary.connect(self.show_summary)
         self.worker.signals.finished.connect(self.on_worker_finished)
         self.worker_thread.started.connect(self.worker.run)
 
         self.set_controls_enabled(False)
         self.stop_btn.setEnabled(True)
         self.update_status("Initializing recording...")
+        self.start_telemetry()
         self.worker_thread.start()
 
 
     def start_playback(self):
-        if not self.recorder.recorded['keyboard'] and not self.recorder.recorded['mouse']:
+        composition = self.recorder.composition
+        if composition is None and not self.recorder.recorded['keyboard'] and not self.recorder.recorded['mouse']:
              self.update_status("No recording loaded or recorded yet.")
              return
 
@@ -467,46 +465,71 @@ class RecorderUI(QWidget):
         countdown = self.countdown_spinbox.value()
         speed_factor = self.speed_spinbox.value()
         only_essential = self.essential_moves_checkbox.isChecked()
+        simplify_mode = self.simplify_combo.currentData()
+        simplify_tolerance = self.simplify_tolerance_spinbox.value()
+        simplify_min_interval = self.simplify_interval_spinbox.value() / 1000
+        repeat = self.repeat_spinbox.value()
+        gap = self.gap_spinbox.value()
+        coordinate_mode = self.coordinate_combo.currentData()
+        dispatch_rate, interpolation = self.rate_combo.currentData()
 
         # Need to create a *new* recorder instance for playback based on the loaded data
         # because the original recorder might be tied to the recording thread/hooks
-        playback_recorder = BGSI_Recorder(recorded=self.recorder.recorded, stop_key='esc')
-
-
-        self.worker = RecorderWorker(playback_recorder, 'play', countdown=countdown, speed_factor=speed_factor, only_essential_moves=only_essential)
+        playback_recorder = BGSI_Recorder(recorded=self.recorder.recorded, stop_key='esc',
+                                          instrumentation=self.new_instrumentation())
+
+        plan_options = (only_essential or simplify_mode or repeat != 1 or coordinate_mode != ABSOLUTE
+                        or dispatch_rate is not None)
+        if composition is not None and not plan_options:
+            # Played segment by segment, nothing is expanded
+            self.worker = RecorderWorker(playback_recorder, 'play_composition', export_path=self.instrumentation_path,
+                                         composition=composition, countdown=countdown, speed_factor=speed_factor)
+        else:
+            # Plan options need every event: the worker expands a composition
+            # into this playback's recorder only
+            playback_recorder.composition = composition
+            self.worker = RecorderWorker(playback_recorder, 'play', export_path=self.instrumentation_path,
+                                         countdown=countdown, speed_factor=speed_factor, only_essential_moves=only_essential,
+                                         simplify_mode=simplify_mode, simplify_tolerance=simplify_tolerance,
+                                         simplify_min_interval=simplify_min_interval, repeat=repeat, gap=gap, coordinate_mode=coordinate_mode,
+                                         dispatch_rate=dispatch_rate, interpolation=interpolation)
+        playback_recorder.prepare_playback()
         self.worker_thread = QThread()
         self.worker.moveToThread(self.worker_thread)
 
         self.worker.signals.status_update.connect(self.update_status)
+        self.worker.signals.summary.connect(self.show_summary)
         self.worker.signals.finished.connect(self.on_worker_finished)
         self.worker_thread.started.connect(self.worker.run)
 
         self.set_controls_enabled(False)
         self.stop_btn.setEnabled(True)
         self.update_status("Initializing playback...")
+        self.start_telemetry()
         self.worker_thread.start()
 
 
     def stop_action(self):
-        print("Stop button clicked or action initiated.")
+        log.debug("Stop button clicked or action initiated.")
         if self.worker and self.worker_thread and self.worker_thread.isRunning():
             recorder_instance = self.worker.recorder
             if self.worker.action == 'record' and hasattr(recorder_instance, 'stop_recording'):
-                print("Requesting stop recording...")
+                log.info("Requesting stop recording...")
                 recorder_instance.stop_recording() # Signal the recorder thread to stop
 
-            elif self.worker.action == 'play' and hasattr(recorder_instance, 'is_playing'):
-                 print("Requesting stop playback...")
-                 recorder_instance.is_playing = False # Signal the player to stop
+            elif self.worker.action in ('play', 'play_composition') and hasattr(recorder_instance, 'stop_playback'):
+                 log.info("Requesting stop playback...")
+                 recorder_instance.stop_playback() # Wakes the player immediately
             else:
-                 print("No active record/play action found in worker to stop.")
+                 log.debug("No active record/play action found in worker to stop.")
         else:
-             print("No worker thread running to stop.")
+             log.debug("No worker thread running to stop.")
 
         self.update_status("Stop requested.")
         # UI controls will be re-enabled by on_worker_finished when the worker thread actually exits.
 
     def on_worker_finished(self):
+        self.stop_telemetry()
         self.update_status("Idle")
         self.set_controls_enabled(True)
         self.stop_btn.setEnabled(False)
@@ -522,54 +545,101 @@ class RecorderUI(QWidget):
         self.play_btn.setEnabled(enabled)
         self.save_btn.setEnabled(enabled)
         self.load_btn.setEnabled(enabled)
+        self.convert_btn.setEnabled(enabled)
         self.countdown_spinbox.setEnabled(enabled)
         self.speed_spinbox.setEnabled(enabled)
         self.essential_moves_checkbox.setEnabled(enabled)
+        self.coordinate_combo.setEnabled(enabled)
+        self.rate_combo.setEnabled(enabled)
+        self.repeat_spinbox.setEnabled(enabled)
+        self.gap_spinbox.setEnabled(enabled)
+        self.simplify_combo.setEnabled(enabled)
+        self.simplify_tolerance_spinbox.setEnabled(enabled)
+        self.simplify_interval_spinbox.setEnabled(enabled)
         # Stop button handled separately
 
 
     def save_recording(self):
-        if not self.recorder.recorded['keyboard'] and not self.recorder.recorded['mouse']:
+        if (self.recorder.composition is None
+                and not self.recorder.recorded['keyboard'] and not self.recorder.recorded['mouse']):
              self.update_status("No recording data to save.")
              return
 
-        path, _ = QFileDialog.getSaveFileName(self, 'Save Recording', '', 'JSON Files (*.json)')
+        path, _ = QFileDialog.getSaveFileName(self, 'Save Recording', '', RECORDING_FILE_FILTER)
         if path:
-            try:
-                self.recorder.save(path)
-                self.update_status(f"Recording saved to {path}")
-            except Exception as e:
-                self.update_status(f"Error saving file: {e}")
+            # Large recordings take a while to encode, so this runs on the file pool
+            self.update_status(f"Saving to {path}...")
+            self.run_file_task(save_file, self.recorder, path,
+                               on_result=lambda saved: self.update_status(f"Recording saved to {saved}"),
+                               error_message="Error saving file")
 
     def load_recording(self):
         if self.worker_thread and self.worker_thread.isRunning():
             self.update_status("Cannot load while an action is in progress.")
             return
 
-        path, _ = QFileDialog.getOpenFileName(self, 'Load Recording', '', 'JSON Files (*.json)')
+        path, _ = QFileDialog.getOpenFileName(self, 'Load Recording', '', LOAD_FILE_FILTER)
         if path:
-            try:
-                # Create a new recorder instance to load into, preserving the original if needed
-                self.recorder = BGSI_Recorder()
-                self.recorder.load(path)
-                self.update_status(f"Recording loaded from {path}")
-            except Exception as e:
-                self.update_status(f"Error loading file: {e}")
+            # Loaded into a new recorder on the file pool; the current one stays until it succeeds
+            self.update_status(f"Loading {path}...")
+            self.run_file_task(load_file, path, on_result=lambda recorder: self.on_recording_loaded(recorder, path),
+                               error_message="Error loading file")
+
+    def on_recording_loaded(self, recorder: BGSI_Recorder, path: str):
+        self.recorder = recorder
+        self.update_status(f"Recording loaded from {path}")
+
+    def convert_recordings(self):
+        if self.worker_thread and self.worker_thread.isRunning():
+            self.update_status("Cannot convert while an action is in progress.")
+            return
+
+        paths, _ = QFileDialog.getOpenFileNames(self, 'Convert Recordings', '', RECORDING_FILE_FILTER)
+        if not paths:
+            return
+        labels = [label for label, _, _ in CONVERT_OPTIONS]
+        choice, ok = QInputDialog.getItem(self, 'Convert Recordings', 'Convert to:', labels, 0, False)
+        if not ok:
+            return
+        _, extension, compress = CONVERT_OPTIONS[labels.index(choice)]
+        self.update_status(f"Converting {len(paths)} recordings...")
+        self.run_file_task(convert_files, paths, extension, compress,
+                           on_result=lambda result: self.update_status(
+                               f"Converted {len(result[0])} recordings"
+                               + (f", {len(result[1])} failed (see log)." if result[1] else ".")),
+                           error_message="Error converting")
 
     def closeEvent(self, event):
-        # Ensure threads are stopped on close
+        # Ensure threads are stopped on close; a save in progress is let finish
         self.stop_action()
+        self.telemetry_timer.stop()
+        self.file_pool.waitForDone()
         if self.worker_thread and self.worker_thread.isRunning():
             self.worker_thread.quit()
             self.worker_thread.wait(500) # Short wait
             if self.worker_thread.isRunning():
                 self.worker_thread.terminate() # Force if needed
                 self.worker_thread.wait()
+        # Closing without saving discards this session's recordings; only a
+        # crash or kill leaves journals behind for recover_session
+        discard_session_journals(default_journal_dir())
         event.accept()
 
 
+def option_value(name: str):
+    # Value of a --name=value command line option, or None
+    prefix = f'--{name}='
+    return next((arg[len(prefix):] for arg in sys.argv if arg.startswith(prefix)), None)
+
+
 if __name__ == '__main__':
+    setup_logging(logging.DEBUG if '--debug' in sys.argv else logging.INFO)
+    # --profile=cprofile|sample, --per-event-timing, --instrumentation=PATH.json
+    profile = option_value('profile')
+    if profile is not None and profile not in PROFILE_MODES:
+        sys.exit(f"--profile must be one of {', '.join(PROFILE_MODES)}")
     app = QApplication(sys.argv)
-    ex = RecorderUI()
+    ex = RecorderUI(profile=profile, per_event_timing='--per-event-timing' in sys.argv,
+                    instrumentation_path=option_value('instrumentation'))
     ex.show()
     sys.exit(app.exec()) 
\ No newline at end of file
@@ -0,0 +1,144 @@
+from array import array
+
+import numpy as np
+
+from event_store import EventTrack, MOVE, NO_NAME
+
+# Interpolation between recorded moves, see resample_track
+LINEAR = 'linear'
+SPLINE = 'spline'
+INTERPOLATIONS = (LINEAR, SPLINE)
+
+# Common dispatch rates offered by the UI and CLI, in Hz
+DISPATCH_RATES = (125, 250, 500)
+
+# A pause this long between two moves means the cursor rested; the path is
+# not interpolated across it (the recorded position is held instead)
+HOLD_GAP = 0.05
+
+
+def _segments(kind: np.ndarray, t: np.ndarray):
+    # Row indices of the moves, and (first, last) positions into them of each
+    # stretch of consecutive moves without a HOLD_GAP pause
+    moves = np.flatnonzero(kind == MOVE)
+    if not len(moves):
+        return moves, moves, moves
+    breaks = np.ones(len(moves), dtype=bool)
+    breaks[1:] = (np.diff(moves) != 1) | (np.diff(t[moves]) > HOLD_GAP)
+    first = np.flatnonzero(breaks)
+    last = np.concatenate((first[1:] - 1, [len(moves) - 1]))
+    return moves, first, last
+
+
+def _tangents(times, values, first, last):
+    # Finite-difference slope at every point, from its neighbours within its
+    # own segment (one-sided at the ends, zero for single points)
+    segment = np.repeat(np.arange(len(first)), last - first + 1)
+    index = np.arange(len(times))
+    before = np.maximum(index - 1, first[segment])
+    after = np.minimum(index + 1, last[segment])
+    span = times[after] - times[before]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(span > 0, (values[after] - values[before]) / span, 0.0)
+
+
+def _interpolate(times, values, slopes, k, query, spline: bool):
+    # Value at `query` between points k and k + 1, linear or cubic Hermite
+    h = times[k + 1] - times[k]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        s = np.where(h > 0, (query - times[k]) / h, 1.0)
+    a = values[k]
+    b = values[k + 1]
+    if not spline:
+        return a + s * (b - a)
+    s2 = s * s
+    s3 = s2 * s
+    return ((2 * s3 - 3 * s2 + 1) * a + (s3 - 2 * s2 + s) * h * slopes[k]
+            + (-2 * s3 + 3 * s2) * b + (s3 - s2) * h * slopes[k + 1])
+
+
+def resample_track(track: EventTrack, rate: float, interpolation: str = LINEAR) -> EventTrack:
+    """
+    New track with every stretch of mouse moves resampled to `rate` moves per
+    second, interpolated linearly or with a cubic spline through the recorded
+    points.
+
+    Clicks and scrolls are unchanged, and the first and last move of every
+    stretch keep their exact position and time, so the cursor is always
+    exactly where it was recorded at a click. Pauses longer than HOLD_GAP are
+    held, not interpolated across, and samples that would not move the cursor
+    are dropped. Upsamples sparse captures as well as thinning dense ones.
+    """
+    if interpolation not in INTERPOLATIONS:
+        raise ValueError(f"Unknown interpolation {interpolation!r}, expected one of {INTERPOLATIONS}")
+    if rate <= 0:
+        raise ValueError(f"Dispatch rate must be positive, got {rate}")
+
+    columns = track.columns_numpy()
+    kind = columns['kind'].copy()
+    code = columns['code'].copy()
+    delta = columns['delta'].copy()
+    t = columns['t'].copy()
+    x = columns['x'].astype(np.float64)
+    y = columns['y'].astype(np.float64)
+    del columns
+
+    moves, first, last = _segments(kind, t)
+    if not len(moves):
+        return track.take(range(len(track)))
+    mt, mx, my = t[moves], x[moves], y[moves]
+
+    # Samples every 1/rate seconds from each segment start (the first is the
+    # exact first move) up to less than one period before the segment's end
+    # point, then the end point itself
+    counts = np.ceil((mt[last] - mt[first]) * rate - 1e-9).astype(np.int64)
+    counts = np.where(mt[last] > mt[first], np.maximum(counts, 1), 0)
+    segment = np.repeat(np.arange(len(first)), counts)
+    step = np.arange(len(segment)) - np.repeat(np.cumsum(counts) - counts, counts)
+    query = mt[first][segment] + step / rate
+    sample_x = sample_y = query
+    if len(query):
+        # Segments with samples span at least two moves, so k + 1 stays inside
+        k = np.searchsorted(mt, query, side='right') - 1
+        k = np.clip(k, first[segment], last[segment] - 1)
+        spline = interpolation == SPLINE
+        slopes_x = _tangents(mt, mx, first, last) if spline else None
+        slopes_y = _tangents(mt, my, first, last) if spline else None
+        sample_x = np.rint(_interpolate(mt, mx, slopes_x, k, query, spline))
+        sample_y = np.rint(_interpolate(mt, my, slopes_y, k, query, spline))
+
+    # Every output move, ordered by segment and then by step
+    out_segment = np.concatenate((segment, np.arange(len(first))))
+    out_step = np.concatenate((step, counts))
+    out_t = np.concatenate((query, mt[last]))
+    out_x = np.concatenate((sample_x, mx[last]))
+    out_y = np.concatenate((sample_y, my[last]))
+    order = np.lexsort((out_step, out_segment))
+    out_segment, out_step = out_segment[order], out_step[order]
+    out_t, out_x, out_y = out_t[order], out_x[order], out_y[order]
+
+    # Drop samples that land where the previous one already put the cursor,
+    # but never a segment's end point
+    keep = np.ones(len(out_t), dtype=bool)
+    keep[1:] = ~((out_segment[1:] == out_segment[:-1]) & (out_x[1:] == out_x[:-1]) & (out_y[1:] == out_y[:-1]))
+    keep |= out_step == counts[out_segment]
+    out_segment, out_step = out_segment[keep], out_step[keep]
+    out_t, out_x, out_y = out_t[keep], out_x[keep], out_y[keep]
+
+    # Merge with the other rows: each segment takes the place of its first move
+    others = np.flatnonzero(kind != MOVE)
+    position = np.concatenate((others, moves[first][out_segment]))
+    sub = np.concatenate((np.zeros(len(others), dtype=np.int64), out_step + 1))
+    order = np.lexsort((sub, position))
+    columns = {
+        'kind': (np.concatenate((kind[others], np.full(len(out_t), MOVE, np.uint8))), 'B'),
+        'code': (np.concatenate((code[others], np.full(len(out_t), NO_NAME, np.uint16))), 'H'),
+        'x': (np.concatenate((x[others], out_x)).astype(np.int32), 'i'),
+        'y': (np.concatenate((y[others], out_y)).astype(np.int32), 'i'),
+        'delta': (np.concatenate((delta[others], np.zeros(len(out_t)))), 'd'),
+        't': (np.concatenate((t[others], out_t)), 'd'),
+    }
+    result = track.take(())
+    for name, (values, typecode) in columns.items():
+        setattr(result, name, array(typecode, values[order].tobytes()))
+    return result
@@ -0,0 +1,226 @@
+import weakref
+from collections import OrderedDict
+
+import numpy as np
+
+from event_store import EventTrack, MOVE
+
+# Selectable algorithms, see simplify_track
+RDP = 'rdp'
+DECIMATE = 'decimate'
+VELOCITY = 'velocity'
+MODES = (RDP, DECIMATE, VELOCITY)
+
+# Filter results kept per track, see FilterCache
+FILTER_CACHE_SIZE = 8
+
+
+class SimplifyResult:
+    """Outcome of a simplification pass: the kept row indices plus quality metrics."""
+
+    def __init__(self, mode: str, indices: np.ndarray, original: int, max_error: float, max_sync_error: float):
+        self.mode = mode
+        self.indices = indices
+        self.original = original
+        self.kept = len(indices)
+        # Largest distance from a dropped move to the kept path (pixels), and
+        # to where the kept path puts the cursor at that moment in time
+        self.max_error = max_error
+        self.max_sync_error = max_sync_error
+
+    @property
+    def reduction_ratio(self) -> float:
+        # Fraction of events removed
+        return 1 - self.kept / self.original if self.original else 0.0
+
+    def summary(self) -> dict:
+        return {
+            'mode': self.mode,
+            'original': self.original,
+            'kept': self.kept,
+            'reduction_ratio': self.reduction_ratio,
+            'max_error_px': self.max_error,
+            'max_sync_error_px': self.max_sync_error,
+        }
+
+    def format(self) -> str:
+        return (f"{self.mode}: {self.original} -> {self.kept} mouse events "
+                f"({self.reduction_ratio:.1%} removed), max error {self.max_error:.2f}px "
+                f"(time-synchronised {self.max_sync_error:.2f}px)")
+
+
+def _runs(kind: np.ndarray):
+    # (start, end) inclusive index pairs of consecutive move events
+    is_move = np.concatenate(([False], kind == MOVE, [False]))
+    edges = np.flatnonzero(np.diff(is_move.astype(np.int8)))
+    return edges[0::2], edges[1::2] - 1
+
+
+def _segment_distance(px, py, ax, ay, bx, by):
+    # Distance from points p to the segments a-b (all arrays broadcast)
+    dx = bx - ax
+    dy = by - ay
+    length_sq = dx * dx + dy * dy
+    with np.errstate(invalid='ignore', divide='ignore'):
+        u = np.where(length_sq > 0, ((px - ax) * dx + (py - ay) * dy) / length_sq, 0.0)
+    u = np.clip(u, 0.0, 1.0)
+    return np.hypot(px - (ax + u * dx), py - (ay + u * dy))
+
+
+def _sync_distance(px, py, pt, ax, ay, at, bx, by, bt):
+    # Synchronised Euclidean distance: how far p is from where linear motion
+    # from a to b would put the cursor at time pt
+    span = bt - at
+    with np.errstate(invalid='ignore', divide='ignore'):
+        u = np.where(span > 0, (pt - at) / span, 0.0)
+    return np.hypot(px - (ax + u * (bx - ax)), py - (ay + u * (by - ay)))
+
+
+def _split_simplify(x, y, t, start: int, end: int, tolerance: float, synchronised: bool, keep: np.ndarray):
+    # Iterative Ramer-Douglas-Peucker over [start, end]; each split evaluates
+    # all interior points of the segment in one vectorized step
+    stack = [(start, end)]
+    while stack:
+        a, b = stack.pop()
+        if b - a < 2:
+            continue
+        sl = slice(a + 1, b)
+        if synchronised:
+            d = _sync_distance(x[sl], y[sl], t[sl], x[a], y[a], t[a], x[b], y[b], t[b])
+        else:
+            d = _segment_distance(x[sl], y[sl], x[a], y[a], x[b], y[b])
+        i = int(np.argmax(d))
+        if d[i] > tolerance:
+            split = a + 1 + i
+            keep[split] = True
+            stack.append((a, split))
+            stack.append((split, b))
+
+
+def _first_per_bucket(values: np.ndarray, size: float) -> np.ndarray:
+    # Mask of the first value in each `size` wide bucket (values ascending)
+    bucket = np.floor((values - values[0]) / size)
+    first = np.ones(len(values), dtype=bool)
+    first[1:] = bucket[1:] != bucket[:-1]
+    return first
+
+
+def _decimate(x, y, t, starts, ends, min_distance: float, min_interval: float, keep: np.ndarray):
+    # Within each run keep the first move of every min_distance stretch of
+    # travelled path, then thin those to the first of every min_interval slice
+    for a, b in zip(starts, ends):
+        candidates = np.arange(a, b + 1)
+        if min_distance > 0:
+            travelled = np.concatenate(([0.0], np.cumsum(np.hypot(np.diff(x[candidates]), np.diff(y[candidates])))))
+            candidates = candidates[_first_per_bucket(travelled, min_distance)]
+        if min_interval > 0:
+            candidates = candidates[_first_per_bucket(t[candidates], min_interval)]
+        keep[candidates] = True
+
+
+def _errors(kind, x, y, t, keep):
+    # Max distance of every dropped move to the kept path between its neighbours
+    kept_moves = np.flatnonzero(keep & (kind == MOVE))
+    dropped = np.flatnonzero(~keep)
+    if len(dropped) == 0 or len(kept_moves) == 0:
+        return 0.0, 0.0
+    # Run endpoints are always kept, so every dropped move has kept moves on
+    # both sides within its own run
+    right = kept_moves[np.searchsorted(kept_moves, dropped)]
+    left = kept_moves[np.searchsorted(kept_moves, dropped) - 1]
+    spatial = _segment_distance(x[dropped], y[dropped], x[left], y[left], x[right], y[right])
+    sync = _sync_distance(x[dropped], y[dropped], t[dropped], x[left], y[left], t[left],
+                          x[right], y[right], t[right])
+    return float(spatial.max()), float(sync.max())
+
+
+def simplify_track(track: EventTrack, mode: str = RDP, tolerance: float = 2.0,
+                   min_interval: float = 0.0) -> SimplifyResult:
+    """
+    Selects the mouse events to keep for a simplified path.
+
+    Clicks and scrolls, the moves on either side of them and the ends of every
+    run of moves are always kept, so essential positions stay exact. Kept
+    events retain their original timestamps.
+
+    - 'rdp': Ramer-Douglas-Peucker, `tolerance` is the max deviation in pixels
+      from the simplified path.
+    - 'decimate': keep a move every `tolerance` pixels of travel and, if
+      `min_interval` > 0, at most one per `min_interval` seconds.
+    - 'velocity': time-aware RDP using the synchronised distance, so the speed
+      profile along the path is preserved as well as its shape.
+    """
+    if mode not in MODES:
+        raise ValueError(f"Unknown simplification mode {mode!r}, expected one of {MODES}")
+
+    columns = track.columns_numpy()
+    kind = columns['kind']
+    x = columns['x'].astype(np.float64)
+    y = columns['y'].astype(np.float64)
+    t = columns['t'].copy()
+    del columns
+
+    keep = kind != MOVE
+    starts, ends = _runs(kind)
+    keep[starts] = True
+    keep[ends] = True
+
+    if mode == DECIMATE:
+        _decimate(x, y, t, starts, ends, tolerance, min_interval, keep)
+    else:
+        synchronised = mode == VELOCITY
+        for a, b in zip(starts, ends):
+            _split_simplify(x, y, t, int(a), int(b), tolerance, synchronised, keep)
+
+    max_error, max_sync_error = _errors(kind, x, y, t, keep)
+    return SimplifyResult(mode, np.flatnonzero(keep), len(kind), max_error, max_sync_error)
+
+
+def essential_indices(track: EventTrack) -> np.ndarray:
+    """
+    Row indices of the essential mouse events: every click and scroll, the
+    move just before each of them, and the first and last event. The track
+    is not modified; take() the indices for a filtered copy.
+    """
+    kind = track.columns_numpy()['kind']
+    if not len(kind):
+        return np.flatnonzero(kind)
+    keep = kind != MOVE
+    keep[:-1] |= keep[1:]
+    keep[0] = keep[-1] = True
+    return np.flatnonzero(keep)
+
+
+class FilterCache:
+    """
+    Small LRU of filter results (essential indices or SimplifyResults), held
+    like playback_plan.PlanCache: per track object and length, through a weak
+    reference, so a replaced or appended track never gets a stale result.
+    Results are shared; callers must not modify their index arrays.
+    """
+
+    def __init__(self, capacity: int = FILTER_CACHE_SIZE):
+        self.capacity = capacity
+        self._entries = OrderedDict()
+
+    def get(self, track: EventTrack, key, compute):
+        # Result of compute() for this track and key, computed on first use
+        cache_key = (id(track), len(track), key)
+        entry = self._entries.get(cache_key)
+        if entry is not None:
+            track_ref, result = entry
+            if track_ref() is track:
+                self._entries.move_to_end(cache_key)
+                return result
+        result = compute()
+        self._entries[cache_key] = (weakref.ref(track), result)
+        self._entries.move_to_end(cache_key)
+        while len(self._entries) > self.capacity:
+            self._entries.popitem(last=False)
+        return result
+
+    def clear(self):
+        self._entries.clear()
+
+
+filter_cache = FilterCache()
@@ -0,0 +1,142 @@
+import weakref
+from array import array
+from collections import OrderedDict
+
+from playback_scheduler import KEYBOARD, merge_timeline
+from event_store import KEY_DOWN, KEY_UP, MOVE, BUTTON_DOWN, BUTTON_UP, SCROLL, NO_NAME
+
+# Plans compiled from the same tracks, speed, filter and backend are reused
+# across plays (and across BGSI_Recorder instances, as the UI makes one per play)
+PLAN_CACHE_SIZE = 4
+
+
+class PlaybackPlan:
+    """
+    A recording compiled for one speed factor and backend type.
+
+    Parallel arrays in dispatch order: deadline offsets in ns from the start of
+    playback (already divided by the speed factor), integer opcodes, prebuilt
+    argument tuples with key names resolved by the backend, and the source
+    track and row index of each event for traces. Playing a plan is a loop
+    over these with a table lookup per event, see
+    PlaybackScheduler.run_plan.
+
+    `skippable` marks the moves directly followed by another move: when
+    playback is behind, those can be dropped without losing a position that
+    a click, scroll or key press depends on.
+    """
+
+    def __init__(self, speed_factor: float):
+        self.speed_factor = speed_factor
+        self.offsets_ns = array('q')
+        self.ops = array('B')
+        self.args = []
+        self.sources = array('B')
+        self.indices = array('I')
+        self.skippable = array('B')
+        # What the plan was compiled from, for callers that show it
+        self.mouse_track = None
+        self.simplify_result = None
+
+    def __len__(self):
+        return len(self.ops)
+
+
+def compile_plan(keyboard_track, mouse_track, speed_factor: float, resolve_key) -> PlaybackPlan:
+    plan = PlaybackPlan(speed_factor)
+    plan.mouse_track = mouse_track
+    # Same deadline arithmetic as PlaybackScheduler.run
+    scale = 1e9 / speed_factor
+
+    # Each distinct key name is resolved once, not once per event
+    keys = [(resolve_key(name),) for name in keyboard_track.names]
+    buttons = [(name,) for name in mouse_track.names]
+
+    offsets = plan.offsets_ns
+    ops = plan.ops
+    args = plan.args
+    sources = plan.sources
+    indices = plan.indices
+    for t, source, index in merge_timeline(keyboard_track, mouse_track):
+        if source == KEYBOARD:
+            kind = keyboard_track.kind[index]
+            code = keyboard_track.code[index]
+            args.append((None,) if code == NO_NAME else keys[code])
+        else:
+            track = mouse_track
+            kind = track.kind[index]
+            if kind == MOVE:
+                args.append((track.x[index], track.y[index]))
+            elif kind == SCROLL:
+                args.append((track.delta[index],))
+            else:
+                code = track.code[index]
+                args.append((None,) if code == NO_NAME else buttons[code])
+        offsets.append(int(t * scale))
+        ops.append(kind)
+        sources.append(source)
+        indices.append(index)
+    plan.skippable = array('B', [ops[i] == MOVE and ops[i + 1] == MOVE for i in range(len(ops) - 1)])
+    plan.skippable.append(0)
+    return plan
+
+
+# Opcode names, indexed like dispatch_table
+OP_NAMES = ('key_down', 'key_up', 'move', 'button_down', 'button_up', 'scroll')
+
+
+def dispatch_table(backend) -> tuple:
+    # Backend method per opcode, indexed by the KEY_DOWN..SCROLL values
+    table = [None] * (SCROLL + 1)
+    table[KEY_DOWN] = backend.press_key
+    table[KEY_UP] = backend.release_key
+    table[MOVE] = backend.move
+    table[BUTTON_DOWN] = backend.press_button
+    table[BUTTON_UP] = backend.release_button
+    table[SCROLL] = backend.wheel
+    return tuple(table)
+
+
+class PlanCache:
+    """
+    Small LRU of compiled plans. Entries hold weak references to the source
+    tracks and are only returned for the very same track objects at the same
+    length, so appending to or replacing a track invalidates them.
+    """
+
+    def __init__(self, capacity: int = PLAN_CACHE_SIZE):
+        self.capacity = capacity
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+
+    @staticmethod
+    def _key(keyboard_track, mouse_track, speed_factor: float, filter_key, backend) -> tuple:
+        return (id(keyboard_track), id(mouse_track), len(keyboard_track), len(mouse_track),
+                speed_factor, filter_key, type(backend))
+
+    def get(self, keyboard_track, mouse_track, speed_factor: float, filter_key, backend):
+        key = self._key(keyboard_track, mouse_track, speed_factor, filter_key, backend)
+        entry = self._entries.get(key)
+        if entry is not None:
+            keyboard_ref, mouse_ref, plan = entry
+            if keyboard_ref() is keyboard_track and mouse_ref() is mouse_track:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return plan
+            del self._entries[key]
+        self.misses += 1
+        return None
+
+    def put(self, keyboard_track, mouse_track, speed_factor: float, filter_key, backend, plan: PlaybackPlan):
+        key = self._key(keyboard_track, mouse_track, speed_factor, filter_key, backend)
+        self._entries[key] = (weakref.ref(keyboard_track), weakref.ref(mouse_track), plan)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.capacity:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        self._entries.clear()
+
+
+plan_cache = PlanCache()
@@ -0,0 +1,168 @@
+import heapq
+import time
+from itertools import count, repeat
+from array import array
+
+# Event sources on the merged timeline. Keyboard sorts before mouse when two
+# events share a timestamp, so a key press lands before a click recorded in
+# the same instant.
+KEYBOARD = 0
+MOUSE = 1
+
+# Hybrid wait: sleep until this close to the deadline, then spin on the clock.
+# OS sleep granularity is ~1ms on Windows (high resolution timers) and much
+# finer on Linux, so 2ms leaves room for a late wakeup without burning a core.
+DEFAULT_SPIN_NS = 2_000_000
+
+
+def merge_timeline(keyboard_track, mouse_track):
+    # Both tracks are recorded in time order, so a k-way merge over their
+    # timestamp columns yields a single ordered timeline without sorting or
+    # copying. Yields (t, source, row index); the index also keeps the merge
+    # stable.
+    kb = zip(keyboard_track.t, repeat(KEYBOARD), count())
+    ms = zip(mouse_track.t, repeat(MOUSE), count())
+    for t, source, index in heapq.merge(kb, ms):
+        yield t, source, index
+
+
+class LatenessStats:
+    """Per-event dispatch lateness (actual - scheduled) in nanoseconds."""
+
+    def __init__(self):
+        self.samples = array('q')
+        # Stale moves dropped to catch up, see PlaybackScheduler.run_plan
+        self.skipped = 0
+
+    def add(self, lateness_ns: int):
+        self.samples.append(lateness_ns)
+
+    def __len__(self):
+        return len(self.samples)
+
+    def extend(self, other: 'LatenessStats'):
+        self.samples.extend(other.samples)
+        self.skipped += other.skipped
+
+    def summary(self) -> dict:
+        if not self.samples:
+            return {'count': 0, 'mean_ms': 0.0, 'p50_ms': 0.0, 'p95_ms': 0.0, 'p99_ms': 0.0, 'max_ms': 0.0,
+                    'skipped': self.skipped}
+        ordered = sorted(self.samples)
+        last = len(ordered) - 1
+
+        def pick(p):
+            return ordered[min(last, int(round(p / 100 * last)))] / 1e6
+
+        return {
+            'count': len(ordered),
+            'mean_ms': sum(ordered) / len(ordered) / 1e6,
+            'p50_ms': pick(50),
+            'p95_ms': pick(95),
+            'p99_ms': pick(99),
+            'max_ms': ordered[-1] / 1e6,
+            'skipped': self.skipped,
+        }
+
+    def format(self) -> str:
+        s = self.summary()
+        text = (f"{s['count']} events, lateness mean={s['mean_ms']:.3f}ms "
+                f"p50={s['p50_ms']:.3f}ms p99={s['p99_ms']:.3f}ms max={s['max_ms']:.3f}ms")
+        if self.skipped:
+            text += f", {self.skipped} stale moves skipped"
+        return text
+
+
+class PlaybackScheduler:
+    """Dispatches a merged timeline against a monotonic perf_counter_ns clock."""
+
+    def __init__(self, spin_ns: int = DEFAULT_SPIN_NS):
+        self.spin_ns = spin_ns
+        # Stats of the loop in progress, for pollers on other threads (see
+        # BGSI_Recorder.telemetry). Reading it never touches the loop itself.
+        self.live = None
+
+    def wait_until(self, deadline_ns: int, cancel) -> bool:
+        # Returns False if `cancel` (a recorder_thread.CancelToken) fired while
+        # waiting. The sleep phase blocks on the token, so a stop wakes it at once.
+        while True:
+            remaining = deadline_ns - time.perf_counter_ns()
+            if remaining <= 0:
+                return True
+            if cancel.cancelled:
+                return False
+            if remaining > self.spin_ns:
+                if cancel.wait((remaining - self.spin_ns) / 1e9):
+                    return False
+            # Otherwise spin until the deadline
+
+    def run(self, timeline, speed_factor: float, start_ns: int, dispatch, cancel,
+            trace=None, trace_origin_ns: int = None) -> LatenessStats:
+        # Deadlines are absolute offsets from start_ns, never from the previous
+        # event, so a late dispatch does not push every following event back.
+        # `trace` is an optional recorder_log.TraceWriter. Timeline events are
+        # row indices, or streamed rows (recording_stream) that start with one.
+        # Trace times are relative to trace_origin_ns (default start_ns).
+        origin = start_ns if trace_origin_ns is None else trace_origin_ns
+        stats = LatenessStats()
+        self.live = stats
+        scale = 1e9 / speed_factor
+        for t, source, event in timeline:
+            deadline = start_ns + int(t * scale)
+            if not self.wait_until(deadline, cancel):
+                break
+            if cancel.cancelled:
+                break
+            now = time.perf_counter_ns()
+            stats.add(now - deadline)
+            dispatch(source, event)
+            if trace is not None:
+                trace.write(deadline - origin, now - origin, source,
+                            event if type(event) is int else event[0])
+        return stats
+
+    def run_plan(self, plan, start_ns: int, table, cancel, trace=None, on_error=None,
+                 trace_origin_ns: int = None, first: int = 0, last: int = None,
+                 skip_stale: bool = False) -> LatenessStats:
+        # Plays a playback_plan.PlaybackPlan: deadlines are precomputed and each
+        # event is one call through `table`, the backend method per opcode.
+        # Errors from a dispatch go to on_error(op, args, exception) and
+        # playback continues. Only events first..last-1 are played; start_ns
+        # is still when the plan's time zero would be. With skip_stale, a
+        # skippable move is dropped when the next event is already due, so a
+        # late player catches up instead of replaying every stale move.
+        origin = start_ns if trace_origin_ns is None else trace_origin_ns
+        stats = LatenessStats()
+        self.live = stats
+        add = stats.add
+        clock = time.perf_counter_ns
+        # Memoryview slices of the columns and indexing into the argument list
+        # make starting mid-plan O(1): nothing before `first` is copied or walked
+        if last is None:
+            last = len(plan)
+        arguments = plan.args
+        events = zip(memoryview(plan.offsets_ns)[first:last], memoryview(plan.ops)[first:last])
+        offsets = plan.offsets_ns
+        skippable = plan.skippable if skip_stale else None
+        final = last - 1
+        for i, (offset, op) in enumerate(events, first):
+            args = arguments[i]
+            deadline = start_ns + offset
+            if not self.wait_until(deadline, cancel):
+                break
+            if cancel.cancelled:
+                break
+            now = clock()
+            if skippable is not None and skippable[i] and i < final and now >= start_ns + offsets[i + 1]:
+                stats.skipped += 1
+                continue
+            add(now - deadline)
+            try:
+                table[op](*args)
+            except Exception as e:
+                if on_error is None:
+                    raise
+                on_error(op, args, e)
+            if trace is not None:
+                trace.write(deadline - origin, now - origin, plan.sources[i], plan.indices[i])
+        return stats
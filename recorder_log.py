@@ -0,0 +1,145 @@
+import atexit
+import logging
+import logging.handlers
+import os
+import queue
+import struct
+import sys
+from array import array
+
+LOGGER_NAME = 'riftrecorder'
+LOG_FORMAT = '%(asctime)s [%(levelname)s] %(threadName)s: %(message)s'
+
+logger = logging.getLogger(LOGGER_NAME)
+# Silent unless an application calls setup_logging
+logger.addHandler(logging.NullHandler())
+
+_listener = None
+
+
+def get_logger(name: str = None) -> logging.Logger:
+    return logger.getChild(name) if name else logger
+
+
+def setup_logging(level: int = logging.INFO, stream=None) -> logging.Logger:
+    """
+    Route RiftRecorder logging through a background queue.
+
+    Callers only put records on an in-memory queue; a QueueListener thread
+    does the formatting and the (possibly slow, e.g. Windows console) writes.
+    Calling it again just changes the level.
+    """
+    global _listener
+    logger.setLevel(level)
+    if _listener is not None:
+        return logger
+
+    handler = logging.StreamHandler(stream if stream is not None else sys.stderr)
+    handler.setFormatter(logging.Formatter(LOG_FORMAT))
+    log_queue = queue.SimpleQueue()
+    logger.addHandler(logging.handlers.QueueHandler(log_queue))
+    logger.propagate = False
+    _listener = logging.handlers.QueueListener(log_queue, handler, respect_handler_level=True)
+    _listener.start()
+    atexit.register(shutdown_logging)
+    return logger
+
+
+def shutdown_logging():
+    # Flushes whatever is still queued
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+# --- Dispatch trace files ---
+#
+# A trace records, per dispatched event, when it was scheduled and when it was
+# actually dispatched (ns since playback start), its source track and its row
+# index. Written by PlaybackScheduler when a TraceWriter is passed in.
+
+TRACE_MAGIC = b'RRT\x00'
+TRACE_VERSION = 1
+TRACE_EXTENSION = '.rrt'
+TRACE_HEADER = struct.Struct('<4sHxxd')
+TRACE_RECORD = struct.Struct('<qqBxxxI')
+
+
+class TraceWriter:
+    def __init__(self, path: str, speed_factor: float = 1.0):
+        self.path = path
+        self.count = 0
+        # Large buffer so the hot loop only memcpys; the OS write happens rarely
+        self._file = open(path, 'wb', buffering=1 << 20)
+        self._file.write(TRACE_HEADER.pack(TRACE_MAGIC, TRACE_VERSION, speed_factor))
+        self._pack = TRACE_RECORD.pack
+
+    def write(self, scheduled_ns: int, actual_ns: int, source: int, index: int):
+        self._file.write(self._pack(scheduled_ns, actual_ns, source, index))
+        self.count += 1
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class Trace:
+    """A loaded trace file as parallel columns."""
+
+    def __init__(self, path: str):
+        with open(path, 'rb') as f:
+            data = f.read()
+        magic, version, self.speed_factor = TRACE_HEADER.unpack_from(data, 0)
+        if magic != TRACE_MAGIC:
+            raise ValueError(f"{path} is not a playback trace")
+        if version > TRACE_VERSION:
+            raise ValueError(f"Unsupported trace version {version} (max {TRACE_VERSION})")
+        self.path = path
+        self.scheduled_ns = array('q')
+        self.actual_ns = array('q')
+        self.source = array('B')
+        self.index = array('I')
+        body = memoryview(data)[TRACE_HEADER.size:]
+        usable = len(body) - len(body) % TRACE_RECORD.size
+        for scheduled, actual, source, index in TRACE_RECORD.iter_unpack(body[:usable]):
+            self.scheduled_ns.append(scheduled)
+            self.actual_ns.append(actual)
+            self.source.append(source)
+            self.index.append(index)
+        body.release()
+
+    def __len__(self):
+        return len(self.scheduled_ns)
+
+    def lateness_ns(self) -> list:
+        return [a - s for s, a in zip(self.scheduled_ns, self.actual_ns)]
+
+    def summary(self) -> dict:
+        lateness = sorted(self.lateness_ns())
+        if not lateness:
+            return {'events': 0}
+        last = len(lateness) - 1
+
+        def pick(p):
+            return lateness[min(last, int(round(p / 100 * last)))] / 1e6
+
+        return {
+            'events': len(lateness),
+            'speed_factor': self.speed_factor,
+            'duration_s': (self.actual_ns[-1] - self.actual_ns[0]) / 1e9,
+            'lateness_mean_ms': sum(lateness) / len(lateness) / 1e6,
+            'lateness_p50_ms': pick(50),
+            'lateness_p99_ms': pick(99),
+            'lateness_max_ms': lateness[-1] / 1e6,
+            'late_over_1ms': sum(1 for value in lateness if value > 1_000_000),
+        }
+
+
+def default_trace_path(recording_path: str) -> str:
+    return os.path.splitext(recording_path)[0] + TRACE_EXTENSION
@@ -0,0 +1,747 @@
+import os
+import shutil
+import time
+from bisect import bisect_left
+from threading import Thread, Event
+from playback_scheduler import PlaybackScheduler, LatenessStats
+from recording_format import load_recording, save_recording
+from event_store import new_recording, as_tracks, KEY_DOWN, KEY_UP, MOVE, BUTTON_DOWN, BUTTON_UP, SCROLL
+from capture_buffer import CaptureRing, CaptureStats
+from path_simplify import simplify_track, essential_indices, filter_cache
+from input_backend import InputBackend, default_backend
+from recorder_log import get_logger, TraceWriter
+from recorder_thread import CancelToken
+from playback_plan import OP_NAMES, PlaybackPlan, compile_plan, dispatch_table, plan_cache
+from coordinate_space import ABSOLUTE, IDENTITY, playback_transform, transform_track, transform_point
+from recording_index import RecordingIndex
+from timing_normalize import normalize_recording
+from path_resample import LINEAR, resample_track
+from instrumentation import Instrumentation
+from recording_stream import RecordingStream, DEFAULT_CHUNK_ROWS, DEFAULT_READ_AHEAD
+from composition import Composition, is_composition
+from journal import JournalWriter, JOURNAL_EXTENSION, session_journal_path
+
+log = get_logger('recorder')
+
+# How often the capture consumer drains the hook ring buffers
+CAPTURE_DRAIN_INTERVAL = 0.005
+
+
+class BGSI_Recorder:
+    def __init__(self, recorded: dict = None, stop_key: str = 'esc', backend: InputBackend = None,
+                 journal_dir: str = None, instrumentation: Instrumentation = None):
+        self.start_time = None
+        self.play_start_time = None
+        # Recording and playback each stop through a CancelToken so every
+        # wait (countdown, listener, scheduler) wakes as soon as stop is requested
+        self.record_cancel = CancelToken()
+        self.play_cancel = CancelToken()
+        self._playing = False
+        # Set by the keyboard hook when the stop key arrives so the consumer drains at once
+        self._capture_wakeup = Event()
+        self.speed_factor = 1
+        self.trace_origin_ns = None
+        self.stop_key = stop_key
+        # Where hooks come from and injected input goes, see input_backend
+        self.backend = backend if backend is not None else default_backend()
+        self.scheduler = PlaybackScheduler()
+        self.playback_stats = None
+        # One dict per run of a looped play, see run_iterations
+        self.iteration_stats = []
+        # Progress of the current play for telemetry(): events dispatched by
+        # finished runs, and the expected length (None if unknown or endless)
+        self._completed_events = 0
+        self.playback_total_ns = None
+        self.simplify_result = None
+        # Per-event debug logging in the playback loop; off by default since
+        # even queued logging costs microseconds per event
+        self.log_events = False
+        self.stop_time = None
+        # Phase timings, counters and optional profiling, see instrumentation
+        self.instrumentation = instrumentation if instrumentation is not None else Instrumentation()
+        self._mouse_hook = None
+
+        # Hooks only push raw events into these rings; capture_consumer drains them
+        self.capture_rings = {'keyboard': CaptureRing(), 'mouse': CaptureRing()}
+        self.capture_stats = CaptureStats()
+
+        # With a journal_dir, recordings are streamed to a crash-safe session
+        # journal there while they run, see journal.JournalWriter
+        self.journal_dir = journal_dir
+        self.journal = None
+        self.journal_path = None
+        self._journal_tracks = None
+
+        # Tracks are columnar EventTracks; legacy list-of-lists dicts are converted
+        self.recorded = as_tracks(recorded) if recorded else new_recording()
+        self._index = None
+        # A loaded .rcomp, kept as segments and played with play_composition;
+        # `recorded` stays empty until expand_composition()
+        self.composition = None
+
+    @property
+    def stop_recording_flag(self) -> bool:
+        return self.record_cancel.cancelled
+
+    @property
+    def is_playing(self) -> bool:
+        return self._playing and not self.play_cancel.cancelled
+
+    @is_playing.setter
+    def is_playing(self, value: bool):
+        self._playing = value
+
+    def prepare_playback(self):
+        # Re-arms play_cancel after an earlier stop. Call it where playback is
+        # scheduled, before the playing thread starts, so a stop requested in
+        # between still cancels the run instead of being cleared by play()
+        self.play_cancel.reset()
+
+    def stop_playback(self):
+        self.play_cancel.cancel()
+        self.is_playing = False
+
+    def record(self, countdown: float = 0.001):
+        with self.instrumentation.session('record'):
+            self.start_time = time.time() + countdown
+            # Start listeners in separate threads to avoid blocking
+            mouse_listener_thread = Thread(target=self.mouse_listener)
+            keyboard_listener_thread = Thread(target=self.keyboard_listener)
+            consumer_thread = Thread(target=self.capture_consumer)
+
+            self.capture_stats.started = self.start_time
+            if self.recorded['mouse'].geometry is None:
+                # Stored with the recording so it can be replayed on other screen layouts
+                geometry = self.backend.screen_geometry()
+                self.recorded['mouse'].geometry = tuple(geometry) if geometry is not None else None
+            if self.journal_dir:
+                self.journal = JournalWriter(session_journal_path(self.journal_dir, self.start_time),
+                                             self.recorded, self.start_time)
+                self.journal.start()
+                log.info("Journaling recording to %s", self.journal.path)
+            with self.instrumentation.phase('record.start_threads'):
+                consumer_thread.start()
+                mouse_listener_thread.start()
+                keyboard_listener_thread.start()
+
+            # Wait for threads to potentially finish (e.g., if stop is called quickly)
+            # This might need adjustment depending on desired behavior on stop
+            keyboard_listener_thread.join() # keyboard_listener blocks until stop_key or flag
+            # mouse listener runs until unhooked by stop_recording
+            mouse_listener_thread.join() # Wait for mouse listener to finish after unhook
+            consumer_thread.join()
+            # Hooks are gone now, pick up anything pushed after the consumer's last pass
+            self.drain_capture()
+            self.capture_stats.finished = self.stop_time
+            log.info("Capture stats: %s", self.get_capture_stats())
+            self.instrumentation.count('record.events', len(self.recorded['keyboard']) + len(self.recorded['mouse']))
+            if self.journal is not None:
+                with self.instrumentation.phase('record.journal_close'):
+                    self.journal.close()
+                log.info("Journal complete: %d events in %d batches", self.journal.rows_written,
+                         self.journal.batches_written)
+                self.attach_journal(self.journal.path)
+                self.journal = None
+
+
+    def play(self, countdown: float = 0.001, speed_factor: float = 1, only_essential_moves: bool = False,
+             simplify_mode: str = None, simplify_tolerance: float = 2.0, trace_path: str = None,
+             repeat: int = 1, gap: float = 0.0, on_iteration=None,
+             coordinate_mode: str = ABSOLUTE, playback_geometry: tuple = None,
+             start: float = None, end: float = None, dispatch_rate: float = None,
+             interpolation: str = LINEAR, skip_stale_moves: bool = None, simplify_min_interval: float = 0.0):
+        # repeat=0 loops until stopped. Runs follow each other gap seconds
+        # apart on the same clock, thread and compiled plan;
+        # on_iteration(stats dict) is called after each one.
+        # coordinate_mode maps the recorded mouse coordinates onto this screen,
+        # see coordinate_space; playback_geometry defaults to the backend's.
+        # start/end play only that part of the recording (seconds): keys and
+        # buttons held at `start` are pressed and the cursor placed first, and
+        # whatever is still held at `end` is released.
+        # dispatch_rate (Hz, wall clock) resamples mouse moves to that rate, see
+        # path_resample; skip_stale_moves drops moves that are already
+        # overdue when playback falls behind (default: on when resampling).
+        # simplify_min_interval caps 'decimate' at one move per that many seconds.
+        with self.instrumentation.session('play'):
+            self.is_playing = True
+            if skip_stale_moves is None:
+                skip_stale_moves = dispatch_rate is not None
+
+            if speed_factor > 5:
+                speed_factor = 5
+
+            # Seek state comes from the recording as it is, before any filtering
+            with self.instrumentation.phase('play.seek'):
+                start_state = self.index.state_at(start) if start else None
+                end_state = self.index.state_at(end) if end is not None else None
+
+            transform = self.coordinate_transform(coordinate_mode, playback_geometry)
+            plan = self.compile_plan(speed_factor, only_essential_moves, simplify_mode, simplify_tolerance, transform,
+                                     dispatch_rate, interpolation, simplify_min_interval)
+            table = self.instrumented_table(dispatch_table(self.backend))
+            if self.log_events:
+                table = self.logging_table(table)
+
+            scale = 1e9 / speed_factor
+            shift_ns = int(start * scale) if start else 0
+            first = bisect_left(plan.offsets_ns, shift_ns) if start else 0
+            last = bisect_left(plan.offsets_ns, int(end * scale)) if end is not None else len(plan)
+            final_ns = plan.offsets_ns[-1] if len(plan) else 0
+            if end is not None:
+                final_ns = min(final_ns, int(end * scale))
+            duration_ns = max(0, final_ns - shift_ns)
+            if start or end is not None:
+                log.info("Playing %d of %d events from %.3fs", max(0, last - first), len(plan), start or 0.0)
+            self.playback_total_ns = (duration_ns * repeat + int(gap * 1e9) * (repeat - 1)) if repeat else None
+
+            def run_once(start_ns, trace, origin_ns):
+                if start_state is not None:
+                    self.restore_state(start_state, transform)
+                stats = self.scheduler.run_plan(plan, start_ns - shift_ns, table, self.play_cancel, trace,
+                                                self.on_dispatch_error, origin_ns, first, last, skip_stale_moves)
+                if end_state is not None and self.scheduler.wait_until(start_ns + duration_ns, self.play_cancel):
+                    self.release_state(end_state)
+                return stats
+
+            self.run_timeline(lambda start_ns, trace: self.run_iterations(
+                run_once, duration_ns, start_ns, trace, repeat, gap, on_iteration),
+                countdown, speed_factor, trace_path)
+            self.instrumentation.count('play.events', len(self.playback_stats))
+            self.instrumentation.count('play.skipped', self.playback_stats.skipped)
+
+    @property
+    def index(self) -> RecordingIndex:
+        # Time index and analytics for the current recording, rebuilt when it changes
+        if self._index is None or not self._index.matches(self.recorded):
+            self._index = RecordingIndex(self.recorded)
+        return self._index
+
+    def restore_state(self, state, transform: tuple = None):
+        # Puts the cursor, held keys and held buttons where a seek point expects them
+        try:
+            if state.cursor is not None:
+                self.backend.move(*transform_point(transform, *state.cursor))
+            for name in state.keys:
+                self.backend.press_key(self.backend.resolve_key(name))
+            for button in state.buttons:
+                self.backend.press_button(button)
+        except Exception as e:
+            log.error("Error restoring input state %s: %s", state, e)
+
+    def release_state(self, state):
+        try:
+            for button in state.buttons:
+                self.backend.release_button(button)
+            for name in state.keys:
+                self.backend.release_key(self.backend.resolve_key(name))
+        except Exception as e:
+            log.error("Error releasing input state %s: %s", state, e)
+
+    def instrumented_table(self, table: tuple) -> tuple:
+        # Times every backend call per opcode when per-event instrumentation is on
+        if not self.instrumentation.per_event:
+            return table
+        return tuple(self.instrumentation.timed(f'dispatch.{name}', method) for name, method in zip(OP_NAMES, table))
+
+    @staticmethod
+    def logging_table(table: tuple) -> tuple:
+        # Wraps each dispatch in a debug log call, for log_events
+        def logged(method):
+            def call(*args):
+                log.debug("-> %s%s", method.__name__, args)
+                method(*args)
+            return call
+        return tuple(logged(method) if method is not None else None for method in table)
+
+    def coordinate_transform(self, mode: str, playback_geometry: tuple = None):
+        # Affine for the current mouse track, or None to replay pixels verbatim
+        if mode in (None, ABSOLUTE):
+            return None
+        if playback_geometry is None:
+            playback_geometry = self.backend.screen_geometry()
+        transform = playback_transform(mode, self.recorded['mouse'], playback_geometry, self.backend.position())
+        if transform is None:
+            log.warning("Coordinate mode '%s' needs the capture geometry and screen size (or cursor position); "
+                        "playing recorded coordinates as-is", mode)
+        elif transform == IDENTITY:
+            return None
+        return transform
+
+    def run_iterations(self, run_once, duration_ns: int, start_ns: int, trace, repeat: int, gap: float,
+                       on_iteration=None) -> LatenessStats:
+        # Each run is scheduled from where the previous one was due to end, not
+        # from when it actually ended, so loops do not accumulate drift
+        self.iteration_stats = []
+        self._completed_events = 0
+        total = LatenessStats()
+        gap_ns = int(gap * 1e9)
+        iteration = 0
+        while (repeat == 0 or iteration < repeat) and not self.play_cancel.cancelled:
+            if not self.scheduler.wait_until(start_ns, self.play_cancel):
+                break
+            began_ns = time.perf_counter_ns()
+            stats = run_once(start_ns, trace, self.trace_origin_ns)
+            ended_ns = time.perf_counter_ns()
+            self.scheduler.live = None
+            self._completed_events += len(stats)
+            total.extend(stats)
+            summary = stats.summary()
+            iteration_stats = {
+                'iteration': iteration + 1,
+                'events': len(stats),
+                'start_lateness_ms': (began_ns - start_ns) / 1e6,
+                'scheduled_s': duration_ns / 1e9,
+                'actual_s': (ended_ns - began_ns) / 1e9,
+                'lateness_p99_ms': summary['p99_ms'],
+                'lateness_max_ms': summary['max_ms'],
+                'completed': not self.play_cancel.cancelled,
+            }
+            self.iteration_stats.append(iteration_stats)
+            if repeat != 1:
+                log.info("Run %d: %d events, p99 %.3fms, started %.3fms late", iteration + 1, len(stats),
+                         summary['p99_ms'], iteration_stats['start_lateness_ms'])
+            if on_iteration is not None:
+                on_iteration(iteration_stats)
+            if not len(stats) and not duration_ns:
+                break  # Nothing to loop over
+            iteration += 1
+            start_ns += duration_ns + gap_ns
+        return total
+
+    def filtered_mouse(self, only_essential_moves: bool = False, simplify_mode: str = None,
+                       simplify_tolerance: float = 2.0, min_interval: float = 0.0):
+        # Copy of the mouse track with the filter applied (the track itself
+        # when there is none); self.recorded is left as it is
+        track = self.recorded['mouse']
+        if only_essential_moves:
+            indices = self.filter_moves()
+        elif simplify_mode:
+            indices = self.simplify_moves(simplify_mode, simplify_tolerance, min_interval).indices
+        else:
+            return track
+        return track.take(indices)
+
+    def apply_filter(self, only_essential_moves: bool = False, simplify_mode: str = None,
+                     simplify_tolerance: float = 2.0, min_interval: float = 0.0):
+        # Replaces the mouse track with its filtered copy, for saving it
+        self.recorded['mouse'] = self.filtered_mouse(only_essential_moves, simplify_mode, simplify_tolerance,
+                                                     min_interval)
+
+    def compile_plan(self, speed_factor: float = 1, only_essential_moves: bool = False, simplify_mode: str = None,
+                     simplify_tolerance: float = 2.0, transform: tuple = None, dispatch_rate: float = None,
+                     interpolation: str = LINEAR, simplify_min_interval: float = 0.0) -> PlaybackPlan:
+        # Filters and compiles the recording into a playback_plan.PlaybackPlan,
+        # or reuses the one compiled earlier for the same tracks and options.
+        # Filtering, `transform` (coordinate_space) and resampling to
+        # dispatch_rate (path_resample) are applied to the compiled moves
+        # only; the recording itself keeps its captured moves, so it can be
+        # played again with other options.
+        keyboard_track = self.recorded['keyboard']
+        mouse_track = self.recorded['mouse']
+        if only_essential_moves:
+            filter_key = ('essential',)
+        elif simplify_mode:
+            filter_key = (simplify_mode, simplify_tolerance, simplify_min_interval)
+        else:
+            filter_key = None
+        if transform is not None:
+            filter_key = (filter_key, transform)
+        if dispatch_rate:
+            filter_key = (filter_key, 'resample', dispatch_rate, interpolation)
+
+        plan = plan_cache.get(keyboard_track, mouse_track, speed_factor, filter_key, self.backend)
+        if plan is not None:
+            log.info("Reusing compiled playback plan (%d events)", len(plan))
+            self.instrumentation.count('play.plan_cache_hits')
+            self.simplify_result = plan.simplify_result
+            return plan
+
+        with self.instrumentation.phase('play.filter'):
+            filtered_mouse = self.filtered_mouse(only_essential_moves, simplify_mode, simplify_tolerance,
+                                                 simplify_min_interval)
+        start = time.perf_counter()
+        playback_mouse = filtered_mouse
+        if dispatch_rate:
+            # The track is in recording time and played speed_factor times
+            # faster, so it is resampled at rate / speed to dispatch at `rate`
+            with self.instrumentation.phase('play.resample'):
+                resampled = resample_track(playback_mouse, dispatch_rate / speed_factor, interpolation)
+            log.info("Resampled mouse track to %gHz at %gx (%s): %d -> %d events", dispatch_rate, speed_factor,
+                     interpolation, len(playback_mouse), len(resampled))
+            playback_mouse = resampled
+        if transform is not None:
+            with self.instrumentation.phase('play.transform'):
+                playback_mouse = transform_track(playback_mouse, transform)
+        with self.instrumentation.phase('play.compile'):
+            plan = compile_plan(keyboard_track, playback_mouse, speed_factor, self.backend.resolve_key)
+        plan.mouse_track = filtered_mouse
+        if simplify_mode and not only_essential_moves:
+            plan.simplify_result = self.simplify_result
+        plan_cache.put(keyboard_track, mouse_track, speed_factor, filter_key, self.backend, plan)
+        log.info("Compiled playback plan: %d events in %.1fms", len(plan), (time.perf_counter() - start) * 1e3)
+        return plan
+
+    def play_stream(self, path: str, countdown: float = 0.001, speed_factor: float = 1, trace_path: str = None,
+                    chunk_rows: int = DEFAULT_CHUNK_ROWS, read_ahead: int = DEFAULT_READ_AHEAD):
+        # Plays a recording file straight from disk without loading it, see
+        # recording_stream. Filters need the whole path, so none are applied.
+        with self.instrumentation.session('play_stream'):
+            self.is_playing = True
+            speed_factor = min(speed_factor, 5)
+            self._completed_events = 0
+            self.playback_total_ns = None
+            dispatch = self.dispatch_row
+            if self.instrumentation.per_event:
+                dispatch = self.instrumentation.timed('dispatch.row', dispatch)
+            with RecordingStream(path, chunk_rows, read_ahead) as stream:
+                self.run_timeline(lambda start_ns, trace: self.scheduler.run(
+                    stream, speed_factor, start_ns, dispatch, self.play_cancel, trace),
+                    countdown, speed_factor, trace_path)
+            self.instrumentation.count('play.events', len(self.playback_stats))
+
+    def play_composition(self, composition: Composition, countdown: float = 0.001, speed_factor: float = 1,
+                         trace_path: str = None):
+        # Plays a composition without expanding it: each referenced recording
+        # is loaded once (the composition's RecordingCache) and its events are
+        # re-timed as they are dispatched. Like play_stream, no filters.
+        with self.instrumentation.session('play_composition'):
+            self.is_playing = True
+            speed_factor = min(speed_factor, 5)
+            self._completed_events = 0
+            with self.instrumentation.phase('play.layout'):
+                self.playback_total_ns = int(composition.duration * 1e9 / speed_factor)
+            dispatch = self.dispatch_row
+            if self.instrumentation.per_event:
+                dispatch = self.instrumentation.timed('dispatch.row', dispatch)
+            timeline = composition.timeline()
+            self.run_timeline(lambda start_ns, trace: self.scheduler.run(
+                timeline, speed_factor, start_ns, dispatch, self.play_cancel, trace),
+                countdown, speed_factor, trace_path)
+            self.instrumentation.count('play.events', len(self.playback_stats))
+
+    def run_timeline(self, run, countdown: float, speed_factor: float, trace_path: str = None):
+        # `run(start_ns, trace)` drives one of the PlaybackScheduler loops and
+        # returns its LatenessStats; this wraps it with the stop key hook and trace
+        self.speed_factor = speed_factor
+        self.play_start_time = time.time() + countdown
+        start_ns = time.perf_counter_ns() + int(countdown * 1e9)
+        self.trace_origin_ns = start_ns
+
+        # The stop key is watched by a keyboard hook for the duration of playback
+        # instead of a thread blocked in a wait, so nothing is left behind afterwards
+        self.backend.hook_keyboard(self.stop_player_listener)
+        log.info("Playback started. Press '%s' to stop.", self.stop_key)
+
+        # Optional binary trace of scheduled vs. actual dispatch times, see recorder_log.Trace
+        trace = TraceWriter(trace_path, speed_factor) if trace_path else None
+        try:
+            self.playback_stats = run(start_ns, trace)
+        finally:
+            try:
+                self.backend.unhook_keyboard(self.stop_player_listener)
+            except Exception as e:
+                log.warning("Error unhooking playback stop key: %s", e)
+            if trace is not None:
+                trace.close()
+                log.info("Wrote %d trace records to %s", trace.count, trace_path)
+        log.info("Playback finished: %s", self.playback_stats.format())
+
+        self.is_playing = False # Ensure flag is reset after playback finishes naturally
+
+    def telemetry(self) -> dict:
+        # Snapshot of the recording or playback in progress, cheap enough to
+        # poll from another thread a few times a second; nothing is pushed
+        # per event. Counters may lag by a few events.
+        if self.is_playing:
+            live = self.scheduler.live
+            now_ns = time.perf_counter_ns()
+            origin = self.trace_origin_ns if self.trace_origin_ns is not None else now_ns
+            samples = live.samples if live is not None else ()
+            return {
+                'state': 'playing',
+                'events': self._completed_events + len(samples),
+                'lateness_ms': samples[-1] / 1e6 if samples else 0.0,
+                'elapsed_s': max(0, now_ns - origin) / 1e9,
+                'total_s': self.playback_total_ns / 1e9 if self.playback_total_ns is not None else None,
+                'run': len(self.iteration_stats) + 1,
+            }
+        if self.start_time is not None and self.stop_time is None:
+            elapsed = max(0.0, time.time() - self.start_time)
+            events = len(self.recorded['keyboard']) + len(self.recorded['mouse'])
+            return {
+                'state': 'recording',
+                'events': events,
+                'events_per_sec': events / elapsed if elapsed else 0.0,
+                'elapsed_s': elapsed,
+            }
+        return {'state': 'idle'}
+
+    def attach_journal(self, path: str):
+        # Marks a complete journal file as holding exactly the current recording
+        self.journal_path = path
+        self._journal_tracks = (self.recorded['keyboard'], self.recorded['mouse'])
+
+    def journal_is_current(self) -> bool:
+        # Filters replace the tracks, after which the journal no longer matches
+        return (self.journal_path is not None and self._journal_tracks is not None
+                and os.path.exists(self.journal_path)
+                and self._journal_tracks[0] is self.recorded['keyboard']
+                and self._journal_tracks[1] is self.recorded['mouse'])
+
+    def discard_journal(self):
+        if self.journal_path is not None and os.path.exists(self.journal_path):
+            try:
+                os.remove(self.journal_path)
+            except OSError as e:
+                log.warning("Could not remove journal %s: %s", self.journal_path, e)
+        self.journal_path = None
+        self._journal_tracks = None
+
+    def save(self, path: str, compress: bool = False, progress=None):
+        # '.rrec' paths are written in the binary format, '.rrj' as a journal,
+        # anything else as JSON. `progress` as in recording_format.save_recording.
+        if path.lower().endswith(JOURNAL_EXTENSION) and self.journal_is_current():
+            # The session journal already is this recording, finalized on disk
+            shutil.move(self.journal_path, path)
+            log.info("Moved session journal %s to %s", self.journal_path, path)
+            self.journal_path = None
+            self._journal_tracks = None
+            return
+        # A loaded composition is written expanded, without keeping the copy
+        recorded = self.composition.flatten() if self.composition is not None else self.recorded
+        with self.instrumentation.phase('save'):
+            save_recording(recorded, path, compress=compress, progress=progress)
+        # Saved for good, the session journal is no longer needed
+        self.discard_journal()
+
+    def load(self, path: str, progress=None):
+        # JSON, binary or journal, detected from the file contents. A
+        # composition is kept as its segments in self.composition, laid out
+        # here so missing segments and cycles fail on load, not on play.
+        # `progress` as in recording_format.load_recording.
+        with self.instrumentation.phase('load'):
+            if is_composition(path):
+                composition = Composition.load(path)
+                composition.layout()
+                self.composition = composition
+                self.recorded = new_recording()
+            else:
+                self.recorded = load_recording(path, progress)
+                self.composition = None
+        with self.instrumentation.phase('load.index'):
+            self._index = RecordingIndex(self.recorded)
+        self.journal_path = None
+        self._journal_tracks = None
+
+    def expand_composition(self):
+        # Replaces a loaded composition with its expanded recording, for the
+        # filters, analytics and file formats that need every event in memory
+        if self.composition is not None:
+            with self.instrumentation.phase('load.expand'):
+                self.recorded = self.composition.flatten()
+            self._index = None
+            self.composition = None
+
+    def keyboard_listener(self):
+        if not self.wait_to_start(self.start_time, self.record_cancel):
+            return
+        log.info("Keyboard listener started. Press '%s' to stop recording.", self.stop_key)
+
+        # Runs on the hook thread: just hand the event (already timestamped by
+        # the library) to the consumer, which handles the stop key. Keyboard
+        # events are rare, so it is worth waking the consumer for the stop key.
+        push = self.capture_rings['keyboard'].push
+        stop_key = self.stop_key
+        wakeup = self._capture_wakeup
+
+        def on_key_event(event):
+            push(event)
+            if event.name == stop_key:
+                wakeup.set()
+
+        if self.instrumentation.per_event:
+            on_key_event = self.instrumentation.timed('record.hook.keyboard', on_key_event)
+
+        try:
+            # Hook the callback
+            self.backend.hook_keyboard(on_key_event)
+            # Keep the listener thread alive until stop_recording is called
+            self.record_cancel.wait()
+        except Exception as e:
+            log.error("Error in keyboard listener: %s", e)
+        finally:
+            # Ensure the hook is removed if the thread exits unexpectedly,
+            # though stop_recording should normally handle it.
+            try:
+                 self.backend.unhook_keyboard(on_key_event)
+            except Exception as e:
+                 pass
+            log.debug("Keyboard listener finished.")
+
+
+    # Mouse listener needs to run until unhooked
+    def mouse_listener(self):
+        if not self.wait_to_start(self.start_time, self.record_cancel):
+            return
+        log.debug("Mouse listener started.")
+        # The same callable has to be passed to unhook_mouse, see stop_recording
+        self._mouse_hook = self.on_callback
+        if self.instrumentation.per_event:
+            self._mouse_hook = self.instrumentation.timed('record.hook.mouse', self.on_callback)
+        try:
+            self.backend.hook_mouse(self._mouse_hook)
+            # Keep the listener thread alive until stop_recording is called
+            self.record_cancel.wait()
+        except Exception as e:
+             log.error("Error setting up mouse hook: %s", e) # May need admin rights
+        finally:
+             # stop_recording normally unhooks; this covers a stop that raced the hook
+             try:
+                 self.backend.unhook_mouse(self._mouse_hook)
+             except Exception:
+                 pass
+             log.debug("Mouse listener finished.")
+
+
+    def on_callback(self, event):
+        # Runs on the mouse hook thread: events carry their own time.time()
+        # stamp, so this is a single push into the ring
+        self.capture_rings['mouse'].push(event)
+
+    def capture_consumer(self):
+        # Drains the hook rings in batches into the recording until stopped
+        drain = self.instrumentation.timed('record.drain', self.drain_capture)
+        while not self.record_cancel.cancelled:
+            self._capture_wakeup.wait(CAPTURE_DRAIN_INTERVAL)
+            self._capture_wakeup.clear()
+            drain()
+
+    def drain_capture(self):
+        start = self.start_time
+        # Events stamped at or after the stop moment are discarded
+        stop = self.stop_time if self.stop_time is not None else float('inf')
+
+        key_down = self.backend.KEY_DOWN
+        batch = self.capture_rings['keyboard'].drain()
+        self.capture_stats.add_batch(len(batch))
+        track = self.recorded['keyboard']
+        for event in batch:
+            if event.time < start or event.time >= stop:
+                continue
+            # Check for stop key
+            if event.name == self.stop_key and event.event_type == key_down:
+                log.info("'%s' pressed. Stopping recording.", self.stop_key)
+                stop = event.time
+                self.stop_recording(stop) # This will set flag and unhook
+                continue # Don't record the stop key itself
+            track.append_key(event.event_type == key_down, event.name, event.time - start)
+
+        batch = self.capture_rings['mouse'].drain()
+        self.capture_stats.add_batch(len(batch))
+        track = self.recorded['mouse']
+        move_event = self.backend.MoveEvent
+        button_event = self.backend.ButtonEvent
+        wheel_event = self.backend.WheelEvent
+        for event in batch:
+            t = event.time
+            if t < start or t >= stop:
+                continue
+            event_class = type(event)
+            if event_class is move_event:
+                track.append_move(event.x, event.y, t - start)
+            elif event_class is button_event:
+                track.append_click(event.button, event.event_type == 'down', t - start)
+            elif event_class is wheel_event:
+                track.append_scroll(event.delta, t - start)
+
+    def get_capture_stats(self) -> dict:
+        return self.capture_stats.summary(self.capture_rings, time.time())
+
+    def stop_recording(self, stop_time: float = None):
+        # This function might be called from the capture consumer or the UI thread
+        if not self.stop_recording_flag: # Prevent multiple calls
+            log.debug("Executing stop_recording...")
+            self.stop_time = stop_time if stop_time is not None else time.time()
+            self.record_cancel.cancel() # Wakes the listeners and the consumer
+            self._capture_wakeup.set()
+            
+            # Unhook mouse and keyboard listeners
+            try:
+                self.backend.unhook_mouse(self._mouse_hook or self.on_callback)
+                log.debug("Mouse unhooked.")
+            except Exception as e:
+                log.warning("Error unhooking mouse: %s", e)
+            try:
+                # Unhook all keyboard hooks - includes the one set by keyboard_listener
+                # and potentially the one by stop_player_listener if somehow active.
+                self.backend.unhook_all_keyboard()
+                log.debug("All keyboard hooks removed.")
+            except Exception as e:
+                 log.warning("Error unhooking keyboard: %s", e)
+            log.debug("stop_recording finished.")
+            return self.recorded
+
+
+    def on_dispatch_error(self, op: int, args: tuple, error: Exception):
+        self.instrumentation.count('play.errors')
+        log.error("Error playing event (opcode %d %s): %s", op, args, error)
+
+    def dispatch_row(self, source: int, row: tuple):
+        # Streamed rows carry their decoded values: (index, kind, name, x, y, delta, t)
+        _, kind, name, x, y, delta, _ = row
+        try:
+            if self.log_events:
+                log.debug("-> %s", row)
+            if kind == MOVE:
+                self.backend.move(x, y)
+            elif kind == KEY_DOWN:
+                self.backend.press_key(name)
+            elif kind == KEY_UP:
+                self.backend.release_key(name)
+            elif kind == BUTTON_DOWN:
+                self.backend.press_button(name)
+            elif kind == BUTTON_UP:
+                self.backend.release_button(name)
+            elif kind == SCROLL:
+                self.backend.wheel(delta)
+        except Exception as e:
+            log.error("Error playing streamed event %s: %s", row, e)
+
+    @staticmethod
+    def wait_to_start(t: float, cancel: CancelToken) -> bool:
+        # Interruptible countdown; False if cancelled before t
+        return cancel.sleep(t - time.time())
+
+    # Keyboard hook installed while playing: the stop key cancels playback
+    # straight from the hook thread
+    def stop_player_listener(self, event):
+        if event.name == self.stop_key and event.event_type == self.backend.KEY_DOWN and self.is_playing:
+             log.info("'%s' pressed during playback. Stopping player...", self.stop_key)
+             self.stop_playback()
+
+    def filter_moves(self):
+        # Row indices of the essential mouse events, see
+        # path_simplify.essential_indices. Memoized per mouse track, so
+        # toggling the filter between plays costs nothing.
+        track = self.recorded['mouse']
+        indices = filter_cache.get(track, ('essential',), lambda: essential_indices(track))
+        log.info("Filtered mouse events from %d to %d", len(track), len(indices))
+        return indices
+
+    def normalize_timing(self, max_idle: float = None, merge_distance: float = None,
+                         merge_interval: float = 0.002, tick: float = None):
+        # Replaces the recording with a normalized copy, see timing_normalize
+        with self.instrumentation.phase('normalize'):
+            self.recorded, result = normalize_recording(self.recorded, max_idle, merge_distance, merge_interval, tick)
+        log.info("Normalized timing: %s", result.format())
+        return result
+
+    def simplify_moves(self, mode: str, tolerance: float = 2.0, min_interval: float = 0.0):
+        # Path-preserving alternative to filter_moves, see
+        # path_simplify.simplify_track; memoized like filter_moves
+        track = self.recorded['mouse']
+        result = filter_cache.get(track, (mode, tolerance, min_interval),
+                                  lambda: simplify_track(track, mode, tolerance, min_interval))
+        log.info("Simplified mouse path %s", result.format())
+        self.simplify_result = result
+        return result
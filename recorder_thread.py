@@ -6,3 +6,35 @@ def thread(func):
         threading.Thread(target=lambda: func(*args, **kwargs), daemon=True).start()
 
     return inner
+
+
+class CancelToken:
+    """
+    Stop signal built on threading.Event.
+
+    Waiting threads block on the event instead of polling a flag, so cancel()
+    wakes them immediately rather than after their next sleep.
+    """
+
+    def __init__(self):
+        self._event = threading.Event()
+
+    def cancel(self):
+        self._event.set()
+
+    def reset(self):
+        self._event.clear()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+    def wait(self, timeout: float = None) -> bool:
+        # Blocks until cancelled or the timeout passes; True if cancelled
+        return self._event.wait(timeout)
+
+    def sleep(self, seconds: float) -> bool:
+        # Interruptible sleep; True if the full time passed without a cancel
+        if seconds <= 0:
+            return not self.cancelled
+        return not self._event.wait(seconds)
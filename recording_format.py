@@ -0,0 +1,412 @@
+import json
+import mmap
+import os
+import struct
+import sys
+import zlib
+from itertools import chain, islice
+
+from event_store import (EventTrack, as_tracks, to_lists, NO_NAME,
+                         KEY_DOWN, KEY_UP, MOVE, BUTTON_DOWN, BUTTON_UP, SCROLL)
+from journal import JOURNAL_EXTENSION, is_journal, read_journal, write_journal
+
+# Binary recording layout (little endian):
+#   header   magic, version, flags, keyboard event count, mouse event count
+#   strings  u16 count, then (u16 length, utf-8 bytes) per interned key/button name
+#   geometry left, top, width, height of the capture screen (version 2, FLAG_GEOMETRY)
+#   records  keyboard records followed by mouse records, optionally zlib compressed
+#
+# Every record is RECORD.size bytes: kind, name id, a, b, dt. Timestamps are
+# stored as microsecond deltas from the previous event of the same track and
+# move coordinates as deltas from the previous move, so the values stay small
+# and compress well. A time delta only fits 32 bits up to ~35.8 minutes, so
+# a recording with a longer pause is written with WIDE_RECORD (64-bit dt,
+# FLAG_WIDE_TIME, version 3); every other file keeps the compact layout and
+# stays readable by older versions.
+MAGIC = b'RRB\x00'
+VERSION = 3
+FLAG_ZLIB = 1
+FLAG_GEOMETRY = 2
+FLAG_WIDE_TIME = 4
+BINARY_EXTENSION = '.rrec'
+
+HEADER = struct.Struct('<4sHHII')
+STRING_LEN = struct.Struct('<H')
+GEOMETRY = struct.Struct('<iiii')
+RECORD = struct.Struct('<BxHiii')
+WIDE_RECORD = struct.Struct('<BxHiiq')
+
+TICKS_PER_SECOND = 1_000_000
+SCROLL_SCALE = 1000  # scroll deltas can be fractional, keep them in thousandths
+
+I32_MIN = -2 ** 31
+I32_MAX = 2 ** 31 - 1
+
+# Rows encoded or decoded between two progress reports
+PROGRESS_ROWS = 1 << 16
+
+
+def is_binary(path: str) -> bool:
+    with open(path, 'rb') as f:
+        return f.read(len(MAGIC)) == MAGIC
+
+
+def _ticks(t: float) -> int:
+    return int(round(t * TICKS_PER_SECOND))
+
+
+def _check_i32(value: int, what: str) -> int:
+    if not I32_MIN <= value <= I32_MAX:
+        raise ValueError(f"{what} out of range for binary format: {value}")
+    return value
+
+
+def _report(progress, done: int, total: int):
+    # `progress` takes a percentage, see load_recording
+    if progress is not None and total:
+        progress(min(100, 100 * done // total))
+
+
+def _record_struct(flags: int) -> struct.Struct:
+    return WIDE_RECORD if flags & FLAG_WIDE_TIME else RECORD
+
+
+class _TimeDeltaOverflow(ValueError):
+    # A pause too long for RECORD's 32-bit time delta, see _encode
+    pass
+
+
+def _encode(recorded: dict, record: struct.Struct = RECORD, progress=None):
+    names = {}
+
+    def intern(name):
+        if name is None:
+            return NO_NAME
+        if name not in names:
+            if len(names) >= NO_NAME:
+                raise ValueError("Too many distinct key names for binary format")
+            names[name] = len(names)
+        return names[name]
+
+    chunks = []
+    pack = record.pack
+    wide = record is WIDE_RECORD
+    tracks = as_tracks(recorded)
+    total = len(tracks['keyboard']) + len(tracks['mouse'])
+    done = 0
+
+    # Encode straight from the columns; names are re-interned into one file-wide table
+    for track_name in ('keyboard', 'mouse'):
+        track = tracks[track_name]
+        remap = [intern(name) for name in track.names]
+        last = 0
+        last_x = last_y = 0
+        rows = zip(track.kind, track.code, track.x, track.y, track.delta, track.t)
+        for first in range(0, len(track), PROGRESS_ROWS):
+            for kind, code, x, y, delta, t in islice(rows, PROGRESS_ROWS):
+                tick = _ticks(t)
+                dt = tick - last
+                if not wide and not I32_MIN <= dt <= I32_MAX:
+                    raise _TimeDeltaOverflow(f"timestamp delta out of range for binary format: {dt}")
+                last = tick
+                name_id = NO_NAME if code == NO_NAME else remap[code]
+                if kind == MOVE:
+                    chunks.append(pack(MOVE, NO_NAME, _check_i32(x - last_x, "x delta"),
+                                       _check_i32(y - last_y, "y delta"), dt))
+                    last_x, last_y = x, y
+                elif kind == SCROLL:
+                    chunks.append(pack(SCROLL, NO_NAME, _check_i32(int(round(delta * SCROLL_SCALE)), "scroll delta"), 0, dt))
+                else:
+                    chunks.append(pack(kind, name_id, 0, 0, dt))
+            _report(progress, done + min(len(track), first + PROGRESS_ROWS), total)
+        done += len(track)
+
+    return list(names), b''.join(chunks)
+
+
+def save_binary(recorded: dict, path: str, compress: bool = False, progress=None):
+    recorded = as_tracks(recorded)
+    flags = 0
+    try:
+        names, data = _encode(recorded, progress=progress)
+    except _TimeDeltaOverflow:
+        names, data = _encode(recorded, WIDE_RECORD, progress)
+        flags |= FLAG_WIDE_TIME
+    if compress:
+        data = zlib.compress(data, 6)
+        flags |= FLAG_ZLIB
+    geometry = recorded['mouse'].geometry
+    if geometry is not None:
+        flags |= FLAG_GEOMETRY
+
+    with open(path, 'wb') as f:
+        # Files without geometry stay version 1 and compact files with geometry
+        # version 2, so older readers can open them
+        if flags & FLAG_WIDE_TIME:
+            version = VERSION
+        else:
+            version = 2 if geometry is not None else 1
+        f.write(HEADER.pack(MAGIC, version, flags, len(recorded['keyboard']), len(recorded['mouse'])))
+        f.write(STRING_LEN.pack(len(names)))
+        for name in names:
+            encoded = str(name).encode('utf-8')
+            f.write(STRING_LEN.pack(len(encoded)))
+            f.write(encoded)
+        if geometry is not None:
+            f.write(GEOMETRY.pack(*geometry))
+        f.write(data)
+
+
+def read_binary_header(f, path: str = '<stream>'):
+    # Parses the header and string table from a file positioned at the start.
+    # Returns (flags, keyboard count, mouse count, names, geometry, data offset).
+    magic, version, flags, keyboard_count, mouse_count = HEADER.unpack(f.read(HEADER.size))
+    if magic != MAGIC:
+        raise ValueError(f"{path} is not a binary recording")
+    if version > VERSION:
+        raise ValueError(f"Unsupported binary recording version {version} (max {VERSION})")
+    (count,) = STRING_LEN.unpack(f.read(STRING_LEN.size))
+    names = []
+    for _ in range(count):
+        (length,) = STRING_LEN.unpack(f.read(STRING_LEN.size))
+        names.append(f.read(length).decode('utf-8'))
+    geometry = GEOMETRY.unpack(f.read(GEOMETRY.size)) if flags & FLAG_GEOMETRY else None
+    return flags, keyboard_count, mouse_count, names, geometry, f.tell()
+
+
+def _decode_rows(records, names: list, path: str):
+    # Turns raw records of one track into (index, kind, name, x, y, delta, t)
+    # rows, undoing the time and move deltas; lazy, one record at a time
+    tick = 0
+    x = y = 0
+    for index, (kind, name, a, b, dt) in enumerate(records):
+        tick += dt
+        t = tick / TICKS_PER_SECOND
+        if kind == MOVE:
+            x += a
+            y += b
+            yield index, MOVE, None, x, y, 0.0, t
+        elif kind == SCROLL:
+            yield index, SCROLL, None, 0, 0, a / SCROLL_SCALE, t
+        elif kind in (KEY_DOWN, KEY_UP, BUTTON_DOWN, BUTTON_UP):
+            yield index, kind, None if name == NO_NAME else names[name], 0, 0, 0.0, t
+        else:
+            raise ValueError(f"Corrupt record kind {kind} in {path}")
+
+
+class BinaryRecording:
+    """Memory-mapped view of a binary recording that decodes events lazily."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path, 'rb')
+        self._map = None
+        try:
+            (self.flags, self.keyboard_count, self.mouse_count,
+             self.names, self.geometry, self._data_offset) = read_binary_header(self._file, path)
+            self._record = _record_struct(self.flags)
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except Exception:
+            self._file.close()
+            raise
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __len__(self):
+        return self.keyboard_count + self.mouse_count
+
+    def close(self):
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        self._file.close()
+
+    def _name(self, index: int):
+        return None if index == NO_NAME else self.names[index]
+
+    def _records(self, start: int, count: int):
+        # Yields raw record tuples for `count` records starting at record index `start`
+        if count == 0:
+            return
+        record = self._record
+        if not self.flags & FLAG_ZLIB:
+            # Slice the map a chunk at a time so only the pages being decoded
+            # are touched and no buffer export outlives the generator.
+            begin = self._data_offset + start * record.size
+            end = begin + count * record.size
+            step = record.size * 4096
+            for position in range(begin, end, step):
+                yield from record.iter_unpack(self._map[position:min(position + step, end)])
+            return
+
+        # Compressed data cannot be mapped directly; inflate it in chunks and
+        # skip ahead to the wanted records without materialising the rest.
+        skip = start * record.size
+        remaining = count * record.size
+        pending = b''
+        for block in self._inflate():
+            if skip:
+                dropped = min(skip, len(block))
+                block = block[dropped:]
+                skip -= dropped
+            pending += block
+            usable = min(len(pending) - len(pending) % record.size, remaining)
+            if usable:
+                yield from record.iter_unpack(pending[:usable])
+                pending = pending[usable:]
+                remaining -= usable
+            if remaining <= 0:
+                return
+
+    def _inflate(self, chunk_size: int = 1 << 16):
+        decompressor = zlib.decompressobj()
+        for position in range(self._data_offset, len(self._map), chunk_size):
+            block = decompressor.decompress(self._map[position:position + chunk_size], chunk_size)
+            while block:
+                yield block
+                block = decompressor.decompress(decompressor.unconsumed_tail, chunk_size)
+        tail = decompressor.flush()
+        if tail:
+            yield tail
+
+    def iter_track(self, track_name: str):
+        # Lazily decoded rows of one track, see _decode_rows. Only the mapped
+        # pages holding the rows being read are touched.
+        if track_name == 'keyboard':
+            start, count = 0, self.keyboard_count
+        else:
+            start, count = self.keyboard_count, self.mouse_count
+        return _decode_rows(self._records(start, count), self.names, self.path)
+
+    def to_tracks(self, progress=None) -> dict:
+        # Decodes straight into EventTrack columns, skipping the list form
+        tracks = {}
+        total = len(self)
+        done = 0
+        for track_name, count in (('keyboard', self.keyboard_count), ('mouse', self.mouse_count)):
+            # Names are re-interned per track, so each track only holds the
+            # names its rows use
+            track = EventTrack()
+            append_row = track._append_row
+            intern = track.intern
+            rows = self.iter_track(track_name)
+            for first in range(0, count, PROGRESS_ROWS):
+                for _, kind, name, x, y, delta, t in islice(rows, PROGRESS_ROWS):
+                    append_row(kind, intern(name), x, y, delta, t)
+                _report(progress, done + min(count, first + PROGRESS_ROWS), total)
+            done += count
+            tracks[track_name] = track
+        tracks['mouse'].geometry = self.geometry
+        return tracks
+
+
+def _file_records(f, flags: int, data_offset: int, start: int, count: int, chunk_rows: int):
+    # Yields lists of raw record tuples read through ordinary file reads, so
+    # nothing outside the current chunk stays resident (unlike the mmap view)
+    if count == 0:
+        return
+    record = _record_struct(flags)
+    if not flags & FLAG_ZLIB:
+        f.seek(data_offset + start * record.size)
+        remaining = count
+        while remaining:
+            rows = min(remaining, chunk_rows)
+            data = f.read(rows * record.size)
+            if len(data) < rows * record.size:
+                raise ValueError("Binary recording is truncated")
+            yield list(record.iter_unpack(data))
+            remaining -= rows
+        return
+
+    f.seek(data_offset)
+    decompressor = zlib.decompressobj()
+    skip = start * record.size
+    remaining = count * record.size
+    pending = b''
+    while remaining > 0:
+        data = decompressor.unconsumed_tail or f.read(1 << 16)
+        if not data:
+            raise ValueError("Binary recording is truncated")
+        block = decompressor.decompress(data, chunk_rows * record.size)
+        if skip:
+            dropped = min(skip, len(block))
+            block = block[dropped:]
+            skip -= dropped
+        pending += block
+        usable = min(len(pending) - len(pending) % record.size, remaining)
+        if usable:
+            yield list(record.iter_unpack(pending[:usable]))
+            pending = pending[usable:]
+            remaining -= usable
+
+
+def iter_binary_chunks(path: str, track_name: str, chunk_rows: int = 4096):
+    """
+    Streams one track of a binary recording as lists of at most chunk_rows
+    decoded rows (index, kind, name, x, y, delta, t), for recording_stream.
+    """
+    with open(path, 'rb') as f:
+        flags, keyboard_count, mouse_count, names, _, data_offset = read_binary_header(f, path)
+        if track_name == 'keyboard':
+            start, count = 0, keyboard_count
+        else:
+            start, count = keyboard_count, mouse_count
+        records = chain.from_iterable(_file_records(f, flags, data_offset, start, count, chunk_rows))
+        rows = _decode_rows(records, names, path)
+        while True:
+            chunk = list(islice(rows, chunk_rows))
+            if not chunk:
+                return
+            yield chunk
+
+
+def load_recording(path: str, progress=None) -> dict:
+    # Format is detected from the file contents, not the extension.
+    # Returns the in-memory EventTrack form. `progress`, if given, is called
+    # with the percentage done after each chunk of binary records or journal
+    # batch; JSON is parsed in one go and reports nothing.
+    if is_binary(path):
+        with BinaryRecording(path) as recording:
+            return recording.to_tracks(progress)
+    if is_journal(path):
+        recorded, _ = read_journal(path, progress)
+        return recorded
+    with open(path, 'r') as f:
+        return as_tracks(json.load(f))
+
+
+def save_recording(recorded: dict, path: str, compress: bool = False, progress=None):
+    # `progress` as in load_recording; only binary files report it
+    if path.lower().endswith(BINARY_EXTENSION):
+        save_binary(recorded, path, compress=compress, progress=progress)
+    elif path.lower().endswith(JOURNAL_EXTENSION):
+        write_journal(as_tracks(recorded), path)
+    else:
+        with open(path, 'w') as f:
+            json.dump(to_lists(recorded), f, indent=4)
+
+
+def convert_json_to_binary(src: str, dst: str = None, compress: bool = False) -> str:
+    if dst is None:
+        dst = os.path.splitext(src)[0] + BINARY_EXTENSION
+    with open(src, 'r') as f:
+        recorded = json.load(f)
+    save_binary(recorded, dst, compress=compress)
+    return dst
+
+
+if __name__ == '__main__':
+    # python recording_format.py [--compress] path.json [path2.json ...]
+    args = sys.argv[1:]
+    compress = '--compress' in args
+    paths = [a for a in args if a != '--compress']
+    if not paths:
+        print("Usage: python recording_format.py [--compress] recording.json [...]")
+        sys.exit(1)
+    for src in paths:
+        dst = convert_json_to_binary(src, compress=compress)
+        print(f"{src} ({os.path.getsize(src)} bytes) -> {dst} ({os.path.getsize(dst)} bytes)")
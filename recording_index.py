@@ -0,0 +1,169 @@
+from bisect import bisect_left
+
+import numpy as np
+
+from event_store import KEY_DOWN, KEY_UP, MOVE, BUTTON_DOWN, BUTTON_UP
+from playback_scheduler import KEYBOARD, MOUSE
+
+# Held key/button state is snapshotted every this many key/button events, so
+# the state at any time is a bisect plus at most this many steps
+STATE_CHECKPOINT_INTERVAL = 256
+
+
+class InputState:
+    """Keys and mouse buttons held down, and the cursor position, at some time."""
+
+    def __init__(self, keys=(), buttons=(), cursor=None):
+        self.keys = set(keys)
+        self.buttons = set(buttons)
+        self.cursor = cursor
+
+    def __repr__(self):
+        return f"<InputState keys={sorted(map(str, self.keys))} buttons={sorted(map(str, self.buttons))} cursor={self.cursor}>"
+
+
+class RecordingIndex:
+    """
+    Time index over the merged keyboard/mouse timeline of a recording.
+
+    `times`, `sources` and `rows` are the merged timeline in dispatch order
+    (same order as playback_scheduler.merge_timeline), built with one stable
+    NumPy sort. Seeking is a binary search; held key/button state at a time
+    comes from periodic checkpoints, see state_at.
+    """
+
+    def __init__(self, recorded: dict):
+        keyboard_track = recorded['keyboard']
+        mouse_track = recorded['mouse']
+        self._tracks = (keyboard_track, mouse_track)
+        self._lengths = (len(keyboard_track), len(mouse_track))
+
+        kb = keyboard_track.columns_numpy()
+        ms = mouse_track.columns_numpy()
+        times = np.concatenate([kb['t'], ms['t']])
+        sources = np.concatenate([np.full(len(keyboard_track), KEYBOARD, np.uint8),
+                                  np.full(len(mouse_track), MOUSE, np.uint8)])
+        rows = np.concatenate([np.arange(len(keyboard_track), dtype=np.uint32),
+                               np.arange(len(mouse_track), dtype=np.uint32)])
+        # Time, then keyboard before mouse, then row: the merge_timeline order
+        order = np.lexsort((rows, sources, times))
+        self.times = times[order]
+        self.sources = sources[order]
+        self.rows = rows[order]
+
+        # Cursor: times and coordinates of the moves only
+        moves = ms['kind'] == MOVE
+        self._move_times = ms['t'][moves]
+        self._move_x = ms['x'][moves]
+        self._move_y = ms['y'][moves]
+
+        # Key and button presses/releases, in merged order, with checkpoints
+        kinds = np.concatenate([kb['kind'], ms['kind']])[order]
+        state_positions = np.nonzero(kinds != MOVE)[0]
+        self._state_times = self.times[state_positions].tolist()
+        self._state_events = []
+        for source, row in zip(self.sources[state_positions].tolist(), self.rows[state_positions].tolist()):
+            track = keyboard_track if source == KEYBOARD else mouse_track
+            self._state_events.append((track.kind[row], track.name(row)))
+        del kb, ms
+
+        self._checkpoints = []
+        keys = set()
+        buttons = set()
+        for i, (kind, name) in enumerate(self._state_events):
+            if i % STATE_CHECKPOINT_INTERVAL == 0:
+                self._checkpoints.append((frozenset(keys), frozenset(buttons)))
+            self._apply(keys, buttons, kind, name)
+
+    @staticmethod
+    def _apply(keys: set, buttons: set, kind: int, name):
+        if kind == KEY_DOWN:
+            keys.add(name)
+        elif kind == KEY_UP:
+            keys.discard(name)
+        elif kind == BUTTON_DOWN:
+            buttons.add(name)
+        elif kind == BUTTON_UP:
+            buttons.discard(name)
+
+    def matches(self, recorded: dict) -> bool:
+        # False once the recording's tracks were replaced or appended to
+        return (self._tracks[0] is recorded['keyboard'] and self._tracks[1] is recorded['mouse']
+                and self._lengths == (len(recorded['keyboard']), len(recorded['mouse'])))
+
+    def __len__(self):
+        return len(self.times)
+
+    @property
+    def duration(self) -> float:
+        return float(self.times[-1]) if len(self.times) else 0.0
+
+    def seek(self, t: float) -> int:
+        # Position of the first event at or after t
+        return int(np.searchsorted(self.times, t, side='left'))
+
+    def state_at(self, t: float) -> InputState:
+        # What is held down and where the cursor is just before the event at t
+        count = bisect_left(self._state_times, t)
+        checkpoint = count // STATE_CHECKPOINT_INTERVAL
+        if self._checkpoints:
+            keys, buttons = self._checkpoints[min(checkpoint, len(self._checkpoints) - 1)]
+            keys, buttons = set(keys), set(buttons)
+            for kind, name in self._state_events[min(checkpoint, len(self._checkpoints) - 1)
+                                                 * STATE_CHECKPOINT_INTERVAL:count]:
+                self._apply(keys, buttons, kind, name)
+        else:
+            keys, buttons = set(), set()
+
+        cursor = None
+        last_move = int(np.searchsorted(self._move_times, t, side='left')) - 1
+        if last_move >= 0:
+            cursor = (int(self._move_x[last_move]), int(self._move_y[last_move]))
+        return InputState(keys, buttons, cursor)
+
+    # --- Analytics ---
+
+    def events_per_second(self, bin_seconds: float = 1.0) -> np.ndarray:
+        # Histogram of event counts per bin_seconds of recording time
+        if not len(self.times):
+            return np.zeros(0, dtype=np.int64)
+        return np.bincount((self.times // bin_seconds).astype(np.int64))
+
+    def idle_gaps(self, min_gap: float = 1.0) -> list:
+        # (start, length) of every stretch of at least min_gap seconds without events
+        gaps = np.diff(self.times)
+        where = np.nonzero(gaps >= min_gap)[0]
+        return [(float(self.times[i]), float(gaps[i])) for i in where]
+
+    def key_hold_durations(self) -> dict:
+        # Seconds each key was held, per press, keyed by name. Auto-repeat
+        # downs while a key is already held do not start a new press.
+        track = self._tracks[0]
+        pressed_at = {}
+        holds = {}
+        for i in range(len(track)):
+            name = track.name(i)
+            if track.kind[i] == KEY_DOWN:
+                pressed_at.setdefault(name, track.t[i])
+            elif name in pressed_at:
+                holds.setdefault(name, []).append(track.t[i] - pressed_at.pop(name))
+        return holds
+
+    def summary(self, bin_seconds: float = 1.0, min_gap: float = 1.0) -> dict:
+        histogram = self.events_per_second(bin_seconds)
+        gaps = self.idle_gaps(min_gap)
+        holds = self.key_hold_durations()
+        return {
+            'events': len(self),
+            'duration_s': self.duration,
+            'events_per_sec_mean': len(self) / self.duration if self.duration else 0.0,
+            'events_per_sec_peak': int(histogram.max()) / bin_seconds if len(histogram) else 0.0,
+            'events_per_sec_histogram': histogram.tolist(),
+            'idle_gaps': len(gaps),
+            'idle_total_s': sum(length for _, length in gaps),
+            'longest_idle_s': max((length for _, length in gaps), default=0.0),
+            'key_holds': {
+                str(name): {'count': len(values), 'mean_s': sum(values) / len(values), 'max_s': max(values)}
+                for name, values in sorted(holds.items(), key=lambda item: str(item[0]))
+            },
+        }
@@ -0,0 +1,290 @@
+import difflib
+import json
+import math
+import struct
+import zlib
+
+import numpy as np
+
+from event_store import KEY_DOWN, KEY_UP, MOVE, BUTTON_DOWN, BUTTON_UP, SCROLL, GEOMETRY_KEY
+from recording_format import is_binary, load_recording
+from recording_stream import DEFAULT_CHUNK_ROWS, open_track_chunks
+from journal import is_journal, scan_journal
+
+# Checks and comparisons over whole recording files, for cli.py's library
+# commands. Binary recordings and journals are validated a chunk at a time
+# (recording_stream readers), so a library can be checked without loading
+# every file into memory; JSON has no framing and is parsed in one go.
+
+# Issues listed per file; the rest are only counted
+MAX_ISSUES = 20
+
+# Paths closer than this (pixels) at every moment count as the same path
+PATH_EPSILON_PX = 0.01
+
+INT32_MIN = -2 ** 31
+INT32_MAX = 2 ** 31 - 1
+
+KEY_KINDS = (KEY_DOWN, KEY_UP)
+MOUSE_KINDS = (MOVE, BUTTON_DOWN, BUTTON_UP, SCROLL)
+
+
+class ValidationReport:
+    """Errors (the file would fail or misbehave in playback) and warnings."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.errors = 0
+        self.warnings = 0
+        self.events = 0
+        self.issues = []
+
+    @property
+    def valid(self) -> bool:
+        return self.errors == 0
+
+    def error(self, where: str, message: str):
+        self.errors += 1
+        self._note('error', where, message)
+
+    def warning(self, where: str, message: str):
+        self.warnings += 1
+        self._note('warning', where, message)
+
+    def _note(self, level: str, where: str, message: str):
+        if len(self.issues) < MAX_ISSUES:
+            self.issues.append(f"{level}: {where}: {message}")
+
+    def summary(self) -> dict:
+        return {
+            'valid': self.valid,
+            'events': self.events,
+            'errors': self.errors,
+            'warnings': self.warnings,
+            'issues': self.issues,
+        }
+
+
+class _TrackChecker:
+    # Row checks shared by every format: rows are (index, kind, name, x, y, delta, t)
+
+    def __init__(self, report: ValidationReport, track_name: str):
+        self.report = report
+        self.track_name = track_name
+        self.kinds = KEY_KINDS if track_name == 'keyboard' else MOUSE_KINDS
+        self.last_t = 0.0
+        self.held = set()
+
+    def check(self, rows):
+        report = self.report
+        for index, kind, name, x, y, delta, t in rows:
+            report.events += 1
+            where = f"{self.track_name}[{index}]"
+            if kind not in self.kinds:
+                report.error(where, f"event kind {kind} does not belong in the {self.track_name} track")
+                continue
+            if not math.isfinite(t) or t < 0:
+                report.error(where, f"bad timestamp {t!r}")
+                continue
+            if t < self.last_t:
+                report.error(where, f"timestamp {t:.6f} goes back from {self.last_t:.6f}")
+            self.last_t = max(self.last_t, t)
+            if kind == MOVE and not (INT32_MIN <= x <= INT32_MAX and INT32_MIN <= y <= INT32_MAX):
+                report.error(where, f"coordinates ({x}, {y}) out of range")
+            elif kind == SCROLL and not math.isfinite(delta):
+                report.error(where, f"bad scroll delta {delta!r}")
+            elif kind in (KEY_DOWN, BUTTON_DOWN):
+                if name is None:
+                    report.warning(where, "press without a key/button name")
+                self.held.add(name)
+            elif kind in (KEY_UP, BUTTON_UP):
+                if name not in self.held:
+                    report.warning(where, f"{name!r} released without being pressed")
+                self.held.discard(name)
+
+    def finish(self):
+        held = sorted(str(name) for name in self.held if name is not None)
+        if held:
+            self.report.warning(self.track_name, f"still held at the end: {', '.join(held)}")
+
+
+def _json_rows(report: ValidationReport, track_name: str, events):
+    # Schema check of the legacy list form, yielding rows for _TrackChecker
+    for index, event in enumerate(events):
+        where = f"{track_name}[{index}]"
+        if not isinstance(event, list) or not event:
+            report.error(where, f"expected a list, got {event!r}")
+            continue
+        kind = event[0]
+        try:
+            if isinstance(kind, bool):
+                _, name, t = event
+                if name is not None and not isinstance(name, str):
+                    raise ValueError
+                yield index, KEY_DOWN if kind else KEY_UP, name, 0, 0, 0.0, float(t)
+            elif kind == 'move':
+                _, x, y, t = event
+                if isinstance(x, bool) or isinstance(y, bool):
+                    raise ValueError
+                yield index, MOVE, None, int(x), int(y), 0.0, float(t)
+            elif kind == 'click':
+                _, button, pressed, t = event
+                if not isinstance(pressed, bool) or (button is not None and not isinstance(button, str)):
+                    raise ValueError
+                yield index, BUTTON_DOWN if pressed else BUTTON_UP, button, 0, 0, 0.0, float(t)
+            elif kind == 'scroll':
+                _, delta, t = event
+                yield index, SCROLL, None, 0, 0, float(delta), float(t)
+            else:
+                report.error(where, f"unknown event type {kind!r}")
+        except (TypeError, ValueError):
+            report.error(where, f"malformed {kind!r} event {event!r}")
+
+
+def validate_recording(path: str, chunk_rows: int = DEFAULT_CHUNK_ROWS) -> ValidationReport:
+    report = ValidationReport(path)
+    if is_binary(path) or is_journal(path):
+        for track_name in ('keyboard', 'mouse'):
+            checker = _TrackChecker(report, track_name)
+            try:
+                for rows in open_track_chunks(path, track_name, chunk_rows):
+                    checker.check(rows)
+            except (ValueError, struct.error, zlib.error) as e:
+                report.error(track_name, str(e) or type(e).__name__)
+                continue
+            checker.finish()
+        if is_journal(path):
+            info = scan_journal(path)
+            if not info.complete:
+                report.warning('file', f"journal of an interrupted recording ({info.truncated_bytes} bytes torn)")
+        return report
+
+    try:
+        with open(path, 'r') as f:
+            data = json.load(f)
+    except (ValueError, UnicodeDecodeError) as e:
+        report.error('file', f"not valid JSON: {e}")
+        return report
+    if not isinstance(data, dict):
+        report.error('file', "top level is not an object")
+        return report
+    geometry = data.get(GEOMETRY_KEY)
+    if geometry is not None and (not isinstance(geometry, list) or len(geometry) != 4
+                                 or not all(isinstance(value, int) for value in geometry)
+                                 or geometry[2] <= 0 or geometry[3] <= 0):
+        report.error(GEOMETRY_KEY, f"expected [left, top, width, height], got {geometry!r}")
+    for track_name in ('keyboard', 'mouse'):
+        events = data.get(track_name)
+        if not isinstance(events, list):
+            report.error(track_name, "missing or not a list")
+            continue
+        checker = _TrackChecker(report, track_name)
+        checker.check(_json_rows(report, track_name, events))
+        checker.finish()
+    unknown = sorted(set(data) - {'keyboard', 'mouse', GEOMETRY_KEY})
+    if unknown:
+        report.warning('file', f"unknown keys {unknown} are not played")
+    return report
+
+
+# --- Diffing ---
+
+def _discrete_events(track):
+    # Every event but moves as a comparable (kind, name, delta) key, and its times
+    keys = []
+    times = []
+    for i in range(len(track)):
+        kind = track.kind[i]
+        if kind != MOVE:
+            keys.append((kind, track.name(i), track.delta[i]))
+            times.append(track.t[i])
+    return keys, times
+
+
+def _path(track):
+    columns = track.columns_numpy()
+    moves = columns['kind'] == MOVE
+    return columns['t'][moves].copy(), columns['x'][moves].astype(np.float64), columns['y'][moves].astype(np.float64)
+
+
+def path_difference(track_a, track_b) -> dict:
+    """
+    Spatial difference of two mouse paths: cursor distance at the same
+    moments, sampling both paths (linearly interpolated) at every move time of
+    either, plus each path's travelled length.
+    """
+    ta, xa, ya = _path(track_a)
+    tb, xb, yb = _path(track_b)
+
+    def length(x, y):
+        return float(np.hypot(np.diff(x), np.diff(y)).sum()) if len(x) > 1 else 0.0
+
+    result = {'path_length_a_px': length(xa, ya), 'path_length_b_px': length(xb, yb),
+              'mean_distance_px': 0.0, 'max_distance_px': 0.0}
+    if not len(ta) or not len(tb):
+        return result
+    times = np.union1d(ta, tb)
+    distance = np.hypot(np.interp(times, ta, xa) - np.interp(times, tb, xb),
+                        np.interp(times, ta, ya) - np.interp(times, tb, yb))
+    result['mean_distance_px'] = float(distance.mean())
+    result['max_distance_px'] = float(distance.max())
+    return result
+
+
+def diff_recordings(path_a: str, path_b: str, time_tolerance: float = 0.001) -> dict:
+    """
+    Event-level and spatial comparison of two recordings.
+
+    Key presses, clicks and scrolls are aligned per track with difflib, so one
+    inserted event shows up as one addition rather than shifting everything
+    after it; matched events report how far their times moved. Mouse moves are
+    compared as a path, see path_difference. Recordings are `identical` when
+    nothing was edited and every event, moves included, moved by at most
+    time_tolerance: binary recordings store microseconds, which on a fast
+    cursor shifts the sampled path by a fraction of a pixel, so a path of
+    the same points at those times (or within PATH_EPSILON_PX) is the same.
+    """
+    a = load_recording(path_a)
+    b = load_recording(path_b)
+    result = {}
+    max_shift = 0.0
+    edits = 0
+    for track_name in ('keyboard', 'mouse'):
+        keys_a, times_a = _discrete_events(a[track_name])
+        keys_b, times_b = _discrete_events(b[track_name])
+        counts = {'added': 0, 'removed': 0, 'changed': 0}
+        matcher = difflib.SequenceMatcher(None, keys_a, keys_b, autojunk=False)
+        for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+            if tag == 'equal':
+                shifts = [abs(times_b[j] - times_a[i]) for i, j in zip(range(i1, i2), range(j1, j2))]
+                max_shift = max(max_shift, max(shifts))
+            elif tag == 'insert':
+                counts['added'] += j2 - j1
+            elif tag == 'delete':
+                counts['removed'] += i2 - i1
+            else:
+                changed = min(i2 - i1, j2 - j1)
+                counts['changed'] += changed
+                counts['removed'] += i2 - i1 - changed
+                counts['added'] += j2 - j1 - changed
+        for what, count in counts.items():
+            result[f'{track_name}_{what}'] = count
+            edits += count
+    result['max_time_shift_s'] = max_shift
+
+    moves = [a['mouse'].kind.count(MOVE), b['mouse'].kind.count(MOVE)]
+    result['moves'] = f"{moves[0]} / {moves[1]}"
+    ta, xa, ya = _path(a['mouse'])
+    tb, xb, yb = _path(b['mouse'])
+    same_points = len(ta) == len(tb) and np.array_equal(xa, xb) and np.array_equal(ya, yb)
+    if same_points and len(ta):
+        max_shift = max(max_shift, float(np.abs(ta - tb).max()))
+        result['max_time_shift_s'] = max_shift
+    result.update(path_difference(a['mouse'], b['mouse']))
+    durations = [max((track.t[-1] for track in recorded.values() if track), default=0.0) for recorded in (a, b)]
+    result['duration_difference_s'] = durations[1] - durations[0]
+    result['identical'] = (edits == 0 and max_shift <= time_tolerance and moves[0] == moves[1]
+                           and (same_points or result['max_distance_px'] <= PATH_EPSILON_PX)
+                           and abs(result['duration_difference_s']) <= time_tolerance
+                           and a['mouse'].geometry == b['mouse'].geometry)
+    return result
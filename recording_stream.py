@@ -0,0 +1,124 @@
+import heapq
+import queue
+import threading
+
+from playback_scheduler import KEYBOARD, MOUSE
+from recording_format import is_binary, iter_binary_chunks, load_recording
+from journal import is_journal, iter_journal_chunks
+from recorder_log import get_logger
+
+log = get_logger('stream')
+
+# Streaming playback pipeline: per track, a reader thread decodes the file a
+# chunk at a time into a bounded queue, and the two tracks are merged into one
+# timeline of (t, source, row) items for PlaybackScheduler. Rows are
+# (index, kind, name, x, y, delta, t) tuples. Memory use is bounded by
+# chunk_rows * read_ahead per track, whatever the size of the file, and the
+# first event can be dispatched as soon as the first chunk is decoded.
+
+DEFAULT_CHUNK_ROWS = 4096
+DEFAULT_READ_AHEAD = 4
+
+_END = object()
+
+
+def iter_track_chunks(track, chunk_rows: int = DEFAULT_CHUNK_ROWS):
+    # Same row shape from an in-memory EventTrack
+    for start in range(0, len(track), chunk_rows):
+        end = min(len(track), start + chunk_rows)
+        yield [(i, track.kind[i], track.name(i), track.x[i], track.y[i], track.delta[i], track.t[i])
+               for i in range(start, end)]
+
+
+def open_track_chunks(path: str, track_name: str, chunk_rows: int = DEFAULT_CHUNK_ROWS, recorded: dict = None):
+    if is_binary(path):
+        return iter_binary_chunks(path, track_name, chunk_rows)
+    if is_journal(path):
+        return iter_journal_chunks(path, track_name)
+    # JSON has no framing to stream from, so it is parsed up front
+    return iter_track_chunks(recorded[track_name], chunk_rows)
+
+
+class ReadAhead:
+    """
+    Runs a chunk generator on a background thread, keeping at most
+    `read_ahead` decoded chunks queued ahead of the consumer.
+    """
+
+    def __init__(self, chunks, source: int, read_ahead: int = DEFAULT_READ_AHEAD):
+        self.source = source
+        self.error = None
+        self._chunks = chunks
+        self._queue = queue.Queue(maxsize=max(1, read_ahead))
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._produce, name=f'ReadAhead-{source}', daemon=True)
+        self._thread.start()
+
+    def _put(self, item) -> bool:
+        # Blocks while the queue is full, but gives up once closed
+        while not self._stop.is_set():
+            try:
+                self._queue.put(item, timeout=0.05)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _produce(self):
+        source = self.source
+        try:
+            for rows in self._chunks:
+                # Timeline items are built here, off the dispatch thread
+                if not self._put([(row[6], source, row) for row in rows]):
+                    return
+        except Exception as e:
+            self.error = e
+        finally:
+            self._put(_END)
+
+    def __iter__(self):
+        while True:
+            items = self._queue.get()
+            if items is _END:
+                if self.error is not None:
+                    raise self.error
+                return
+            yield from items
+
+    def close(self):
+        self._stop.set()
+        self._thread.join()
+        close = getattr(self._chunks, 'close', None)
+        if close is not None:
+            close()
+
+
+class RecordingStream:
+    """
+    Merged timeline streamed from a recording file; iterate it once, then close.
+    """
+
+    def __init__(self, path: str, chunk_rows: int = DEFAULT_CHUNK_ROWS, read_ahead: int = DEFAULT_READ_AHEAD):
+        self.path = path
+        recorded = None
+        if not (is_binary(path) or is_journal(path)):
+            log.warning("%s is JSON and cannot be streamed, loading it fully", path)
+            recorded = load_recording(path)
+        self._readers = [
+            ReadAhead(open_track_chunks(path, 'keyboard', chunk_rows, recorded), KEYBOARD, read_ahead),
+            ReadAhead(open_track_chunks(path, 'mouse', chunk_rows, recorded), MOUSE, read_ahead),
+        ]
+
+    def __iter__(self):
+        # Each track is in time order; keyboard sorts first on equal timestamps
+        return heapq.merge(*self._readers)
+
+    def close(self):
+        for reader in self._readers:
+            reader.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
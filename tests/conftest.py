@@ -0,0 +1,48 @@
+import os
+import sys
+import threading
+import time
+
+import pytest
+
+# The modules live at the top of the repository, not in a package
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from input_backend import VirtualBackend  # noqa: E402
+from recorder_main import BGSI_Recorder  # noqa: E402
+
+# (offset seconds, emit method, args) of the session every round trip test records
+SESSION = [
+    (0.010, 'emit_move', (100, 200)),
+    (0.020, 'emit_key', ('w', True)),
+    (0.030, 'emit_move', (110, 205)),
+    (0.040, 'emit_button', ('left', True)),
+    (0.050, 'emit_button', ('left', False)),
+    (0.060, 'emit_wheel', (-1.0,)),
+    (0.070, 'emit_key', ('w', False)),
+    (0.080, 'emit_button', ('right', True)),
+    (0.090, 'emit_button', ('right', False)),
+    (0.100, 'emit_move', (120, 210)),
+]
+
+
+def record_session(backend: VirtualBackend, session=SESSION, stop_at: float = 0.2) -> BGSI_Recorder:
+    # Records `session` through the virtual hooks, with event times relative
+    # to the recording start, then presses the stop key at stop_at
+    recorder = BGSI_Recorder(backend=backend)
+    thread = threading.Thread(target=recorder.record, kwargs={'countdown': 0.0})
+    thread.start()
+    while not backend.hooked:
+        time.sleep(0.001)
+    start = recorder.start_time
+    for offset, method, args in session:
+        getattr(backend, method)(*args, t=start + offset)
+    backend.emit_key('esc', t=start + stop_at)
+    thread.join(timeout=10)
+    assert not thread.is_alive()
+    return recorder
+
+
+@pytest.fixture
+def recorded_session():
+    return record_session(VirtualBackend())
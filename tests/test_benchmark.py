@@ -0,0 +1,23 @@
+import json
+
+import benchmark
+
+
+def test_benchmark_report_and_compare(tmp_path, capsys):
+    output = str(tmp_path / 'report.json')
+    argv = ['--sizes', '200', '--speeds', '5', '--suite', 'playback', '--suite', 'io',
+            '--suite', 'capture', '--output', output]
+    assert benchmark.main(argv) == 0
+    with open(output) as f:
+        report = json.load(f)
+    assert report['schema'] == benchmark.SCHEMA_VERSION
+    suites = {result['suite'] for result in report['results']}
+    assert suites == {'playback', 'io', 'capture'}
+    moves = next(r for r in report['results'] if r['name'] == 'moves_200')
+    # Every event of the synthetic recording reaches the backend
+    assert moves['dispatched'] == moves['events'] == 200
+    capture = next(r for r in report['results'] if r['suite'] == 'capture')
+    assert capture['captured'] == 200
+
+    assert benchmark.main(argv[:-1] + [str(tmp_path / 'again.json'), '--compare', output]) == 0
+    assert 'Comparison against' in capsys.readouterr().out
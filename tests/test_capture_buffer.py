@@ -0,0 +1,41 @@
+import threading
+
+import pytest
+
+from capture_buffer import CaptureRing
+
+
+def test_ring_capacity_must_be_power_of_two():
+    with pytest.raises(ValueError):
+        CaptureRing(100)
+
+
+def test_full_ring_drops_and_counts_overruns():
+    ring = CaptureRing(4)
+    assert all(ring.push(i) for i in range(4))
+    assert not ring.push(4)
+    assert ring.overruns == 1
+    assert ring.peak_depth == 4
+    assert ring.drain(limit=3) == [0, 1, 2]
+    assert ring.push(5)
+    assert ring.drain() == [3, 5]
+    assert len(ring) == 0
+
+
+def test_ring_keeps_order_across_threads():
+    ring = CaptureRing(1 << 10)
+    count = 50_000
+    received = []
+
+    def produce():
+        for i in range(count):
+            while not ring.push(i):
+                pass
+
+    producer = threading.Thread(target=produce)
+    producer.start()
+    while len(received) < count:
+        received.extend(ring.drain())
+    producer.join()
+    assert received == list(range(count))
+    assert ring.pushed == count
@@ -0,0 +1,61 @@
+import pytest
+
+import cli
+from event_store import new_recording
+from recording_format import save_recording
+
+
+@pytest.mark.parametrize('extension', ['.json', '.rrec'])
+def test_inspect_lists_only_keyboard_keys(tmp_path, extension):
+    recorded = new_recording()
+    recorded['keyboard'].append_key(True, 'w', 0.0)
+    recorded['mouse'].append_click('left', True, 0.1)
+    recorded['keyboard'].append_key(False, 'w', 0.2)
+    recorded['mouse'].append_click('left', False, 0.3)
+    # Interned but used by no row
+    recorded['keyboard'].intern('unused')
+    path = str(tmp_path / f'a{extension}')
+    save_recording(recorded, path)
+    result = cli.inspect_job(path, {})
+    assert result['keys'] == ['w']
+    assert result['clicks'] == 2
+
+
+def test_play_reports_broken_compositions(tmp_path, capsys):
+    from composition import Composition
+    cycle = str(tmp_path / 'cycle.rcomp')
+    composition = Composition()
+    composition.add(cycle)
+    composition.save(cycle)
+    missing = str(tmp_path / 'missing.rcomp')
+    composition = Composition()
+    composition.add(str(tmp_path / 'nowhere.rrec'))
+    composition.save(missing)
+    malformed = tmp_path / 'malformed.rcomp'
+    malformed.write_text('{"segments": []}')
+    for path in (cycle, missing, str(malformed), str(tmp_path / 'absent.rcomp')):
+        assert cli.main(['play', path, '--dry-run']) == 2
+        assert capsys.readouterr().out.startswith('play: ')
+
+
+def test_play_composition_dry_run(tmp_path, capsys):
+    from composition import Composition
+    recorded = new_recording()
+    recorded['mouse'].append_move(1, 2, 0.0)
+    recorded['mouse'].append_click('left', True, 0.01)
+    recorded['mouse'].append_click('left', False, 0.02)
+    save_recording(recorded, str(tmp_path / 'a.rrec'))
+    composition = Composition()
+    composition.add(str(tmp_path / 'a.rrec'), repeat=3)
+    composition.save(str(tmp_path / 'route.rcomp'))
+    assert cli.main(['play', str(tmp_path / 'route.rcomp'), '--dry-run', '--speed', '5']) == 0
+    assert 'Dry run: 9 actions dispatched' in capsys.readouterr().out
+
+
+@pytest.mark.parametrize('option, value', [('--speed', '0'), ('--speed', '-2'), ('--rate', '-125')])
+def test_play_rejects_non_positive_speed_and_rate(tmp_path, capsys, option, value):
+    path = str(tmp_path / 'a.rrec')
+    save_recording(new_recording(), path)
+    with pytest.raises(SystemExit):
+        cli.main(['play', path, '--dry-run', option, value])
+    assert option in capsys.readouterr().err
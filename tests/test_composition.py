@@ -0,0 +1,55 @@
+from composition import Composition
+from event_store import new_recording
+from input_backend import VirtualBackend
+from recorder_main import BGSI_Recorder
+from recording_format import load_recording, save_recording
+
+
+def taps(tmp_path, name: str = 'a.rrec') -> str:
+    recorded = new_recording()
+    recorded['keyboard'].append_key(True, 'e', 0.0)
+    recorded['keyboard'].append_key(False, 'e', 0.01)
+    path = str(tmp_path / name)
+    save_recording(recorded, path)
+    return path
+
+
+def test_recordings_are_cached_per_composition(tmp_path):
+    path = taps(tmp_path)
+    first = Composition()
+    first.add(path, repeat=3)
+    first.add(path)
+    assert len(first) == 8
+    # Every segment referencing the file shares one load
+    assert first.cache.loads == 1
+    second = Composition()
+    second.add(path)
+    len(second)
+    # Nothing outlives the composition that loaded it
+    assert second.cache is not first.cache
+    assert second.cache.loads == 1
+
+
+def test_load_keeps_composition_unexpanded(tmp_path):
+    composition = Composition()
+    composition.add(taps(tmp_path), repeat=2)
+    path = str(tmp_path / 'route.rcomp')
+    composition.save(path)
+
+    backend = VirtualBackend()
+    recorder = BGSI_Recorder(backend=backend)
+    recorder.load(path)
+    assert isinstance(recorder.composition, Composition)
+    assert len(recorder.recorded['keyboard']) == 0
+    recorder.play_composition(recorder.composition, countdown=0.0, speed_factor=5)
+    assert len(backend.actions) == 4
+
+    # Saving writes the expanded events without keeping them
+    saved = str(tmp_path / 'route.rrec')
+    recorder.save(saved)
+    assert len(load_recording(saved)['keyboard']) == 4
+    assert len(recorder.recorded['keyboard']) == 0
+
+    recorder.expand_composition()
+    assert recorder.composition is None
+    assert len(recorder.recorded['keyboard']) == 4
@@ -0,0 +1,19 @@
+import pytest
+
+from coordinate_space import SCALED, playback_transform
+from event_store import new_recording
+
+
+@pytest.mark.parametrize('geometry', [(0, 0, 0, 1080), (0, 0, 1920, 0), (0, 0, -1920, 1080)])
+def test_scaled_without_capture_area_plays_as_recorded(geometry):
+    track = new_recording()['mouse']
+    track.append_move(10, 10, 0.0)
+    track.geometry = geometry
+    assert playback_transform(SCALED, track, (0, 0, 2560, 1440)) is None
+
+
+def test_scaled_maps_capture_onto_playback_screen():
+    track = new_recording()['mouse']
+    track.geometry = (0, 0, 1920, 1080)
+    a, _, c, _, e, f = playback_transform(SCALED, track, (0, 0, 3840, 2160))
+    assert (a, c, e, f) == (2.0, 0.0, 2.0, 0.0)
@@ -0,0 +1,64 @@
+import numpy as np
+import pytest
+
+from event_store import new_recording, MOVE
+from input_backend import VirtualBackend
+from path_simplify import DECIMATE, FilterCache, essential_indices, simplify_track
+from recorder_main import BGSI_Recorder
+
+
+def path_with_clicks() -> dict:
+    recorded = new_recording()
+    mouse = recorded['mouse']
+    for i in range(1000):
+        mouse.append_move(i, 0, i * 0.001)
+        if i in (300, 700):
+            mouse.append_click('left', True, i * 0.001)
+            mouse.append_click('left', False, i * 0.001)
+    return recorded
+
+
+def test_essential_indices_match_clicks():
+    track = path_with_clicks()['mouse']
+    kept = essential_indices(track).tolist()
+    # First event, each move before a click, the clicks, and the last event
+    assert kept == [0, 300, 301, 302, 702, 703, 704, 1003]
+
+
+def test_decimate_min_interval_limits_density():
+    track = path_with_clicks()['mouse']
+    result = simplify_track(track, DECIMATE, tolerance=0.5, min_interval=0.02)
+    kept = result.indices
+    moves = kept[np.frombuffer(track.kind, dtype=np.uint8)[kept] == MOVE]
+    # Apart from the moves kept at run ends and next to clicks, at most one per interval
+    assert len(moves) <= 1000 * 0.001 / 0.02 + 8
+    assert result.reduction_ratio > 0.9
+    assert result.summary()['max_error_px'] == pytest.approx(0.0)
+
+
+def test_filters_leave_the_recording_unchanged():
+    recorded = path_with_clicks()
+    before = recorded['mouse'].to_list()
+    recorder = BGSI_Recorder(recorded=recorded, backend=VirtualBackend())
+    recorder.filter_moves()
+    recorder.simplify_moves('rdp', 2.0)
+    assert recorder.recorded['mouse'] is recorded['mouse']
+    assert recorded['mouse'].to_list() == before
+
+
+def test_filter_cache_reuses_results_per_track():
+    cache = FilterCache()
+    track = path_with_clicks()['mouse']
+    calls = []
+
+    def compute():
+        calls.append(1)
+        return essential_indices(track)
+
+    first = cache.get(track, ('essential',), compute)
+    assert cache.get(track, ('essential',), compute) is first
+    assert len(calls) == 1
+    # A track that grew is filtered again
+    track.append_move(5, 5, 2.0)
+    cache.get(track, ('essential',), compute)
+    assert len(calls) == 2
@@ -0,0 +1,91 @@
+import pytest
+
+from event_store import new_recording
+from recording_format import BinaryRecording, load_recording, save_recording
+
+
+def mixed_names() -> dict:
+    recorded = new_recording()
+    recorded['keyboard'].append_key(True, 'w', 0.0)
+    recorded['mouse'].append_click('left', True, 0.1)
+    recorded['keyboard'].append_key(True, 'a', 0.15)
+    recorded['mouse'].append_click('left', False, 0.2)
+    recorded['keyboard'].append_key(False, 'w', 0.3)
+    recorded['keyboard'].append_key(False, 'a', 0.35)
+    recorded['mouse'].append_click(None, True, 0.4)
+    return recorded
+
+
+@pytest.mark.parametrize('compress', [False, True])
+def test_binary_load_keeps_names_per_track(tmp_path, compress):
+    path = str(tmp_path / 'names.rrec')
+    recorded = mixed_names()
+    save_recording(recorded, path, compress=compress)
+    loaded = load_recording(path)
+    assert sorted(loaded['keyboard'].names) == ['a', 'w']
+    assert loaded['mouse'].names == ['left']
+    for name in ('keyboard', 'mouse'):
+        assert loaded[name].to_list() == recorded[name].to_list()
+
+
+@pytest.mark.parametrize('compress', [False, True])
+def test_binary_saves_long_pauses(tmp_path, compress):
+    # Over 2**31 microseconds (~35.8 minutes) between two events of a track
+    recorded = mixed_names()
+    recorded['keyboard'].append_key(True, 'q', 3600.5)
+    recorded['mouse'].append_move(5, 6, 7200.25)
+    path = str(tmp_path / 'long.rrec')
+    save_recording(recorded, path, compress=compress)
+    loaded = load_recording(path)
+    for name in ('keyboard', 'mouse'):
+        assert loaded[name].to_list() == recorded[name].to_list()
+    from recording_stream import RecordingStream
+    with RecordingStream(path) as stream:
+        times = [t for t, _, _ in stream]
+    assert times[-2:] == [3600.5, 7200.25]
+
+
+def test_compact_layout_without_long_pauses(tmp_path):
+    path = str(tmp_path / 'short.rrec')
+    save_recording(mixed_names(), path)
+    with open(path, 'rb') as f:
+        assert f.read(6)[4:] == (1).to_bytes(2, 'little')
+
+
+@pytest.mark.parametrize('extension', ['.rrec', '.rrj'])
+def test_progress_reports(tmp_path, monkeypatch, extension):
+    import recording_format
+    monkeypatch.setattr(recording_format, 'PROGRESS_ROWS', 2)
+    path = str(tmp_path / f'progress{extension}')
+    recorded = mixed_names()
+    saved = []
+    save_recording(recorded, path, progress=saved.append)
+    loaded = []
+    result = load_recording(path, progress=loaded.append)
+    assert result['keyboard'].to_list() == recorded['keyboard'].to_list()
+    reports = [loaded] if extension == '.rrj' else [saved, loaded]
+    for percents in reports:
+        assert len(percents) > 1
+        assert percents == sorted(percents)
+        assert percents[-1] == 100
+
+
+
+@pytest.mark.parametrize('compress', [False, True])
+def test_binary_iter_track_decodes_lazily(tmp_path, compress):
+    recorded = mixed_names()
+    mouse = recorded['mouse']
+    for i in range(5000):
+        mouse.append_move(i, -i, 0.5 + i * 0.001)
+    mouse.append_scroll(-2.5, 6.0)
+    path = str(tmp_path / 'a.rrec')
+    save_recording(recorded, path, compress=compress)
+    with BinaryRecording(path) as recording:
+        first = next(recording.iter_track('mouse'))
+        rows = list(recording.iter_track('mouse'))
+        keys = [row[2] for row in recording.iter_track('keyboard')]
+    assert first == rows[0]
+    expected = [(i, mouse.kind[i], mouse.name(i), mouse.x[i], mouse.y[i], mouse.delta[i], pytest.approx(mouse.t[i]))
+                for i in range(len(mouse))]
+    assert rows == expected
+    assert keys == ['w', 'a', 'w', 'a']
@@ -0,0 +1,58 @@
+import json
+
+import pytest
+
+from event_store import new_recording
+from input_backend import VirtualBackend
+from instrumentation import CPROFILE, Histogram, Instrumentation
+from recorder_main import BGSI_Recorder
+
+
+def moves(count: int = 50) -> dict:
+    recorded = new_recording()
+    for i in range(count):
+        recorded['mouse'].append_move(i, i, i * 0.0001)
+    return recorded
+
+
+def test_histogram_percentiles_stay_within_a_bucket():
+    histogram = Histogram()
+    for duration in range(1, 1001):
+        histogram.add(duration * 1000)
+    summary = histogram.summary()
+    assert summary['count'] == 1000
+    assert summary['max_us'] == 1000.0
+    assert 500 <= summary['p50_us'] <= 1000
+    assert summary['mean_us'] == pytest.approx(500.5)
+
+
+def test_play_records_phases_and_hooks():
+    instrumentation = Instrumentation()
+    phases = []
+    instrumentation.add_hook(lambda name, duration_ns: phases.append(name))
+    recorder = BGSI_Recorder(recorded=moves(), backend=VirtualBackend(), instrumentation=instrumentation)
+    recorder.play(countdown=0.0, speed_factor=5)
+    summary = instrumentation.summary()
+    assert {'play', 'play.compile', 'play.filter', 'play.seek'} <= set(summary['phases'])
+    assert summary['counters']['play.events'] == 50
+    # Per-event dispatch timing is off unless asked for
+    assert not any(name.startswith('dispatch.') for name in summary['phases'])
+    assert phases[-1] == 'play'
+
+
+def test_per_event_timing_and_profile_export(tmp_path):
+    instrumentation = Instrumentation(per_event=True, profile=CPROFILE)
+    recorder = BGSI_Recorder(recorded=moves(), backend=VirtualBackend(), instrumentation=instrumentation)
+    recorder.play(countdown=0.0, speed_factor=5)
+    assert instrumentation.histograms['dispatch.move'].count == 50
+    path = str(tmp_path / 'profile.json')
+    instrumentation.export(path)
+    with open(path) as f:
+        exported = json.load(f)
+    assert exported['profiles']['play']['top']
+    assert (tmp_path / 'profile.json.play.prof').exists()
+
+
+def test_unknown_profile_mode_is_rejected():
+    with pytest.raises(ValueError):
+        Instrumentation(profile='perf')
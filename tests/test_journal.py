@@ -0,0 +1,55 @@
+import os
+import subprocess
+import sys
+
+from event_store import new_recording
+from journal import JournalWriter, discard_session_journals, read_journal, recover_session
+
+
+def interrupted_journal(directory, pid: int, start_time: float, complete: bool = False) -> str:
+    # A journal left behind by process `pid`, mid-recording unless complete
+    recorded = new_recording()
+    recorded['keyboard'].append_key(True, 'w', 0.01)
+    path = os.path.join(str(directory), f'session-{int(start_time)}-{pid}.rrj')
+    JournalWriter(path, recorded, start_time).close(complete=complete)
+    return path
+
+
+def finished_pid() -> int:
+    child = subprocess.Popen([sys.executable, '-c', 'pass'])
+    child.wait()
+    return child.pid
+
+
+def test_recover_session_skips_live_journals(tmp_path):
+    live = interrupted_journal(tmp_path, os.getpid(), 2.0)
+    crashed = interrupted_journal(tmp_path, finished_pid(), 1.0)
+
+    recorded, info = recover_session(str(tmp_path))
+    assert info.path == crashed and info.complete
+    assert len(recorded['keyboard']) == 1
+    # The running session's journal is neither finalized nor removed
+    assert not read_journal(live)[1].complete
+
+
+def test_recover_session_offers_finished_unsaved_journals(tmp_path):
+    # Recording stopped (journal complete) but the process died before Save
+    dead = finished_pid()
+    older = interrupted_journal(tmp_path, dead, 1.0)
+    finished = interrupted_journal(tmp_path, dead, 2.0, complete=True)
+
+    recorded, info = recover_session(str(tmp_path))
+    assert info.path == finished
+    assert len(recorded['keyboard']) == 1
+    # Nothing is deleted; the older one is offered next time
+    assert os.path.exists(finished) and os.path.exists(older)
+    os.remove(finished)
+    assert recover_session(str(tmp_path))[1].path == older
+
+
+def test_discard_session_journals_keeps_other_processes(tmp_path):
+    own = interrupted_journal(tmp_path, os.getpid(), 1.0, complete=True)
+    other = interrupted_journal(tmp_path, finished_pid(), 2.0, complete=True)
+    discard_session_journals(str(tmp_path))
+    assert not os.path.exists(own)
+    assert os.path.exists(other)
@@ -0,0 +1,47 @@
+from event_store import new_recording
+from recording_format import save_recording
+from recording_library import diff_recordings, validate_recording
+
+
+def fast_path() -> dict:
+    # Times that are not whole microseconds, on a fast-moving cursor
+    recorded = new_recording()
+    recorded['mouse'].geometry = (0, 0, 1920, 1080)
+    for i in range(200):
+        recorded['mouse'].append_move(i * 37 % 1920, i * 11 % 1080, i * 0.0012345678)
+    recorded['mouse'].append_click('left', True, 0.25)
+    recorded['mouse'].append_click('left', False, 0.2600000003)
+    recorded['keyboard'].append_key(True, 'a', 0.1000000004)
+    recorded['keyboard'].append_key(False, 'a', 0.2)
+    return recorded
+
+
+def test_json_to_rrec_round_trip_is_identical(tmp_path):
+    recorded = fast_path()
+    json_path = str(tmp_path / 'a.json')
+    rrec_path = str(tmp_path / 'a.rrec')
+    save_recording(recorded, json_path)
+    save_recording(recorded, rrec_path)
+    result = diff_recordings(json_path, rrec_path)
+    # Microsecond timestamps shift the sampled path a little on a fast cursor,
+    # but every event is within the time tolerance
+    assert result['identical']
+    assert result['max_time_shift_s'] < 1e-6
+
+
+def test_moved_path_is_not_identical(tmp_path):
+    recorded = fast_path()
+    save_recording(recorded, str(tmp_path / 'a.json'))
+    recorded['mouse'].x[10] += 3
+    save_recording(recorded, str(tmp_path / 'b.json'))
+    result = diff_recordings(str(tmp_path / 'a.json'), str(tmp_path / 'b.json'))
+    assert not result['identical']
+    assert result['max_distance_px'] >= 1
+
+
+def test_validate_round_tripped_recording(tmp_path):
+    path = str(tmp_path / 'a.rrec')
+    save_recording(fast_path(), path)
+    report = validate_recording(path)
+    assert report.valid
+    assert report.events == 204
@@ -0,0 +1,41 @@
+import time
+
+from event_store import new_recording
+from input_backend import VirtualBackend
+from recorder_main import BGSI_Recorder
+
+
+def taps() -> dict:
+    recorded = new_recording()
+    recorded['mouse'].append_move(5, 5, 0.0)
+    recorded['keyboard'].append_key(True, 'e', 0.005)
+    recorded['keyboard'].append_key(False, 'e', 0.01)
+    return recorded
+
+
+def test_repeat_plays_each_run_with_stats():
+    backend = VirtualBackend()
+    recorder = BGSI_Recorder(recorded=taps(), backend=backend)
+    runs = []
+    started = time.perf_counter()
+    recorder.play(countdown=0.0, repeat=3, gap=0.02, on_iteration=runs.append)
+    elapsed = time.perf_counter() - started
+    assert len(backend.actions) == 9
+    assert [run['iteration'] for run in runs] == [1, 2, 3]
+    assert all(run['events'] == 3 and run['completed'] for run in runs)
+    # Three 10ms runs with two 20ms gaps between them
+    assert elapsed >= 0.07
+    assert len(recorder.playback_stats) == 9
+
+
+def test_repeat_zero_loops_until_stopped():
+    backend = VirtualBackend()
+    recorder = BGSI_Recorder(recorded=taps(), backend=backend)
+
+    def on_iteration(stats):
+        if stats['iteration'] == 5:
+            recorder.stop_playback()
+
+    recorder.play(countdown=0.0, speed_factor=5, repeat=0, on_iteration=on_iteration)
+    assert len(recorder.iteration_stats) == 5
+    assert len(backend.actions) == 15
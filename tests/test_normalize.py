@@ -0,0 +1,31 @@
+import pytest
+
+import cli
+from event_store import new_recording
+from timing_normalize import normalize_recording
+
+
+def move_then_key() -> dict:
+    recorded = new_recording()
+    recorded['mouse'].append_move(5, 5, 1.0)
+    recorded['keyboard'].append_key(True, 'e', 3.0)
+    return recorded
+
+
+@pytest.mark.parametrize('max_idle', [0.0, -1.0])
+def test_non_positive_max_idle_is_rejected(max_idle):
+    with pytest.raises(ValueError):
+        normalize_recording(move_then_key(), max_idle=max_idle)
+
+
+def test_max_idle_keeps_order():
+    normalized, result = normalize_recording(move_then_key(), max_idle=0.5)
+    assert normalized['mouse'].t.tolist() == [0.5]
+    assert normalized['keyboard'].t.tolist() == [1.0]
+    assert result.gaps_capped == 2
+
+
+def test_cli_rejects_non_positive_max_idle(tmp_path, capsys):
+    with pytest.raises(SystemExit):
+        cli.main(['normalize', str(tmp_path), '--max-idle', '0'])
+    assert '--max-idle' in capsys.readouterr().err
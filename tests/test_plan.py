@@ -0,0 +1,53 @@
+from event_store import new_recording
+from input_backend import VirtualBackend
+from playback_plan import PlanCache, compile_plan
+from recorder_main import BGSI_Recorder
+
+
+class CountingBackend(VirtualBackend):
+    def __init__(self):
+        super().__init__()
+        self.resolved = []
+
+    def resolve_key(self, name):
+        self.resolved.append(name)
+        return super().resolve_key(name)
+
+
+def typing(presses: int = 100) -> dict:
+    recorded = new_recording()
+    for i in range(presses):
+        key = 'abc'[i % 3]
+        recorded['keyboard'].append_key(True, key, i * 0.01)
+        recorded['keyboard'].append_key(False, key, i * 0.01 + 0.005)
+    recorded['mouse'].append_move(1, 1, 0.0)
+    return recorded
+
+
+def test_compile_resolves_each_key_once():
+    backend = CountingBackend()
+    recorded = typing()
+    plan = compile_plan(recorded['keyboard'], recorded['mouse'], 2, backend.resolve_key)
+    assert sorted(backend.resolved) == ['a', 'b', 'c']
+    assert len(plan) == 201
+    assert plan.offsets_ns[-1] == int((99 * 0.01 + 0.005) * 1e9 / 2)
+
+
+def test_plan_is_reused_until_the_recording_changes():
+    cache = PlanCache()
+    recorded = typing()
+    keyboard, mouse = recorded['keyboard'], recorded['mouse']
+    backend = VirtualBackend()
+    plan = compile_plan(keyboard, mouse, 1, backend.resolve_key)
+    cache.put(keyboard, mouse, 1, None, backend, plan)
+    assert cache.get(keyboard, mouse, 1, None, backend) is plan
+    assert cache.get(keyboard, mouse, 2, None, backend) is None
+    keyboard.append_key(True, 'd', 2.0)
+    assert cache.get(keyboard, mouse, 1, None, backend) is None
+
+
+def test_recorders_share_compiled_plans():
+    recorded = typing()
+    first = BGSI_Recorder(recorded=recorded, backend=VirtualBackend()).compile_plan(3)
+    # The UI makes a new recorder per play; the plan carries over
+    assert BGSI_Recorder(recorded=recorded, backend=VirtualBackend()).compile_plan(3) is first
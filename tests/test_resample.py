@@ -0,0 +1,54 @@
+import time
+
+import pytest
+
+from event_store import new_recording
+from input_backend import VirtualBackend
+from recorder_main import BGSI_Recorder
+
+
+def straight_path(moves: int = 2001, interval: float = 0.001) -> dict:
+    recorded = new_recording()
+    for i in range(moves):
+        recorded['mouse'].append_move(i, i, i * interval)
+    return recorded
+
+
+@pytest.mark.parametrize('speed', [1, 2, 4])
+def test_resampled_rate_is_wall_clock_rate(speed):
+    recorder = BGSI_Recorder(recorded=straight_path(), backend=VirtualBackend())
+    plan = recorder.compile_plan(speed, dispatch_rate=125)
+    offsets = plan.offsets_ns
+    intervals = [b - a for a, b in zip(offsets, offsets[1:])]
+    # Every sample but the exact end point is one dispatch period apart
+    assert intervals[:-1] == pytest.approx([8_000_000] * (len(intervals) - 1), abs=1000)
+    assert intervals[-1] <= 8_000_000
+
+
+def test_resample_keeps_end_points():
+    recorded = straight_path()
+    recorder = BGSI_Recorder(recorded=recorded, backend=VirtualBackend())
+    plan = recorder.compile_plan(1, dispatch_rate=250)
+    assert plan.args[0] == (0, 0)
+    assert plan.args[-1] == (2000, 2000)
+
+
+class SlowBackend(VirtualBackend):
+    # Every move takes longer than the gap between moves
+    def move(self, x, y):
+        super().move(x, y)
+        time.sleep(0.002)
+
+
+def test_stale_moves_are_skipped_but_clicks_kept():
+    recorded = straight_path(moves=200)
+    recorded['mouse'].append_click('left', True, 0.2)
+    recorded['mouse'].append_click('left', False, 0.2)
+    backend = SlowBackend()
+    recorder = BGSI_Recorder(recorded=recorded, backend=backend)
+    recorder.play(countdown=0.0, skip_stale_moves=True)
+    played = [(action, args) for _, action, args in backend.actions]
+    assert recorder.playback_stats.skipped > 0
+    assert len(played) + recorder.playback_stats.skipped == 202
+    # The move before the click and the click itself are always dispatched
+    assert played[-3:] == [('move', (199, 199)), ('press_button', ('left',)), ('release_button', ('left',))]
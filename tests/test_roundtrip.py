@@ -0,0 +1,51 @@
+import pytest
+
+from input_backend import VirtualBackend
+from recorder_main import BGSI_Recorder
+
+EXPECTED_ACTIONS = [
+    ('move', (100, 200)),
+    ('press_key', ('w',)),
+    ('move', (110, 205)),
+    ('press_button', ('left',)),
+    ('release_button', ('left',)),
+    ('wheel', (-1.0,)),
+    ('release_key', ('w',)),
+    ('press_button', ('right',)),
+    ('release_button', ('right',)),
+    ('move', (120, 210)),
+]
+
+
+def played_actions(recorded: dict, **options) -> list:
+    backend = VirtualBackend()
+    recorder = BGSI_Recorder(recorded=recorded, backend=backend)
+    recorder.play(countdown=0.0, **options)
+    return [(action, args) for _, action, args in backend.actions]
+
+
+def test_record_captures_every_event(recorded_session):
+    recorded = recorded_session.recorded
+    assert len(recorded['keyboard']) == 2
+    assert len(recorded['mouse']) == 8
+    assert recorded['mouse'].t[0] == pytest.approx(0.010, abs=1e-6)
+
+
+@pytest.mark.parametrize('extension', ['.json', '.rrec', '.rrj'])
+def test_save_load_play_round_trip(recorded_session, tmp_path, extension):
+    path = str(tmp_path / f'session{extension}')
+    recorded_session.save(path)
+    loaded = BGSI_Recorder(backend=VirtualBackend())
+    loaded.load(path)
+    assert played_actions(loaded.recorded, speed_factor=5) == EXPECTED_ACTIONS
+    for name in ('keyboard', 'mouse'):
+        original = recorded_session.recorded[name]
+        assert loaded.recorded[name].t.tolist() == pytest.approx(original.t.tolist(), abs=1e-6)
+
+
+def test_filtered_play_keeps_recording(recorded_session):
+    recorded = recorded_session.recorded
+    before = recorded['mouse'].to_list()
+    played_actions(recorded, speed_factor=5, only_essential_moves=True)
+    played_actions(recorded, speed_factor=5, simplify_mode='rdp')
+    assert recorded['mouse'].to_list() == before
@@ -0,0 +1,79 @@
+import time
+
+from event_store import new_recording
+from input_backend import VirtualBackend
+from playback_scheduler import KEYBOARD, MOUSE, PlaybackScheduler, merge_timeline
+from recorder_main import BGSI_Recorder
+from recorder_thread import CancelToken
+
+
+def clicks(count: int = 50) -> dict:
+    recorded = new_recording()
+    for i in range(count):
+        recorded['mouse'].append_move(i, i, i * 0.001)
+        recorded['keyboard'].append_key(True, str(i % 10), i * 0.001 + 0.0005)
+        recorded['keyboard'].append_key(False, str(i % 10), i * 0.001 + 0.0006)
+    return recorded
+
+
+def test_merge_timeline_puts_keyboard_first_on_ties():
+    recorded = new_recording()
+    recorded['mouse'].append_move(0, 0, 0.0)
+    recorded['mouse'].append_click('left', True, 0.02)
+    recorded['keyboard'].append_key(True, 'w', 0.01)
+    recorded['keyboard'].append_key(False, 'w', 0.02)
+    timeline = list(merge_timeline(recorded['keyboard'], recorded['mouse']))
+    assert timeline == [(0.0, MOUSE, 0), (0.01, KEYBOARD, 0), (0.02, KEYBOARD, 1), (0.02, MOUSE, 1)]
+
+
+def test_run_schedules_from_start_not_previous_event():
+    # A slow dispatch must not push back the deadlines of later events
+    recorded = clicks(100)
+    timeline = merge_timeline(recorded['keyboard'], recorded['mouse'])
+    dispatched = []
+
+    def dispatch(source, index):
+        dispatched.append(time.perf_counter_ns())
+        if len(dispatched) == 1:
+            time.sleep(0.05)
+
+    start_ns = time.perf_counter_ns()
+    stats = PlaybackScheduler().run(timeline, 1, start_ns, dispatch, CancelToken())
+    assert len(stats) == 300
+    # The events due during the 50ms stall play at once, so the 100ms timeline
+    # still ends on time instead of 50ms late
+    assert dispatched[-1] - start_ns < 125_000_000
+
+
+def test_partial_playback_plays_the_requested_range():
+    backend = VirtualBackend()
+    recorder = BGSI_Recorder(recorded=clicks(), backend=backend)
+    recorder.play(countdown=0.0, speed_factor=5, start=0.0199, end=0.0301)
+    played = [(action, args) for _, action, args in backend.actions]
+    moves = [args for action, args in played if action == 'move']
+    # The cursor is placed at the start point, then moves 20..30 are played
+    assert moves == [(19, 19)] + [(i, i) for i in range(20, 31)]
+    # Every key pressed in the range is released again
+    pressed = [args for action, args in played if action == 'press_key']
+    released = [args for action, args in played if action == 'release_key']
+    assert pressed and sorted(pressed) == sorted(released)
+
+
+def test_stop_before_play_cancels_playback():
+    # A stop requested after playback is scheduled but before play() runs
+    backend = VirtualBackend()
+    recorder = BGSI_Recorder(recorded=clicks(), backend=backend)
+    recorder.prepare_playback()
+    recorder.stop_playback()
+    recorder.play(countdown=0.0, speed_factor=5)
+    assert backend.actions == []
+    assert not recorder.is_playing
+
+
+def test_prepare_playback_rearms_after_stop():
+    backend = VirtualBackend()
+    recorder = BGSI_Recorder(recorded=clicks(5), backend=backend)
+    recorder.stop_playback()
+    recorder.prepare_playback()
+    recorder.play(countdown=0.0, speed_factor=5)
+    assert len(backend.actions) == 15
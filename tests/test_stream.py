@@ -0,0 +1,47 @@
+import pytest
+
+from event_store import new_recording
+from input_backend import VirtualBackend
+from recorder_main import BGSI_Recorder
+from recording_format import save_recording
+from recording_stream import RecordingStream
+
+
+def mixed_recording(moves: int = 300) -> dict:
+    recorded = new_recording()
+    for i in range(moves):
+        t = i * 0.0001
+        recorded['mouse'].append_move(i, 2 * i, t)
+        if i % 50 == 0:
+            recorded['keyboard'].append_key(True, 'e', t)
+            recorded['mouse'].append_click('left', True, t)
+            recorded['mouse'].append_scroll(1.5, t)
+            recorded['keyboard'].append_key(False, 'e', t)
+    return recorded
+
+
+def actions(backend: VirtualBackend) -> list:
+    return [(action, args) for _, action, args in backend.actions]
+
+
+@pytest.mark.parametrize('extension, compress', [('.rrec', False), ('.rrec', True), ('.rrj', False), ('.json', False)])
+def test_stream_plays_like_loaded_recording(tmp_path, extension, compress):
+    recorded = mixed_recording()
+    path = str(tmp_path / f'r{extension}')
+    save_recording(recorded, path, compress=compress)
+
+    loaded = VirtualBackend()
+    BGSI_Recorder(recorded=recorded, backend=loaded).play(countdown=0.0, speed_factor=5)
+    streamed = VirtualBackend()
+    recorder = BGSI_Recorder(backend=streamed)
+    recorder.play_stream(path, countdown=0.0, speed_factor=5, chunk_rows=64, read_ahead=1)
+    assert actions(streamed) == actions(loaded)
+    assert len(recorder.playback_stats) == len(recorded['keyboard']) + len(recorded['mouse'])
+
+
+def test_stream_merges_tracks_in_time_order(tmp_path):
+    path = str(tmp_path / 'r.rrec')
+    save_recording(mixed_recording(), path)
+    with RecordingStream(path, chunk_rows=16, read_ahead=2) as stream:
+        times = [t for t, _, _ in stream]
+    assert times == sorted(times)
@@ -0,0 +1,57 @@
+import threading
+import time
+
+import pytest
+
+from event_store import new_recording
+from input_backend import VirtualBackend
+from recorder_main import BGSI_Recorder
+
+
+class PollingBackend(VirtualBackend):
+    # Takes a telemetry snapshot on every dispatch, as the UI timer would
+    def __init__(self):
+        super().__init__()
+        self.recorder = None
+        self.snapshots = []
+
+    def _record(self, action: str, *args):
+        super()._record(action, *args)
+        self.snapshots.append(self.recorder.telemetry())
+
+
+def test_telemetry_during_playback():
+    recorded = new_recording()
+    for i in range(10):
+        recorded['mouse'].append_move(i, i, i * 0.002)
+    backend = PollingBackend()
+    recorder = BGSI_Recorder(recorded=recorded, backend=backend)
+    backend.recorder = recorder
+    assert recorder.telemetry() == {'state': 'idle'}
+    recorder.play(countdown=0.0, repeat=2)
+    assert all(snapshot['state'] == 'playing' for snapshot in backend.snapshots)
+    # Counted events include the ones of earlier runs
+    assert [snapshot['events'] for snapshot in backend.snapshots] == list(range(1, 21))
+    assert backend.snapshots[0]['total_s'] == pytest.approx(2 * 0.018)
+    assert backend.snapshots[-1]['run'] == 2
+    assert recorder.telemetry() == {'state': 'idle'}
+
+
+def test_telemetry_during_recording():
+    backend = VirtualBackend()
+    recorder = BGSI_Recorder(backend=backend)
+    thread = threading.Thread(target=recorder.record, kwargs={'countdown': 0.0})
+    thread.start()
+    while not backend.hooked:
+        time.sleep(0.001)
+    for i in range(5):
+        backend.emit_move(i, i)
+    deadline = time.time() + 5
+    while recorder.telemetry()['events'] < 5 and time.time() < deadline:
+        time.sleep(0.005)
+    snapshot = recorder.telemetry()
+    backend.emit_key('esc')
+    thread.join(timeout=10)
+    assert snapshot['state'] == 'recording'
+    assert snapshot['events'] == 5
+    assert recorder.telemetry() == {'state': 'idle'}
@@ -0,0 +1,58 @@
+import logging
+
+from event_store import new_recording
+from input_backend import VirtualBackend
+from playback_scheduler import KEYBOARD, MOUSE
+from recorder_log import Trace, get_logger
+from recorder_main import BGSI_Recorder
+
+
+def short_recording() -> dict:
+    recorded = new_recording()
+    recorded['mouse'].append_move(1, 1, 0.0)
+    recorded['keyboard'].append_key(True, 'w', 0.001)
+    recorded['keyboard'].append_key(False, 'w', 0.002)
+    recorded['mouse'].append_move(2, 2, 0.003)
+    return recorded
+
+
+def test_play_writes_dispatch_trace(tmp_path):
+    path = str(tmp_path / 'play.rrt')
+    recorder = BGSI_Recorder(recorded=short_recording(), backend=VirtualBackend())
+    recorder.play(countdown=0.0, speed_factor=2, trace_path=path)
+    trace = Trace(path)
+    assert len(trace) == 4
+    assert trace.speed_factor == 2
+    assert list(trace.source) == [MOUSE, KEYBOARD, KEYBOARD, MOUSE]
+    assert list(trace.index) == [0, 0, 1, 1]
+    assert list(trace.scheduled_ns) == [0, 500_000, 1_000_000, 1_500_000]
+    assert all(lateness >= 0 for lateness in trace.lateness_ns())
+    assert trace.summary()['events'] == 4
+
+
+class ListHandler(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.messages = []
+
+    def emit(self, record):
+        self.messages.append(record.getMessage())
+
+
+def test_log_events_logs_each_dispatch():
+    # Captured on the recorder logger itself, whatever setup_logging has done
+    logger = get_logger('recorder')
+    handler = ListHandler()
+    level, propagate = logger.level, logger.propagate
+    logger.addHandler(handler)
+    logger.setLevel(logging.DEBUG)
+    logger.propagate = False
+    try:
+        recorder = BGSI_Recorder(recorded=short_recording(), backend=VirtualBackend())
+        recorder.log_events = True
+        recorder.play(countdown=0.0, speed_factor=5)
+    finally:
+        logger.removeHandler(handler)
+        logger.setLevel(level)
+        logger.propagate = propagate
+    assert len([message for message in handler.messages if message.startswith('-> ')]) == 4
@@ -0,0 +1,162 @@
+from array import array
+
+import numpy as np
+
+from event_store import MOVE
+from playback_scheduler import KEYBOARD, MOUSE
+
+
+class NormalizeResult:
+    """What a normalize_recording pass removed from a recording."""
+
+    def __init__(self, original_events: int, events: int, original_duration: float, duration: float,
+                 gaps_capped: int, moves_merged: int):
+        self.original_events = original_events
+        self.events = events
+        self.original_duration = original_duration
+        self.duration = duration
+        self.gaps_capped = gaps_capped
+        self.moves_merged = moves_merged
+
+    @property
+    def events_removed(self) -> int:
+        return self.original_events - self.events
+
+    @property
+    def time_removed(self) -> float:
+        return self.original_duration - self.duration
+
+    def summary(self) -> dict:
+        return {
+            'original_events': self.original_events,
+            'events': self.events,
+            'events_removed': self.events_removed,
+            'moves_merged': self.moves_merged,
+            'original_duration_s': self.original_duration,
+            'duration_s': self.duration,
+            'time_removed_s': self.time_removed,
+            'gaps_capped': self.gaps_capped,
+        }
+
+    def format(self) -> str:
+        return (f"{self.original_events} -> {self.events} events ({self.moves_merged} moves merged), "
+                f"{self.original_duration:.3f}s -> {self.duration:.3f}s "
+                f"({self.time_removed:.3f}s removed from {self.gaps_capped} idle gaps)")
+
+
+def _merged_order(keyboard_track, mouse_track):
+    # Sources and rows in playback_scheduler.merge_timeline order, plus times
+    times = np.concatenate([np.frombuffer(keyboard_track.t, dtype=np.float64),
+                            np.frombuffer(mouse_track.t, dtype=np.float64)])
+    sources = np.concatenate([np.full(len(keyboard_track), KEYBOARD, np.uint8),
+                              np.full(len(mouse_track), MOUSE, np.uint8)])
+    rows = np.concatenate([np.arange(len(keyboard_track)), np.arange(len(mouse_track))])
+    order = np.lexsort((rows, sources, times))
+    return times[order], sources[order], rows[order]
+
+
+def _merge_moves(times, sources, rows, mouse_track, distance: float, interval: float) -> np.ndarray:
+    # Mask of merged positions to keep. Walking backwards, a move is dropped
+    # when it is within `distance` pixels and `interval` seconds of the kept
+    # move after it, with only moves in between. The last move of each burst
+    # survives with its exact position and time, so the move just before a
+    # key press or click is always kept (the one after it may be merged into
+    # the next move). Comparing against the kept move rather than the
+    # neighbour means a slow drift cannot be merged away.
+    keep = np.ones(len(times), dtype=bool)
+    kinds = np.frombuffer(mouse_track.kind, dtype=np.uint8)
+    is_move = np.zeros(len(times), dtype=bool)
+    mouse = sources == MOUSE
+    is_move[mouse] = kinds[rows[mouse]] == MOVE
+    xs = mouse_track.x
+    ys = mouse_track.y
+
+    # Plain lists: this loop is per event, and NumPy scalars are slow there
+    is_move = is_move.tolist()
+    times_list = times.tolist()
+    rows_list = rows.tolist()
+    anchor = None
+    for i in range(len(times_list) - 1, -1, -1):
+        if not is_move[i]:
+            anchor = None
+            continue
+        row = rows_list[i]
+        x, y = xs[row], ys[row]
+        if anchor is not None:
+            anchor_time, anchor_x, anchor_y = anchor
+            if anchor_time - times_list[i] <= interval and abs(x - anchor_x) <= distance and abs(y - anchor_y) <= distance:
+                keep[i] = False
+                continue
+        anchor = (times_list[i], x, y)
+    return keep
+
+
+def _cap_gaps(times: np.ndarray, max_idle: float):
+    # Every pause longer than max_idle, including the one before the first
+    # event, is shortened to max_idle; shorter spacing is untouched
+    gaps = np.diff(times, prepend=0.0)
+    capped = gaps > max_idle
+    return np.cumsum(np.minimum(gaps, max_idle)), int(capped.sum())
+
+
+def _quantize(times: np.ndarray, sources: np.ndarray, tick: float) -> np.ndarray:
+    # Rounds to the tick grid. Keyboard sorts before mouse on equal times, so
+    # a mouse event rounded onto the same tick as a following key event
+    # pushes that key event to the next tick to keep their order.
+    ticks = np.rint(times / tick).astype(np.int64)
+    ticks = np.maximum.accumulate(ticks)
+    while True:
+        flipped = np.flatnonzero((ticks[1:] == ticks[:-1]) & (sources[:-1] == MOUSE) & (sources[1:] == KEYBOARD)) + 1
+        if not len(flipped):
+            break
+        ticks[flipped] += 1
+        ticks = np.maximum.accumulate(ticks)
+    return ticks * tick
+
+
+def normalize_recording(recorded: dict, max_idle: float = None, merge_distance: float = None,
+                        merge_interval: float = 0.002, tick: float = None):
+    """
+    New recording with idle gaps capped, near-duplicate moves merged and
+    timestamps quantized; returns (recorded, NormalizeResult).
+
+    - max_idle: longest pause kept, in seconds; must be positive, since
+      zero-length gaps would reorder moves and the key presses after them.
+      Later events move earlier by whatever was cut.
+    - merge_distance: consecutive moves within this many pixels (per axis)
+      and merge_interval seconds of the move after them are dropped.
+    - tick: timestamps are rounded to multiples of this many seconds.
+
+    Each step is disabled when its option is None. The merged keyboard/mouse
+    order is unchanged. The input recording is not modified.
+    """
+    if max_idle is not None and not max_idle > 0:
+        raise ValueError(f"max_idle must be greater than 0, got {max_idle}")
+    keyboard_track = recorded['keyboard']
+    mouse_track = recorded['mouse']
+    times, sources, rows = _merged_order(keyboard_track, mouse_track)
+    original_duration = float(times[-1]) if len(times) else 0.0
+
+    moves_merged = 0
+    if merge_distance is not None and len(times):
+        keep = _merge_moves(times, sources, rows, mouse_track, merge_distance, merge_interval)
+        moves_merged = int(len(keep) - keep.sum())
+        times, sources, rows = times[keep], sources[keep], rows[keep]
+
+    gaps_capped = 0
+    if max_idle is not None and len(times):
+        times, gaps_capped = _cap_gaps(times, max_idle)
+    if tick and len(times):
+        times = _quantize(times, sources, tick)
+
+    normalized = {}
+    for name, track, source in (('keyboard', keyboard_track, KEYBOARD), ('mouse', mouse_track, MOUSE)):
+        # Rows of one track stay in order on the merged timeline
+        selected = sources == source
+        result = track.take(rows[selected].tolist())
+        result.t = array('d', times[selected].tobytes())
+        normalized[name] = result
+
+    result = NormalizeResult(len(keyboard_track) + len(mouse_track), len(times), original_duration,
+                             float(times[-1]) if len(times) else 0.0, gaps_capped, moves_merged)
+    return normalized, result